@@ -7,7 +7,7 @@ from telegram.ext import Application
 
 from src.config import config, Config
 from src.database.models import init_db
-from src.bot.handlers import register_handlers
+from src.bot.handlers import ALLOWED_UPDATES, configure_transport, register_handlers
 
 # Configure logging
 logging.basicConfig(
@@ -32,14 +32,14 @@ def main() -> None:
 
     # Create the Application
     logger.info("Starting bot...")
-    application = Application.builder().token(config.TELEGRAM_TOKEN).build()
+    application = configure_transport(Application.builder()).token(config.TELEGRAM_TOKEN).build()
 
     # Register handlers
     register_handlers(application)
 
     # Run the bot until Ctrl+C
     logger.info("Bot is running. Press Ctrl+C to stop.")
-    application.run_polling()
+    application.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 
 if __name__ == "__main__":
@@ -4,7 +4,7 @@ import asyncio
 import base64
 import logging
 import time
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from google import genai
 from google.genai import types
@@ -32,6 +32,10 @@ class GeminiClient:
         self.model = "gemini-flash-latest"  # More quota-friendly
         self.max_retries = 2
         self.retry_delay = 5  # seconds
+        # Caps requests in flight so a burst of users queues here instead of
+        # exhausting the HTTP pool and the per-key quota
+        self.max_concurrent_requests = 16
+        self._request_slots = asyncio.Semaphore(self.max_concurrent_requests)
 
         logger.info(f"Gemini client initialized with {len(self.api_keys)} API key(s)")
 
@@ -107,7 +111,8 @@ class GeminiClient:
 
             for attempt in range(self.max_retries):
                 try:
-                    result = await operation_func()
+                    async with self._request_slots:
+                        result = await operation_func()
                     # Success! Clear cooldown for this key
                     if self.current_key_index in self.key_cooldowns:
                         del self.key_cooldowns[self.current_key_index]
@@ -290,6 +295,60 @@ Preserve the original language - do not translate."""
         Returns:
             The processed content, or None if failed.
         """
+        return await self.send_text(self._audio_prompt(transcript, processing_type))
+
+    async def stream_audio_content(
+        self,
+        transcript: str,
+        processing_type: str
+    ) -> AsyncIterator[str]:
+        """
+        Process a transcript like process_audio_content, yielding text as it is generated.
+
+        If the stream fails before producing any text, the request is retried
+        once without streaming (with key rotation) and its result yielded whole.
+
+        Args:
+            transcript: The audio transcription.
+            processing_type: One of: summary, minutes, tasks, study, smart
+
+        Yields:
+            Successive pieces of the processed content.
+        """
+        prompt = self._audio_prompt(transcript, processing_type)
+        produced = False
+        try:
+            # A request slot is held only while talking to Gemini, never while
+            # the consumer handles a yielded piece, so slow Telegram edits do
+            # not keep other Gemini requests waiting
+            async with self._request_slots:
+                stream = await self.client.aio.models.generate_content_stream(
+                    model=self.model,
+                    contents=prompt
+                )
+            chunks = stream.__aiter__()
+            while True:
+                async with self._request_slots:
+                    try:
+                        chunk = await chunks.__anext__()
+                    except StopAsyncIteration:
+                        break
+                if chunk.text:
+                    produced = True
+                    yield chunk.text
+        except Exception as e:
+            if produced:
+                raise
+            logger.warning(f"Gemini stream failed, retrying without streaming: {e}")
+            if self._is_rate_limit_error(e):
+                self._rotate_key()
+            result = await self.send_text(prompt)
+            if result:
+                yield result
+
+    @staticmethod
+    def _audio_prompt(transcript: str, processing_type: str) -> str:
+        """Build the prompt for processing a transcript as `processing_type`."""
         prompts = {
             "summary": f"""Create a concise summary of this transcript:
 
@@ -376,8 +435,7 @@ Include:
 3. Any extracted action items or tasks at the end"""
         }
 
-        prompt = prompts.get(processing_type, prompts["summary"])
-        return await self.send_text(prompt)
+        return prompts.get(processing_type, prompts["summary"])
 
     async def get_ai_suggestions(self, data: dict) -> Optional[str]:
         """
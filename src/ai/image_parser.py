@@ -339,6 +339,21 @@ If the image is not an assignment document, return:
         return None
 
 
+# Photos whose longer side is below this are thumbnails or stickers, not documents
+MIN_DOCUMENT_IMAGE_SIDE = 200
+
+
+def could_be_document_image(width: int, height: int) -> bool:
+    """
+    Check whether a photo is large enough to be worth sending for detection.
+
+    Only thumbnail-sized photos are rejected. Aspect ratio is not checked:
+    Telegram caps the long side at 1280/2560 px, so scrolling calendar and
+    timetable screenshots arrive very tall and narrow.
+    """
+    return max(width, height) >= MIN_DOCUMENT_IMAGE_SIDE
+
+
 async def detect_image_type(image_bytes: bytes) -> str:
     """
     Detect the type of academic image.
@@ -12,6 +12,9 @@ from .gemini_client import get_gemini_client
 
 logger = logging.getLogger(__name__)
 
+# Completable item types and their keys in a pending-items dict
+COMPLETION_ITEM_TYPES = (("assignment", "assignments"), ("task", "tasks"), ("todo", "todos"))
+
 
 class Intent(Enum):
     """All supported user intents."""
@@ -79,7 +82,7 @@ class Intent(Enum):
     UNKNOWN = "unknown"
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ParsedEntities:
     """Extracted entities from user message."""
 
@@ -108,7 +111,7 @@ class ParsedEntities:
     raw: dict = field(default_factory=dict)
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ClassificationResult:
     """Result of intent classification."""
     intent: Intent
@@ -116,6 +119,16 @@ class ClassificationResult:
     confidence: float = 0.0
 
 
+@dataclass(frozen=True, slots=True)
+class TaskDraft:
+    """Task fields built from parsed entities, ready to insert."""
+    title: str
+    description: Optional[str] = None
+    scheduled_date: Optional[str] = None
+    scheduled_time: Optional[str] = None
+    location: Optional[str] = None
+
+
 def _clean_json_response(response: str) -> str:
     """Remove markdown code blocks and clean JSON response."""
     if not response:
@@ -220,6 +233,19 @@ def _parse_time(time_str: str) -> Optional[str]:
     return None
 
 
+# Whole messages that name a query outright, answered without pattern scans or Gemini
+BARE_QUERY_INTENTS = {
+    **dict.fromkeys(("tomorrow", "tmr", "tmrw", "tommorow", "esok"), Intent.QUERY_TOMORROW_CLASSES),
+    **dict.fromkeys(("today", "harini", "hari ini", "hari ni"), Intent.QUERY_TODAY_CLASSES),
+    **dict.fromkeys(("offday", "off day", "next offday", "next off day"), Intent.QUERY_NEXT_OFFDAY),
+    **dict.fromkeys(("assignment", "assignments", "tugasan"), Intent.QUERY_ASSIGNMENTS),
+    **dict.fromkeys(("task", "tasks"), Intent.QUERY_TASKS),
+    **dict.fromkeys(("todo", "todos", "todo list"), Intent.QUERY_TODOS),
+    **dict.fromkeys(("stats", "statistics"), Intent.QUERY_STATS),
+    **dict.fromkeys(("hello", "hey", "salam", "assalamualaikum"), Intent.GENERAL_CHAT),
+}
+
+
 INTENT_CLASSIFICATION_PROMPT = """Analyze this user message and classify the intent.
 
 Message: "{message}"
@@ -298,6 +324,14 @@ async def classify_message(message: str) -> ClassificationResult:
     # Quick pattern matching for common queries
     message_lower = message.lower().strip()
 
+    bare_intent = BARE_QUERY_INTENTS.get(" ".join(message_lower.rstrip("?!.").split()))
+    if bare_intent is not None:
+        return ClassificationResult(
+            intent=bare_intent,
+            entities=ParsedEntities(),
+            confidence=0.95
+        )
+
     # Lab test / quiz / test patterns - MUST be checked before week queries
     # Pattern: "i have lab test for OS next week on lab section"
     # Pattern: "lab test BITP1113 next week", "quiz OS tomorrow"
@@ -774,28 +808,35 @@ async def extract_completion_target(
     Returns:
         Tuple of (item_type, item_dict) or None if no match found.
     """
-    message_lower = message.lower()
-
-    # Build context of pending items for Gemini
-    items_context = []
-
-    for assignment in pending_items.get("assignments", []):
-        items_context.append(
-            f"assignment:{assignment['id']}:{assignment['title']} ({assignment.get('subject_code', 'no code')})"
-        )
-
-    for task in pending_items.get("tasks", []):
-        items_context.append(
-            f"task:{task['id']}:{task['title']}"
-        )
+    # Flatten once: (item type, item) in the order items are shown to Gemini
+    candidates = [
+        (item_type, item)
+        for item_type, key in COMPLETION_ITEM_TYPES
+        for item in pending_items.get(key, [])
+    ]
+    if not candidates:
+        return None
 
-    for todo in pending_items.get("todos", []):
-        items_context.append(
-            f"todo:{todo['id']}:{todo['title']}"
+    # A message naming exactly one item's full title, as whole words, needs
+    # no model call ("work" must not match inside "homework")
+    named = [
+        (item_type, item) for item_type, item in candidates
+        if len(item["title"]) >= 3 and re.search(
+            rf"(?<!\w){re.escape(item['title'])}(?!\w)", message, re.IGNORECASE
         )
+    ]
+    if len(named) == 1:
+        return named[0]
 
-    if not items_context:
-        return None
+    # Build context of pending items for Gemini
+    items_context = []
+    for item_type, item in candidates:
+        if item_type == "assignment":
+            items_context.append(
+                f"assignment:{item['id']}:{item['title']} ({item.get('subject_code', 'no code')})"
+            )
+        else:
+            items_context.append(f"{item_type}:{item['id']}:{item['title']}")
 
     prompt = f"""The user said: "{message}"
 
@@ -823,22 +864,12 @@ Return ONLY JSON: {{"type": "assignment|task|todo", "id": 123}} or {{"match": nu
         if data.get("type") is None or data.get("id") is None:
             return None
 
+        # Find the actual item
         item_type = data.get("type")
         item_id = data.get("id")
-
-        # Find the actual item
-        if item_type == "assignment":
-            for item in pending_items.get("assignments", []):
-                if item["id"] == item_id:
-                    return ("assignment", item)
-        elif item_type == "task":
-            for item in pending_items.get("tasks", []):
-                if item["id"] == item_id:
-                    return ("task", item)
-        elif item_type == "todo":
-            for item in pending_items.get("todos", []):
-                if item["id"] == item_id:
-                    return ("todo", item)
+        for candidate_type, item in candidates:
+            if candidate_type == item_type and item["id"] == item_id:
+                return (item_type, item)
 
         return None
 
@@ -865,20 +896,20 @@ def build_assignment_from_entities(entities: ParsedEntities) -> dict:
     }
 
 
-def build_task_from_entities(entities: ParsedEntities) -> dict:
-    """Build task data dict from parsed entities."""
+def build_task_from_entities(entities: ParsedEntities) -> TaskDraft:
+    """Build a task draft from parsed entities."""
     # Construct title from person name if available
     title = entities.title
     if not title and entities.person_name:
         title = f"Meet {entities.person_name}"
 
-    return {
-        "title": title or "Untitled Task",
-        "description": entities.description,
-        "scheduled_date": entities.date,
-        "scheduled_time": entities.time,
-        "location": entities.location
-    }
+    return TaskDraft(
+        title=title or "Untitled Task",
+        description=entities.description,
+        scheduled_date=entities.date,
+        scheduled_time=entities.time,
+        location=entities.location
+    )
 
 
 def build_todo_from_entities(entities: ParsedEntities) -> dict:
@@ -1,11 +1,12 @@
 """Multi-step conversation flows for bot interactions."""
 
 import logging
+from dataclasses import asdict
 from datetime import date, datetime, timedelta
 from enum import Enum, auto
 from typing import Optional
 
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram import File, Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import (
     ContextTypes,
     ConversationHandler,
@@ -33,6 +34,32 @@ logger = logging.getLogger(__name__)
 db = DatabaseOperations(config.DATABASE_PATH)
 
 
+class _BytesSink:
+    """Write target that collects written chunks without copying them."""
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(data)
+        return len(data)
+
+
+async def download_file_bytes(file: File) -> bytes:
+    """Download a Telegram file into a single bytes object.
+
+    download_as_bytearray copies the response into a bytearray, and callers
+    then copied that into bytes for Gemini. Taking the response object as
+    written keeps one copy of the file in memory; if it arrives in several
+    writes the chunks are joined once at the end.
+    """
+    sink = _BytesSink()
+    await file.download_to_memory(out=sink)
+    if len(sink.chunks) == 1:
+        return bytes(sink.chunks[0])
+    return b"".join(sink.chunks)
+
+
 # Conversation states
 class OnboardingState(Enum):
     WAITING_CALENDAR = auto()
@@ -77,12 +104,12 @@ async def receive_calendar_image(update: Update, context: ContextTypes.DEFAULT_T
     # Get the largest photo
     photo = update.message.photo[-1]
     file = await photo.get_file()
-    image_bytes = await file.download_as_bytearray()
+    image_bytes = await download_file_bytes(file)
 
     await update.message.reply_text("Analyzing calendar image... Please wait.")
 
     # Parse the calendar
-    events = await parse_academic_calendar(bytes(image_bytes))
+    events = await parse_academic_calendar(image_bytes)
 
     if not events:
         await update.message.reply_text(
@@ -111,27 +138,20 @@ async def confirm_calendar(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     if response in ("yes", "y", "ok", "confirm"):
         events = context.user_data.get("pending_events", [])
 
-        # Clear existing events and save new ones
+        # Clear existing events and save new ones, detecting semester
+        # start from the lecture_period event in the same pass
         db.clear_events()
-        saved_count = 0
-
+        rows = []
+        semester_start = None
         for event in events:
-            db.add_event(
-                event_type=event.event_type,
-                name=event.name,
-                name_en=event.name_en,
-                start_date=event.start_date,
-                end_date=event.end_date,
-                affects_classes=event.affects_classes
-            )
-            saved_count += 1
+            rows.append(asdict(event))
+            if semester_start is None and event.event_type == "lecture_period":
+                semester_start = event.start_date
+        saved_count = db.add_events_bulk(rows)
 
-        # Try to detect semester start from lecture_period events
-        for event in events:
-            if event.event_type == "lecture_period":
-                chat_id = update.effective_chat.id
-                db.update_user_config(chat_id, semester_start_date=event.start_date)
-                break
+        if semester_start:
+            chat_id = update.effective_chat.id
+            db.update_user_config(chat_id, semester_start_date=semester_start)
 
         await update.message.reply_text(
             f"Saved {saved_count} events!\n\n"
@@ -168,12 +188,12 @@ async def receive_timetable_image(update: Update, context: ContextTypes.DEFAULT_
     # Get the largest photo
     photo = update.message.photo[-1]
     file = await photo.get_file()
-    image_bytes = await file.download_as_bytearray()
+    image_bytes = await download_file_bytes(file)
 
     await update.message.reply_text("Analyzing timetable image... Please wait.")
 
     # Parse the timetable
-    slots = await parse_timetable(bytes(image_bytes))
+    slots = await parse_timetable(image_bytes)
 
     if not slots:
         await update.message.reply_text(
@@ -204,20 +224,7 @@ async def confirm_timetable(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
         # Clear existing schedule and save new ones
         db.clear_schedule()
-        saved_count = 0
-
-        for slot in slots:
-            db.add_schedule_slot(
-                day_of_week=slot.day_of_week,
-                start_time=slot.start_time,
-                end_time=slot.end_time,
-                subject_code=slot.subject_code,
-                subject_name=slot.subject_name,
-                class_type=slot.class_type,
-                room=slot.room,
-                lecturer_name=slot.lecturer_name
-            )
-            saved_count += 1
+        saved_count = db.add_schedule_slots_bulk([asdict(slot) for slot in slots])
 
         await update.message.reply_text(
             f"✅ Saved {saved_count} class slots!\n\n"
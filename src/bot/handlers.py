@@ -1,15 +1,27 @@
 """Telegram bot command handlers."""
 
+import asyncio
+import hashlib
+import html
 import io
 import json
 import logging
 import os
+import re
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict
 from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from itertools import groupby
+from time import monotonic
+from typing import Iterator, Optional
 
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters, CallbackQueryHandler
+from telegram import CallbackQuery, Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, MessageHandler, ContextTypes, filters, CallbackQueryHandler
 import pytz
 
+from .throttle import EditCoalescer, TokenBucketRateLimiter
 from .keyboards import (
     get_main_menu_keyboard,
     get_settings_keyboard,
@@ -36,6 +48,24 @@ _test_date_override: date = None
 _test_time_override: time = None
 
 
+@lru_cache(maxsize=4)
+def _parse_test_date(value: str) -> Optional[date]:
+    """Parse a TEST_DATE value once; None if it is not an ISO date."""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=4)
+def _parse_test_time(value: str) -> Optional[time]:
+    """Parse a TEST_TIME value once; None if it is not an ISO time."""
+    try:
+        return time.fromisoformat(value)
+    except ValueError:
+        return None
+
+
 def get_today() -> date:
     """Get current date (or test date if set for debugging)."""
     global _test_date_override
@@ -44,10 +74,9 @@ def get_today() -> date:
     # Check environment variable
     env_date = os.getenv("TEST_DATE")
     if env_date:
-        try:
-            return datetime.strptime(env_date, "%Y-%m-%d").date()
-        except ValueError:
-            pass
+        test_date = _parse_test_date(env_date)
+        if test_date:
+            return test_date
     return date.today()
 
 
@@ -63,12 +92,8 @@ def get_now() -> datetime:
         current_time = _test_time_override
     else:
         env_time = os.getenv("TEST_TIME")
-        if env_time:
-            try:
-                current_time = datetime.strptime(env_time, "%H:%M").time()
-            except ValueError:
-                current_time = datetime.now(MY_TZ).time()
-        else:
+        current_time = _parse_test_time(env_time) if env_time else None
+        if current_time is None:
             current_time = datetime.now(MY_TZ).time()
 
     # Combine date and time
@@ -77,22 +102,38 @@ def get_now() -> datetime:
 
 from ..config import config
 from ..database.operations import DatabaseOperations
+from ..database.models import (
+    EVENT_CATEGORY_MIDTERM_BREAK,
+    EVENT_CATEGORY_MIDTERM_EXAM,
+    EVENT_CATEGORY_FINAL_EXAM,
+)
 from ..ai.intent_parser import (
     Intent,
+    ClassificationResult,
+    ParsedEntities,
     classify_message,
     extract_completion_target,
     build_assignment_from_entities,
     build_task_from_entities,
     build_todo_from_entities,
 )
-from ..ai.image_parser import detect_image_type, parse_assignment_image, parse_academic_calendar, parse_timetable
+from ..ai.gemini_client import get_gemini_client
+from ..ai.image_parser import (
+    could_be_document_image,
+    detect_image_type,
+    parse_assignment_image,
+    parse_academic_calendar,
+    parse_timetable,
+)
 from ..utils.semester_logic import (
     get_current_week,
     get_next_week,
     get_next_offday,
-    get_current_break,
-    classify_break_event,
+    get_break_window,
+    is_class_day,
     BREAK_INTER_SEMESTER,
+    DAY_NAMES,
+    DAY_NAMES_SHORT,
     parse_date,
 )
 from .conversations import (
@@ -105,6 +146,7 @@ from .conversations import (
     format_current_week,
     format_next_offday,
     handle_assignment_image,
+    download_file_bytes,
     confirm_assignment,
     get_onboarding_handler,
 )
@@ -114,6 +156,224 @@ logger = logging.getLogger(__name__)
 # Initialize database operations
 db = DatabaseOperations(config.DATABASE_PATH)
 
+# Item type aliases accepted by /done and /delete, mapped to canonical names
+ITEM_TYPE_ALIASES = {
+    "assignment": "assignment",
+    "a": "assignment",
+    "task": "task",
+    "t": "task",
+    "todo": "todo",
+    "td": "todo",
+}
+
+# Display names of the completable item types
+ITEM_TYPE_LABELS = {
+    "assignment": "Assignment",
+    "task": "Task",
+    "todo": "TODO",
+}
+
+# Replies accepted for pending edit/delete confirmations
+CONFIRM_YES = frozenset(("yes", "y", "ya", "confirm"))
+CONFIRM_NO = frozenset(("no", "n", "tidak", "cancel"))
+
+# One-word replies that are answered as general chat without classification
+CHAT_TOKENS = CONFIRM_YES | CONFIRM_NO | {"ok", "hi", "thx"}
+
+# Small-talk keywords for GENERAL_CHAT replies, in priority order
+ISLAMIC_GREETINGS = frozenset(("assalamualaikum", "salam", "aslm", "slm"))
+GREETINGS = frozenset(("hi", "hello", "hey", "helo", "hai"))
+THANKS = frozenset(("thank", "thanks", "thx", "terima kasih"))
+FAREWELLS = frozenset(("bye", "goodbye", "see you"))
+SMALL_TALK_REPLIES = (
+    (ISLAMIC_GREETINGS, "Waalaikumussalam! 👋\n\nHow can I help you today?\nTry /menu for quick access."),
+    (GREETINGS, "Hello! 👋\n\nHow can I help you today?\nTry /menu for quick access."),
+    (THANKS, "You're welcome! 😊 Let me know if you need anything else."),
+    (FAREWELLS, "Goodbye! Good luck with your studies! 📚"),
+)
+# Keyword -> index into SMALL_TALK_REPLIES, and one pattern matching any keyword
+SMALL_TALK_RANK = {
+    keyword: rank
+    for rank, (keywords, _) in enumerate(SMALL_TALK_REPLIES)
+    for keyword in keywords
+}
+SMALL_TALK_RE = re.compile(
+    r"\b(%s)\b" % "|".join(sorted(SMALL_TALK_RANK, key=len, reverse=True)),
+    re.IGNORECASE
+)
+
+# Confirmed text edits: item type -> (db method, edit field -> column, reply template)
+PENDING_EDITORS = {
+    "schedule": (
+        "update_schedule_slot",
+        {"room": "room", "lecturer": "lecturer_name"},
+        "Updated! {description} {field} is now '{new_value}'."
+    ),
+    "assignment": (
+        "update_assignment",
+        {"due": "due_date", "title": "title"},
+        "Updated! Assignment '{description}' {field} is now '{new_value}'."
+    ),
+}
+
+# Mute duration units (singular, English and Malay) -> hours
+MUTE_UNIT_HOURS = {
+    "min": 1 / 60, "minute": 1 / 60, "minit": 1 / 60,
+    "hour": 1, "jam": 1,
+    "day": 24, "hari": 24,
+}
+
+# Relative week phrases accepted as an exam date
+RELATIVE_WEEK_RE = re.compile(r"next week|minggu depan|this week|minggu ni", re.IGNORECASE)
+NEXT_WEEK_PHRASES = frozenset(("next week", "minggu depan"))
+
+# /setdate and /settime argument shapes (same fields strptime accepted)
+TEST_DATE_RE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+TEST_TIME_RE = re.compile(r"(\d{1,2}):(\d{1,2})")
+
+# Markup converted by _md_to_html
+MD_BOLD_RE = re.compile(r"\*([^*\n]+)\*")
+MD_CODE_RE = re.compile(r"`([^`\n]+)`")
+
+# Recent classification results, keyed by normalized message text
+_CLASSIFY_CACHE: OrderedDict[str, tuple[float, ClassificationResult]] = OrderedDict()
+_CLASSIFY_CACHE_SIZE = 2048
+# Trailing punctuation ignored when normalizing ("class tmr?" == "class tmr")
+_CLASSIFY_TRAILING_PUNCT = "?!.,~ "
+_CLASSIFY_CACHE_TTL = 300  # seconds
+
+# Recent /suggest replies, keyed by a digest of the data sent to Gemini
+_SUGGEST_CACHE: OrderedDict[bytes, tuple[float, str]] = OrderedDict()
+_SUGGEST_CACHE_SIZE = 16
+_SUGGEST_CACHE_TTL = 60  # seconds
+
+# Current break as (events version, computed on, valid until, break, break type)
+_BREAK_STATE: Optional[tuple[int, date, date, Optional[dict], Optional[str]]] = None
+
+# Last button press per chat, used to drop accidental double-clicks
+_LAST_CALLBACK: dict[int, tuple[str, float]] = {}
+_CALLBACK_DEBOUNCE = 0.3  # seconds
+
+# Coalesces rapid edits of the same message made from button callbacks
+_EDITS = EditCoalescer()
+
+# Voice button actions that name a processing type (others fall back to summary)
+VOICE_PROCESSING_TYPES = frozenset(("summary", "minutes", "tasks", "study", "transcript", "smart"))
+
+# Minimum gap between progress edits while Gemini output is streaming in
+_VOICE_STREAM_INTERVAL = 0.8  # seconds
+
+
+def _remember_notes(context: ContextTypes.DEFAULT_TYPE, notes: list[dict]) -> None:
+    """Keep the notes just listed so opening one of them needs no lookup."""
+    context.chat_data["notes_by_id"] = {note["id"]: note for note in notes}
+
+
+async def _get_voice_note(context: ContextTypes.DEFAULT_TYPE, note_id: int) -> Optional[dict]:
+    """Get a voice note from the last listing, falling back to the database."""
+    note = context.chat_data.get("notes_by_id", {}).get(note_id)
+    if note is None:
+        note = await asyncio.to_thread(db.get_voice_note_by_id, note_id)
+    return note
+
+
+def _get_current_break_with_type(today: date) -> tuple[Optional[dict], Optional[str]]:
+    """Get today's break and its type, rescanning events only when they can change.
+
+    The answer is reused while the events table is unchanged and today lies
+    between the date it was computed on and the next break start or end.
+    """
+    global _BREAK_STATE
+    version = db.get_table_version("events")
+    state = _BREAK_STATE
+    if state is None or state[0] != version or not state[1] <= today < state[2]:
+        current_break, break_type, valid_until = get_break_window(today, db.get_all_events())
+        state = _BREAK_STATE = (version, today, valid_until, current_break, break_type)
+    return state[3], state[4]
+
+
+def _get_user_config(chat_id: int) -> Optional[dict]:
+    """Get user config with the semester start date pre-parsed.
+
+    The parsed date is stored under "_semester_start_date" (None if unset).
+    """
+    user_config = db.get_user_config(chat_id)
+    if user_config is None:
+        return None
+    semester_start_str = user_config.get("semester_start_date")
+    user_config["_semester_start_date"] = parse_date(semester_start_str) if semester_start_str else None
+    return user_config
+
+
+def _markdown_if_needed(text: str) -> Optional[str]:
+    """Return "Markdown" only if the text contains Markdown markup characters."""
+    return "Markdown" if any(c in text for c in "*_`[") else None
+
+
+def _md_to_html(text: str) -> str:
+    """Render the *bold* and `code` markup of a static text as Telegram HTML.
+
+    Underscores are left alone: static texts use them in command names such
+    as /week_number, which legacy Markdown would read as an unclosed italic.
+    """
+    text = html.escape(text, quote=False)
+    text = MD_BOLD_RE.sub(r"<b>\1</b>", text)
+    return MD_CODE_RE.sub(r"<code>\1</code>", text)
+
+
+async def _get_ai_suggestions_cached(data: dict) -> Optional[str]:
+    """Get AI suggestions, reusing a recent reply for identical data.
+
+    Any change to the pending items changes the digest, so a cached reply
+    is never served for data it was not generated from.
+    """
+    key = hashlib.blake2b(
+        json.dumps(data, sort_keys=True, default=str).encode(),
+        digest_size=8
+    ).digest()
+    now = monotonic()
+    cached = _SUGGEST_CACHE.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    suggestions = await get_gemini_client().get_ai_suggestions(data)
+    if suggestions:
+        _SUGGEST_CACHE[key] = (now + _SUGGEST_CACHE_TTL, suggestions)
+        _SUGGEST_CACHE.move_to_end(key)
+        if len(_SUGGEST_CACHE) > _SUGGEST_CACHE_SIZE:
+            _SUGGEST_CACHE.popitem(last=False)
+    return suggestions
+
+
+async def _classify_message_cached(message_text: str) -> ClassificationResult:
+    """Classify a message, reusing recent results for the same text.
+
+    Messages differing only in case, spacing or trailing punctuation share
+    a result. Results with a resolved date are not cached, since relative
+    dates like "tomorrow" depend on when the message is sent.
+    """
+    key = " ".join(message_text.lower().split()).rstrip(_CLASSIFY_TRAILING_PUNCT)
+    if key in CHAT_TOKENS:
+        return ClassificationResult(
+            intent=Intent.GENERAL_CHAT,
+            entities=ParsedEntities(),
+            confidence=1.0
+        )
+
+    now = monotonic()
+    cached = _CLASSIFY_CACHE.get(key)
+    if cached and cached[0] > now:
+        _CLASSIFY_CACHE.move_to_end(key)
+        return cached[1]
+
+    result = await classify_message(message_text)
+    if result.confidence and not (result.entities.date or result.entities.due_date):
+        _CLASSIFY_CACHE[key] = (now + _CLASSIFY_CACHE_TTL, result)
+        _CLASSIFY_CACHE.move_to_end(key)
+        if len(_CLASSIFY_CACHE) > _CLASSIFY_CACHE_SIZE:
+            _CLASSIFY_CACHE.popitem(last=False)
+    return result
+
 
 def is_authorized(user_id: int) -> bool:
     """Check if the user is authorized to use the bot."""
@@ -141,6 +401,28 @@ def authorized(func):
     return wrapper
 
 
+# Reply templates for /start, filled with the user's first name
+WELCOME_NEW_TEMPLATE = """Assalamualaikum {name}! 👋
+
+Welcome to UTeM Student Assistant Bot.
+
+Please select your preferred language:
+Sila pilih bahasa pilihan anda:"""
+WELCOME_BACK_TEMPLATE = """Welcome back, {name}! 👋
+
+I can help you with:
+📅 Class schedule & week tracking
+📝 Assignment tracking with reminders
+✅ Tasks and TODO management
+🎤 Voice notes transcription
+📸 Image recognition (calendar, timetable, assignments)
+💡 AI-powered suggestions
+🔔 Daily briefings and notifications
+
+Use /setup to configure your calendar and timetable.
+Use /help to see all available commands."""
+
+
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /start command - welcome message and setup."""
     chat_id = update.effective_chat.id
@@ -155,53 +437,21 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         db.create_user_config(chat_id)
 
         # Welcome message with language selection for new users
-        welcome_message = f"""
-Assalamualaikum {user.first_name}! 👋
-
-Welcome to UTeM Student Assistant Bot.
-
-Please select your preferred language:
-Sila pilih bahasa pilihan anda:
-"""
         await update.message.reply_text(
-            welcome_message.strip(),
+            WELCOME_NEW_TEMPLATE.format(name=user.first_name),
             reply_markup=get_initial_language_keyboard()
         )
     else:
         # Returning user - show welcome back message
-        user_config = db.get_user_config(chat_id)
-        lang = user_config.get("language", "en") if user_config else "en"
-
-        welcome_message = f"""
-Welcome back, {user.first_name}! 👋
-
-I can help you with:
-📅 Class schedule & week tracking
-📝 Assignment tracking with reminders
-✅ Tasks and TODO management
-🎤 Voice notes transcription
-📸 Image recognition (calendar, timetable, assignments)
-💡 AI-powered suggestions
-🔔 Daily briefings and notifications
-
-Use /setup to configure your calendar and timetable.
-Use /help to see all available commands.
-"""
         await update.message.reply_text(
-            welcome_message.strip(),
+            WELCOME_BACK_TEMPLATE.format(name=user.first_name),
             reply_markup=get_main_menu_keyboard()
         )
 
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle /help command - show available commands."""
-    args = context.args
-
-    # Section-specific help
-    if args:
-        section = args[0].lower()
-        help_sections = {
-            "schedule": """
+# Help sections for /help <topic>
+HELP_SECTIONS = {
+    "schedule": """
 *📅 Schedule Commands*
 
 /today - View today's classes
@@ -222,7 +472,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 📸 Send calendar image → auto-import events
 📸 Send timetable image → auto-import schedule
 """,
-            "assignments": """
+    "assignments": """
 *📝 Assignment Commands*
 
 /assignments - List pending assignments
@@ -241,7 +491,7 @@ Send an assignment sheet image → auto-extract details
 *🔔 Reminders:*
 Automatic reminders at: 3 days, 2 days, 1 day, 8h, 3h, 1h, and due time
 """,
-            "tasks": """
+    "tasks": """
 *📋 Task Commands*
 
 /tasks - List upcoming tasks/meetings
@@ -255,7 +505,7 @@ Automatic reminders at: 3 days, 2 days, 1 day, 8h, 3h, 1h, and due time
 
 Tasks are for scheduled appointments and meetings.
 """,
-            "todos": """
+    "todos": """
 *✅ TODO Commands*
 
 /todos - List pending TODOs
@@ -270,7 +520,7 @@ Tasks are for scheduled appointments and meetings.
 
 TODOs are quick personal reminders.
 """,
-            "exams": """
+    "exams": """
 *📝 Exam Commands*
 
 /exams - List upcoming exams
@@ -284,7 +534,7 @@ TODOs are quick personal reminders.
 
 System auto-finds the exam day/time from your schedule!
 """,
-            "voice": """
+    "voice": """
 *🎤 Voice Notes*
 
 /notes - List saved voice notes
@@ -302,7 +552,7 @@ System auto-finds the exam day/time from your schedule!
    💾 Save Transcript - Keep raw text
    🎯 Smart Analysis - AI decides best format
 """,
-            "online": """
+    "online": """
 *🖥️ Online Class Settings*
 
 /online - View online class settings
@@ -319,7 +569,7 @@ System auto-finds the exam day/time from your schedule!
 
 /delete online <id> - Remove setting
 """,
-            "settings": """
+    "settings": """
 *⚙️ Settings & Preferences*
 
 /settings - Settings menu
@@ -334,7 +584,7 @@ System auto-finds the exam day/time from your schedule!
 
 Toggle notifications in /settings menu.
 """,
-            "other": """
+    "other": """
 *🔧 Other Commands*
 
 /status - Overview of all pending items
@@ -355,7 +605,7 @@ Toggle notifications in /settings menu.
 /edit schedule <id> room <value>
 /edit assignment <id> due <date>
 """,
-            "debug": """
+    "debug": """
 *🛠️ Debug Commands*
 
 /setdate YYYY-MM-DD - Override current date
@@ -366,17 +616,10 @@ Toggle notifications in /settings menu.
    Types: briefing, offday, midnight,
           assignments, tasks, todos, semester
 """,
-        }
-
-        if section in help_sections:
-            await update.message.reply_text(
-                help_sections[section].strip(),
-                parse_mode="Markdown"
-            )
-            return
+}
 
-    # Main help menu
-    help_text = """
+# Main help menu
+HELP_TEXT = """
 *📚 UTeM Student Assistant Bot*
 
 Your AI-powered academic helper for schedules, assignments, tasks, and more!
@@ -417,35 +660,58 @@ Record & send → transcribe + process
 
 Use /menu for quick access to all features!
 """
-    await update.message.reply_text(help_text.strip(), parse_mode="Markdown")
 
+# Pre-built reply kwargs, keyed by section (None for the main help menu)
+_HELP_PAYLOADS = {
+    section: {"text": _md_to_html(text.strip()), "parse_mode": "HTML"}
+    for section, text in HELP_SECTIONS.items()
+}
+_HELP_PAYLOADS[None] = {"text": _md_to_html(HELP_TEXT.strip()), "parse_mode": "HTML"}
 
-async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle /status command - show current status overview."""
-    chat_id = update.effective_chat.id
 
-    # Get pending counts
-    counts = db.get_pending_counts()
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /help command - show available commands."""
+    args = context.args
+
+    # Section-specific help, falling back to the main help menu
+    section = args[0].lower() if args else None
+    payload = _HELP_PAYLOADS.get(section, _HELP_PAYLOADS[None])
+    await update.message.reply_text(**payload)
 
-    # Get user config for semester info
-    user_config = db.get_user_config(chat_id)
 
-    status_text = f"""
-*Status Overview*
+# Reply template for /status
+STATUS_TEMPLATE = """*Status Overview*
 
-📝 Assignments: {counts['assignments']} pending
-📋 Tasks: {counts['tasks']} upcoming
-✅ TODOs: {counts['todos']} remaining
+📝 Assignments: {counts[assignments]} pending
+📋 Tasks: {counts[tasks]} upcoming
+✅ TODOs: {counts[todos]} remaining
 
-_Semester start: {'Not set' if not user_config or not user_config.get('semester_start_date') else user_config['semester_start_date']}_
-"""
-    await update.message.reply_text(status_text.strip(), parse_mode="Markdown")
+_Semester start: {semester_start}_"""
+
+
+async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /status command - show current status overview."""
+    chat_id = update.effective_chat.id
+
+    # Pending counts and semester info are independent reads
+    counts, user_config = await asyncio.gather(
+        asyncio.to_thread(db.get_pending_counts),
+        asyncio.to_thread(db.get_user_config, chat_id),
+    )
+
+    semester_start = (user_config or {}).get("semester_start_date") or "Not set"
+    await update.message.reply_text(
+        STATUS_TEMPLATE.format(counts=counts, semester_start=semester_start),
+        parse_mode="Markdown"
+    )
 
 
 async def tomorrow_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /tomorrow command - show tomorrow's classes."""
-    schedule = db.get_all_schedule()
-    events = db.get_all_events()
+    schedule, events = await asyncio.gather(
+        asyncio.to_thread(db.get_all_schedule),
+        asyncio.to_thread(db.get_all_events),
+    )
 
     response = format_tomorrow_classes(schedule, events, today=get_today())
     await update.message.reply_text(response)
@@ -453,8 +719,10 @@ async def tomorrow_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 
 async def today_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /today command - show today's classes."""
-    schedule = db.get_all_schedule()
-    events = db.get_all_events()
+    schedule, events = await asyncio.gather(
+        asyncio.to_thread(db.get_all_schedule),
+        asyncio.to_thread(db.get_all_events),
+    )
 
     response = format_today_classes(schedule, events, today=get_today())
     await update.message.reply_text(response)
@@ -464,17 +732,19 @@ async def week_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     """Handle /week command - show this week's schedule."""
     schedule = db.get_all_schedule()
     response = format_week_schedule(schedule)
-    await update.message.reply_text(response, parse_mode="Markdown")
+    await update.message.reply_text(response, parse_mode=_markdown_if_needed(response))
 
 
 async def week_number_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /week_number command - show current semester week."""
     chat_id = update.effective_chat.id
-    user_config = db.get_user_config(chat_id)
-    events = db.get_all_events()
+    user_config, events = await asyncio.gather(
+        asyncio.to_thread(_get_user_config, chat_id),
+        asyncio.to_thread(db.get_all_events),
+    )
 
     semester_start_str = user_config.get("semester_start_date") if user_config else None
-    semester_start = parse_date(semester_start_str) if semester_start_str else None
+    semester_start = user_config["_semester_start_date"] if user_config else None
 
     if not semester_start:
         await update.message.reply_text(
@@ -514,8 +784,10 @@ async def setsemester_command(update: Update, context: ContextTypes.DEFAULT_TYPE
 
     # Validate date format
     try:
-        parsed_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        db.update_user_config(chat_id, semester_start_date=date_str)
+        parsed_date = date.fromisoformat(date_str)
+        # fromisoformat also accepts compact forms like 20250106; store the
+        # canonical YYYY-MM-DD that the week calculation reads back
+        db.update_user_config(chat_id, semester_start_date=parsed_date.isoformat())
 
         await update.message.reply_text(
             f"✅ Semester start date set to: {parsed_date.strftime('%d %B %Y')}\n\n"
@@ -541,22 +813,21 @@ async def offday_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
 async def assignments_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /assignments command - list pending assignments."""
-    events = db.get_all_events()
+    (current_break, break_type), assignments = await asyncio.gather(
+        asyncio.to_thread(_get_current_break_with_type, get_today()),
+        asyncio.to_thread(db.get_pending_assignments),
+    )
 
     # Check if in inter-semester break
-    current_break = get_current_break(get_today(), events)
-    if current_break:
-        break_type = classify_break_event(current_break)
-        if break_type == BREAK_INTER_SEMESTER:
-            break_name = current_break.get("name_en") or current_break.get("name") or "Inter-semester Break"
-            await update.message.reply_text(
-                f"It's {break_name}!\n\n"
-                "No assignments to worry about during the break.\n"
-                "Enjoy your holiday!"
-            )
-            return
+    if break_type == BREAK_INTER_SEMESTER:
+        break_name = current_break.get("name_en") or current_break.get("name") or "Inter-semester Break"
+        await update.message.reply_text(
+            f"It's {break_name}!\n\n"
+            "No assignments to worry about during the break.\n"
+            "Enjoy your holiday!"
+        )
+        return
 
-    assignments = db.get_pending_assignments()
     response = format_pending_assignments(assignments)
     await update.message.reply_text(response)
 
@@ -591,42 +862,23 @@ async def done_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         return
 
     if len(args) >= 2:
-        item_type = args[0].lower()
+        item_type = ITEM_TYPE_ALIASES.get(args[0].lower())
         try:
             item_id = int(args[1])
         except ValueError:
             await update.message.reply_text("Invalid ID. Please provide a number.")
             return
 
-        if item_type in ("assignment", "a"):
-            item = db.get_assignment_by_id(item_id)
-            if item:
-                db.complete_assignment(item_id)
-                await update.message.reply_text(
-                    f"Marked '{item['title']}' as completed!"
-                )
-            else:
-                await update.message.reply_text(f"Assignment #{item_id} not found.")
-
-        elif item_type in ("task", "t"):
-            item = db.get_task_by_id(item_id)
+        if item_type in ITEM_TYPE_LABELS:
+            item = await asyncio.to_thread(db.complete_and_log, f"{item_type}s", item_id)
             if item:
-                db.complete_task(item_id)
                 await update.message.reply_text(
                     f"Marked '{item['title']}' as completed!"
                 )
             else:
-                await update.message.reply_text(f"Task #{item_id} not found.")
-
-        elif item_type in ("todo", "td"):
-            item = db.get_todo_by_id(item_id)
-            if item:
-                db.complete_todo(item_id)
                 await update.message.reply_text(
-                    f"Marked '{item['title']}' as completed!"
+                    f"{ITEM_TYPE_LABELS[item_type]} #{item_id} not found."
                 )
-            else:
-                await update.message.reply_text(f"TODO #{item_id} not found.")
 
         else:
             await update.message.reply_text(
@@ -759,8 +1011,7 @@ async def edit_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
             await update.message.reply_text("Invalid field. Use 'room' or 'lecturer'.")
             return
 
-        day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        day_name = day_names[slot.get("day_of_week", 0)]
+        day_name = DAY_NAMES[slot.get("day_of_week", 0)]
         subject = slot.get("subject_code", "Unknown")
         start = slot.get("start_time", "?")
         old_value = slot.get(field if field != "lecturer" else "lecturer_name", "Not set")
@@ -830,30 +1081,22 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
         response_lower = message_text.lower().strip()
         pending = context.user_data["pending_edit"]
 
-        if response_lower in ("yes", "y", "ya", "confirm"):
+        if response_lower in CONFIRM_YES:
             # Execute the edit
-            if pending["type"] == "schedule":
-                field = pending["field"]
-                if field == "room":
-                    db.update_schedule_slot(pending["id"], room=pending["new_value"])
-                elif field == "lecturer":
-                    db.update_schedule_slot(pending["id"], lecturer_name=pending["new_value"])
-                await update.message.reply_text(
-                    f"Updated! {pending['description']} {field} is now '{pending['new_value']}'."
-                )
-            elif pending["type"] == "assignment":
+            editor = PENDING_EDITORS.get(pending["type"])
+            if editor:
+                method, columns, template = editor
                 field = pending["field"]
-                if field == "due":
-                    db.update_assignment(pending["id"], due_date=pending["new_value"])
-                elif field == "title":
-                    db.update_assignment(pending["id"], title=pending["new_value"])
-                await update.message.reply_text(
-                    f"Updated! Assignment '{pending['description']}' {field} is now '{pending['new_value']}'."
-                )
+                column = columns.get(field)
+                if column:
+                    await asyncio.to_thread(
+                        getattr(db, method), pending["id"], **{column: pending["new_value"]}
+                    )
+                await update.message.reply_text(template.format(**pending))
             del context.user_data["pending_edit"]
             return
 
-        elif response_lower in ("no", "n", "tidak", "cancel"):
+        elif response_lower in CONFIRM_NO:
             del context.user_data["pending_edit"]
             await update.message.reply_text("Edit cancelled.")
             return
@@ -863,27 +1106,25 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
         response_lower = message_text.lower().strip()
         pending = context.user_data["pending_delete"]
 
-        if response_lower in ("yes", "y", "ya", "confirm"):
+        if response_lower in CONFIRM_YES:
             item_type = pending["type"]
             item_id = pending["id"]
             item_data = pending.get("data")
 
             deleted = None
-            if item_type in ("assignment", "a"):
-                deleted = db.delete_assignment(item_id)
-            elif item_type in ("task", "t"):
-                deleted = db.delete_task(item_id)
-            elif item_type in ("todo", "td"):
-                deleted = db.delete_todo(item_id)
+            if item_type in ("assignment", "task", "todo"):
+                deleted = await asyncio.to_thread(db.delete_and_log, f"{item_type}s", item_id)
             elif item_type == "online":
-                db.delete_online_override(item_id)
+                await asyncio.to_thread(db.delete_online_override, item_id)
                 deleted = True
+                if item_data:
+                    await asyncio.to_thread(db.add_action_history, "delete", "onlines", item_id, item_data)
             elif item_type == "event":
-                deleted = db.delete_event(item_id)
+                deleted = await asyncio.to_thread(db.delete_event, item_id)
+                if deleted and item_data:
+                    await asyncio.to_thread(db.add_action_history, "delete", "events", item_id, item_data)
 
             if deleted:
-                if item_data:
-                    db.add_action_history("delete", f"{item_type}s", item_id, item_data)
                 await update.message.reply_text(f"Deleted {item_type} '{pending['name']}'.")
             else:
                 await update.message.reply_text(f"{item_type.title()} not found.")
@@ -891,622 +1132,656 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
             del context.user_data["pending_delete"]
             return
 
-        elif response_lower in ("no", "n", "tidak", "cancel"):
+        elif response_lower in CONFIRM_NO:
             del context.user_data["pending_delete"]
             await update.message.reply_text("Delete cancelled.")
             return
 
     # Classify the intent
-    result = await classify_message(message_text)
+    result = await _classify_message_cached(message_text)
     intent = result.intent
     entities = result.entities
 
     logger.info(f"Classified intent: {intent.value} (confidence: {result.confidence})")
 
     # Route based on intent
-    if intent == Intent.QUERY_CURRENT_WEEK:
-        await week_number_command(update, context)
-
-    elif intent == Intent.QUERY_NEXT_WEEK:
-        chat_id = update.effective_chat.id
-        user_config = db.get_user_config(chat_id)
-        events = db.get_all_events()
-        semester_start_str = user_config.get("semester_start_date") if user_config else None
-        semester_start = parse_date(semester_start_str) if semester_start_str else None
+    handler = INTENT_DISPATCH.get(intent, _handle_unknown)
+    await handler(update, context, entities, message_text)
 
-        if semester_start:
-            week = get_next_week(get_today(), semester_start, events)
-            await update.message.reply_text(f"Next week is Week {week}")
-        else:
-            await update.message.reply_text(
-                "Semester start date not set. Use /setsemester YYYY-MM-DD to set it."
-            )
 
-    elif intent == Intent.QUERY_TODAY_CLASSES:
-        await today_command(update, context)
-
-    elif intent == Intent.QUERY_TOMORROW_CLASSES:
-        await tomorrow_command(update, context)
-
-    elif intent == Intent.QUERY_WEEK_CLASSES:
-        await week_command(update, context)
-
-    elif intent == Intent.QUERY_NEXT_OFFDAY:
-        await offday_command(update, context)
-
-    elif intent == Intent.QUERY_MIDTERM_BREAK:
-        events = db.get_all_events()
-        midterm = None
-        for event in events:
-            name = (event.get("name", "") + " " + event.get("name_en", "")).lower()
-            if "pertengahan" in name or "mid" in name:
-                if event.get("event_type") == "break":
-                    midterm = event
-                    break
-        if midterm:
-            start = midterm.get("start_date", "")
-            end = midterm.get("end_date", start)
-            name = midterm.get("name_en") or midterm.get("name", "Mid Semester Break")
-            await update.message.reply_text(f"{name}: {start} to {end}")
-        else:
-            await update.message.reply_text("Mid semester break dates not found in calendar.")
-
-    elif intent == Intent.QUERY_FINAL_EXAM:
-        events = db.get_all_events()
-        final = None
-        for event in events:
-            name = (event.get("name", "") + " " + event.get("name_en", "")).lower()
-            if ("akhir" in name or "final" in name) and event.get("event_type") == "exam":
-                final = event
-                break
-        if final:
-            start = final.get("start_date", "")
-            end = final.get("end_date", start)
-            name = final.get("name_en") or final.get("name", "Final Examination")
-            await update.message.reply_text(f"{name}: {start} to {end}")
-        else:
-            await update.message.reply_text("Final exam dates not found in calendar.")
-
-    elif intent == Intent.QUERY_MIDTERM_EXAM:
-        events = db.get_all_events()
-        midterm_exam = None
-        for event in events:
-            name = (event.get("name", "") + " " + event.get("name_en", "")).lower()
-            if ("pertengahan" in name or "mid" in name) and event.get("event_type") == "exam":
-                midterm_exam = event
-                break
-        if midterm_exam:
-            start = midterm_exam.get("start_date", "")
-            end = midterm_exam.get("end_date", start)
-            name = midterm_exam.get("name_en") or midterm_exam.get("name", "Mid Semester Examination")
-            await update.message.reply_text(f"{name}: {start} to {end}")
-        else:
-            await update.message.reply_text("Midterm exam dates not found in calendar.")
-
-    elif intent == Intent.EDIT_SCHEDULE:
-        # Natural language schedule edit - find matching schedule slot
-        subject_code = entities.subject_code
-        new_value = entities.title  # New room/lecturer value stored in title
-        if subject_code:
-            # Use fuzzy subject matching (supports subject name and code)
-            matching = db.get_schedule_by_subject(subject_code)
-            if matching:
-                slot = matching[0]  # Take first match
-                slot_id = slot.get("id")
-                day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-                day_name = day_names[slot.get("day_of_week", 0)]
-                subject = slot.get("subject_code", "Unknown")
-                start = slot.get("start_time", "?")
-
-                # Store pending edit
-                context.user_data["pending_edit"] = {
-                    "type": "schedule",
-                    "id": slot_id,
-                    "field": "room",  # Default to room
-                    "new_value": new_value,
-                    "description": f"{subject} ({day_name} {start})"
-                }
-
-                old_room = slot.get("room", "Not set")
-                await update.message.reply_text(
-                    f"Edit {subject} ({day_name} {start})?\n"
-                    f"Change room from '{old_room}' to '{new_value}'?\n\n"
-                    "Reply 'yes' to confirm or 'no' to cancel."
-                )
-            else:
-                await update.message.reply_text(f"No schedule found for subject '{subject_code}'.")
-        else:
-            await update.message.reply_text("Please specify a subject code.")
-
-    elif intent == Intent.EDIT_ASSIGNMENT:
-        # Natural language assignment edit
-        item_id = entities.item_id
-        new_value = entities.title  # New value stored in title
-        if item_id:
-            assignment = db.get_assignment_by_id(item_id)
-            if assignment:
-                title = assignment.get("title", "Unknown")
-                old_due = assignment.get("due_date", "Not set")
-
-                context.user_data["pending_edit"] = {
-                    "type": "assignment",
-                    "id": item_id,
-                    "field": "due",
-                    "new_value": new_value,
-                    "description": title
-                }
+def _run_command(command):
+    """Adapt a command handler to the intent handler signature."""
+    async def handler(update, context, entities, message_text):
+        await command(update, context)
+    return handler
 
-                await update.message.reply_text(
-                    f"Edit assignment '{title}'?\n"
-                    f"Change due date from '{old_due}' to '{new_value}'?\n\n"
-                    "Reply 'yes' to confirm or 'no' to cancel."
-                )
-            else:
-                await update.message.reply_text(f"Assignment #{item_id} not found.")
-        else:
-            await update.message.reply_text("Please specify an assignment ID.")
 
-    elif intent == Intent.SET_ONLINE:
-        # Natural language set online
-        subject_input = entities.subject_code
-        time_part = entities.title  # Contains week# or date
+async def _handle_query_next_week(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    entities: ParsedEntities,
+    message_text: str
+) -> None:
+    """Reply with next week's semester week number."""
+    chat_id = update.effective_chat.id
+    user_config, events = await asyncio.gather(
+        asyncio.to_thread(_get_user_config, chat_id),
+        asyncio.to_thread(db.get_all_events),
+    )
+    semester_start = user_config["_semester_start_date"] if user_config else None
 
-        if subject_input and time_part:
-            # Determine subject (None means all)
-            if subject_input.upper() == "ALL":
-                subject = None
-            else:
-                # Try to resolve subject name to code using aliases
-                aliases = db.get_subject_aliases()
-                subject = aliases.get(subject_input.lower(), subject_input.upper())
-
-            # Parse time part
-            week_number = None
-            specific_date = None
-
-            if "week" in time_part.lower():
-                try:
-                    week_number = int(time_part.lower().replace("week", "").strip())
-                except ValueError:
-                    await update.message.reply_text("Invalid week number.")
-                    return
-            elif time_part.lower() == "tomorrow":
-                tomorrow = get_today() + timedelta(days=1)
-                specific_date = tomorrow.isoformat()
-            elif time_part.lower() == "today":
-                specific_date = get_today().isoformat()
-            else:
-                specific_date = time_part
+    if semester_start:
+        week = get_next_week(get_today(), semester_start, events)
+        await update.message.reply_text(f"Next week is Week {week}")
+    else:
+        await update.message.reply_text(
+            "Semester start date not set. Use /setsemester YYYY-MM-DD to set it."
+        )
 
-            db.add_online_override(
-                subject_code=subject,
-                week_number=week_number,
-                specific_date=specific_date
-            )
 
-            subject_display = subject or "ALL classes"
-            if week_number:
-                await update.message.reply_text(
-                    f"Set {subject_display} as online for Week {week_number}."
-                )
-            else:
-                await update.message.reply_text(
-                    f"Set {subject_display} as online on {specific_date}."
-                )
+def _reply_event_period(category: str, default_name: str, not_found: str):
+    """Build an intent handler replying with the dates of a calendar period."""
+    async def handler(update, context, entities, message_text):
+        event = await asyncio.to_thread(db.get_event_by_category, category)
+        if event:
+            start = event.get("start_date", "")
+            end = event.get("end_date", start)
+            name = event.get("name_en") or event.get("name", default_name)
+            await update.message.reply_text(f"{name}: {start} to {end}")
         else:
+            await update.message.reply_text(not_found)
+    return handler
+
+
+async def _handle_edit_schedule(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    entities: ParsedEntities,
+    message_text: str
+) -> None:
+    """Stage a room change for a schedule slot, pending confirmation."""
+    # Natural language schedule edit - find matching schedule slot
+    subject_code = entities.subject_code
+    new_value = entities.title  # New room/lecturer value stored in title
+    if subject_code:
+        # Use fuzzy subject matching (supports subject name and code)
+        matching = db.get_schedule_by_subject(subject_code)
+        if matching:
+            slot = matching[0]  # Take first match
+            slot_id = slot.get("id")
+            day_name = DAY_NAMES[slot.get("day_of_week", 0)]
+            subject = slot.get("subject_code", "Unknown")
+            start = slot.get("start_time", "?")
+
+            # Store pending edit
+            context.user_data["pending_edit"] = {
+                "type": "schedule",
+                "id": slot_id,
+                "field": "room",  # Default to room
+                "new_value": new_value,
+                "description": f"{subject} ({day_name} {start})"
+            }
+
+            old_room = slot.get("room", "Not set")
             await update.message.reply_text(
-                "Please specify a subject and time. Example: 'set class BITP1113 online on week 12'"
-            )
-
-    elif intent == Intent.QUERY_ONLINE:
-        await online_command(update, context)
-
-    elif intent == Intent.ADD_EXAM:
-        # Natural language add exam
-        subject_input = entities.subject_code
-        exam_type = entities.title or "exam"
-        date_str = entities.date
-        exam_time = entities.time  # Time from user input
-        exam_location = entities.location  # Location from user input
-        class_type = entities.description  # LAB or LEC (from lab test pattern)
-
-        if subject_input:
-            # Try to resolve subject alias (OS -> Operating System / actual code)
-            aliases = db.get_subject_aliases()
-            subject = aliases.get(subject_input.lower(), subject_input.upper())
-
-            # Get user's semester config
-            chat_id = update.effective_chat.id
-            user_config = db.get_user_config(chat_id)
-            events = db.get_all_events()
-            semester_start_str = user_config.get("semester_start_date") if user_config else None
-            semester_start = parse_date(semester_start_str) if semester_start_str else None
-
-            # Determine the week number
-            week_num = None
-            if date_str:
-                date_str_check = date_str.lower() if date_str else ""
-                if "next week" in date_str_check or "minggu depan" in date_str_check:
-                    if semester_start:
-                        week_num = get_next_week(get_today(), semester_start, events)
-                elif "this week" in date_str_check or "minggu ni" in date_str_check:
-                    if semester_start:
-                        current_week = get_current_week(get_today(), semester_start, events)
-                        if isinstance(current_week, int):
-                            week_num = current_week
-
-            # Look up the schedule to find the actual day (only for week-based dates)
-            actual_date = None
-            schedule_day = None
-            schedule_time = None
-
-            if week_num and semester_start:
-                # Find the schedule slot for this subject and class type
-                schedule_slots = db.get_schedule_by_subject(subject)
-                target_slot = None
-
-                if class_type and schedule_slots:
-                    # Filter by class type (LAB or LEC)
-                    for slot in schedule_slots:
-                        if slot.get("class_type", "").upper() == class_type:
-                            target_slot = slot
-                            break
-
-                # If no class type match or no class type specified, use first slot
-                if not target_slot and schedule_slots:
-                    target_slot = schedule_slots[0]
-
-                if target_slot:
-                    day_of_week = target_slot.get("day_of_week", 0)  # 0=Monday
-                    schedule_time = target_slot.get("start_time")
-                    day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-                    schedule_day = day_names[day_of_week]
-
-                    # Calculate actual date: semester_start + (week_num - 1) * 7 + day_of_week
-                    week_start = semester_start + timedelta(weeks=(week_num - 1))
-                    actual_date = week_start + timedelta(days=day_of_week)
-                    date_str = actual_date.isoformat()
-
-            # Use time from user input if no schedule lookup, or user provided specific time
-            final_time = exam_time or schedule_time
-
-            # Build exam name with class type and location
-            exam_name = exam_type.replace("labtest", "Lab Test").replace("lab test", "Lab Test").title()
-            if class_type:
-                exam_name = f"{exam_name} ({class_type})"
-
-            # Build full name with location if provided
-            full_name = f"{exam_name} - {subject}"
-            if exam_location:
-                full_name += f" at {exam_location.upper()}"
-
-            exam_id = db.add_exam(
-                subject_code=subject,
-                exam_type=exam_type,
-                exam_date=date_str,
-                exam_time=final_time,
-                name=full_name
+                f"Edit {subject} ({day_name} {start})?\n"
+                f"Change room from '{old_room}' to '{new_value}'?\n\n"
+                "Reply 'yes' to confirm or 'no' to cancel."
             )
-            db.add_action_history("add", "events", exam_id)
-
-            # Build response
-            response = f"✅ {exam_name} added for {subject}"
-            if actual_date and schedule_day:
-                response += f"\n📅 {schedule_day}, {actual_date.strftime('%d %b %Y')}"
-                if week_num:
-                    response += f" (Week {week_num})"
-            elif date_str:
-                # Try to format the date nicely
-                try:
-                    parsed = datetime.strptime(date_str, "%Y-%m-%d")
-                    response += f"\n📅 {parsed.strftime('%A, %d %b %Y')}"
-                except ValueError:
-                    response += f" on {date_str}"
-            if final_time:
-                response += f"\n⏰ {final_time}"
-            if exam_location:
-                response += f"\n📍 {exam_location.upper()}"
-            response += f"\n🔔 Reminders will be sent before the exam"
-            response += f"\nID: {exam_id}"
-
-            await update.message.reply_text(response)
         else:
-            await update.message.reply_text(
-                "Please specify subject and date. Example:\n"
-                "💬 \"Lab test for OS next week on lab section\"\n"
-                "💬 \"Final exam BITP1113 on 15 Jan 2025\"\n"
-                "💬 \"Final exam Algo 26 jan 9am at BK FPTT\""
-            )
-
-    elif intent == Intent.QUERY_EXAMS:
-        await exams_command(update, context)
-
-    elif intent == Intent.DELETE_ITEM:
-        # Natural language delete
-        item_type = entities.item_type
-        item_id = entities.item_id
+            await update.message.reply_text(f"No schedule found for subject '{subject_code}'.")
+    else:
+        await update.message.reply_text("Please specify a subject code.")
+
+
+async def _handle_edit_assignment(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    entities: ParsedEntities,
+    message_text: str
+) -> None:
+    """Stage an assignment due date change, pending confirmation."""
+    # Natural language assignment edit
+    item_id = entities.item_id
+    new_value = entities.title  # New value stored in title
+    if item_id:
+        assignment = db.get_assignment_by_id(item_id)
+        if assignment:
+            title = assignment.get("title", "Unknown")
+            old_due = assignment.get("due_date", "Not set")
+
+            context.user_data["pending_edit"] = {
+                "type": "assignment",
+                "id": item_id,
+                "field": "due",
+                "new_value": new_value,
+                "description": title
+            }
 
-        if item_type and item_id:
-            # Simulate /delete command
-            context.args = [item_type, str(item_id)]
-            await delete_command(update, context)
-        else:
             await update.message.reply_text(
-                "Please specify what to delete. Example:\n"
-                "\"delete assignment 5\""
+                f"Edit assignment '{title}'?\n"
+                f"Change due date from '{old_due}' to '{new_value}'?\n\n"
+                "Reply 'yes' to confirm or 'no' to cancel."
             )
-
-    elif intent == Intent.SEARCH_ALL:
-        # Natural language search
-        query = entities.title
-        if query:
-            context.args = [query]
-            await search_command(update, context)
         else:
-            await update.message.reply_text("What would you like to search for?")
-
-    elif intent == Intent.QUERY_STATS:
-        await stats_command(update, context)
-
-    elif intent == Intent.SET_LANGUAGE:
-        chat_id = update.effective_chat.id
-        lang = entities.title or "en"
-        db.set_language(chat_id, lang)
-        if lang == "my":
-            await update.message.reply_text("Bahasa ditetapkan kepada Bahasa Melayu.")
+            await update.message.reply_text(f"Assignment #{item_id} not found.")
+    else:
+        await update.message.reply_text("Please specify an assignment ID.")
+
+
+async def _handle_set_online(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    entities: ParsedEntities,
+    message_text: str
+) -> None:
+    """Mark a class (or all classes) as online for a week or date."""
+    # Natural language set online
+    subject_input = entities.subject_code
+    time_part = entities.title  # Contains week# or date
+
+    if subject_input and time_part:
+        # Determine subject (None means all)
+        if subject_input.upper() == "ALL":
+            subject = None
         else:
-            await update.message.reply_text("Language set to English.")
+            # Try to resolve subject name to code using aliases
+            aliases = db.get_subject_aliases()
+            subject = aliases.get(subject_input.lower(), subject_input.upper())
 
-    elif intent == Intent.MUTE_NOTIFICATIONS:
-        chat_id = update.effective_chat.id
-        duration = int(entities.title or "1")
-        unit = entities.description or "hour"
+        # Parse time part
+        week_number = None
+        specific_date = None
 
-        if "min" in unit:
-            hours = duration / 60
+        time_lower = time_part.lower()
+        if "week" in time_lower:
+            try:
+                week_number = int(time_lower.replace("week", "").strip())
+            except ValueError:
+                await update.message.reply_text("Invalid week number.")
+                return
+        elif time_lower == "tomorrow":
+            tomorrow = get_today() + timedelta(days=1)
+            specific_date = tomorrow.isoformat()
+        elif time_lower == "today":
+            specific_date = get_today().isoformat()
         else:
-            hours = duration
-
-        mute_until = (datetime.now() + timedelta(hours=hours)).isoformat()
-        db.set_mute_until(chat_id, mute_until)
+            specific_date = time_part
 
-        await update.message.reply_text(
-            f"🔇 Notifications muted for {duration} {unit}(s)."
+        db.add_online_override(
+            subject_code=subject,
+            week_number=week_number,
+            specific_date=specific_date
         )
 
-    elif intent == Intent.QUERY_ASSIGNMENTS:
-        await assignments_command(update, context)
-
-    elif intent == Intent.QUERY_TASKS:
-        await tasks_command(update, context)
-
-    elif intent == Intent.QUERY_TODOS:
-        await todos_command(update, context)
-
-    elif intent == Intent.ADD_ASSIGNMENT:
-        data = build_assignment_from_entities(entities)
-        if data.get("title") and data.get("due_date"):
-            assignment_id = db.add_assignment(
-                title=data["title"],
-                due_date=data["due_date"],
-                subject_code=data.get("subject_code"),
-                description=data.get("description")
-            )
-            await update.message.reply_text(
-                f"Assignment added: '{data['title']}'\n"
-                f"Due: {data['due_date']}\n"
-                f"ID: {assignment_id}"
-            )
-        else:
-            await update.message.reply_text(
-                "I understood you want to add an assignment, but I need more details.\n"
-                "Try: 'Assignment [title] for [subject] due [date time]'"
-            )
-
-    elif intent == Intent.ADD_TASK:
-        data = build_task_from_entities(entities)
-        if data.get("title"):
-            task_id = db.add_task(
-                title=data["title"],
-                scheduled_date=data.get("scheduled_date") or get_today().isoformat(),
-                description=data.get("description"),
-                scheduled_time=data.get("scheduled_time"),
-                location=data.get("location")
-            )
-            response_msg = f"Task added: '{data['title']}'\n"
-            response_msg += f"Scheduled: {data.get('scheduled_date', 'Today')}"
-            if data.get("scheduled_time"):
-                response_msg += f" at {data['scheduled_time']}"
-            if data.get("location"):
-                response_msg += f"\nLocation: {data['location']}"
-            response_msg += f"\nID: {task_id}"
-            await update.message.reply_text(response_msg)
-        else:
-            await update.message.reply_text(
-                "I understood you want to add a task, but I need more details.\n"
-                "Try: 'Meet [person] on [date] at [time]'"
-            )
-
-    elif intent == Intent.ADD_TODO:
-        data = build_todo_from_entities(entities)
-        if data.get("title"):
-            todo_id = db.add_todo(
-                title=data["title"],
-                scheduled_date=data.get("scheduled_date"),
-                scheduled_time=data.get("scheduled_time")
-            )
+        subject_display = subject or "ALL classes"
+        if week_number:
             await update.message.reply_text(
-                f"TODO added: '{data['title']}'\n"
-                f"ID: {todo_id}"
+                f"Set {subject_display} as online for Week {week_number}."
             )
         else:
             await update.message.reply_text(
-                "What would you like to add to your TODO list?"
+                f"Set {subject_display} as online on {specific_date}."
             )
+    else:
+        await update.message.reply_text(
+            "Please specify a subject and time. Example: 'set class BITP1113 online on week 12'"
+        )
+
+
+async def _handle_add_exam(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    entities: ParsedEntities,
+    message_text: str
+) -> None:
+    """Add an exam, resolving relative weeks against the timetable."""
+    # Natural language add exam
+    subject_input = entities.subject_code
+    exam_type = entities.title or "exam"
+    date_str = entities.date
+    exam_time = entities.time  # Time from user input
+    exam_location = entities.location  # Location from user input
+    class_type = entities.description  # LAB or LEC (from lab test pattern)
+
+    if subject_input:
+        # Try to resolve subject alias (OS -> Operating System / actual code)
+        aliases = db.get_subject_aliases()
+        subject = aliases.get(subject_input.lower(), subject_input.upper())
+
+        # Get user's semester config
+        chat_id = update.effective_chat.id
+        user_config = _get_user_config(chat_id)
+        semester_start = user_config["_semester_start_date"] if user_config else None
+
+        # Determine the week number
+        week_num = None
+        week_match = RELATIVE_WEEK_RE.search(date_str) if date_str else None
+        if week_match and semester_start:
+            events = db.get_break_events()
+            if week_match.group().lower() in NEXT_WEEK_PHRASES:
+                week_num = get_next_week(get_today(), semester_start, events)
+            else:
+                current_week = get_current_week(get_today(), semester_start, events)
+                if isinstance(current_week, int):
+                    week_num = current_week
+
+        # Look up the schedule to find the actual day (only for week-based dates)
+        actual_date = None
+        schedule_day = None
+        schedule_time = None
+
+        if week_num and semester_start:
+            # Find the schedule slot for this subject, preferring the class type (LAB or LEC)
+            schedule_slots = db.get_schedule_by_subject(subject, class_type=class_type, limit=1)
+            target_slot = schedule_slots[0] if schedule_slots else None
+
+            if target_slot:
+                day_of_week = target_slot.get("day_of_week", 0)  # 0=Monday
+                schedule_time = target_slot.get("start_time")
+                schedule_day = DAY_NAMES[day_of_week]
+
+                # Calculate actual date: semester_start + (week_num - 1) * 7 + day_of_week
+                week_start = semester_start + timedelta(weeks=(week_num - 1))
+                actual_date = week_start + timedelta(days=day_of_week)
+                date_str = actual_date.isoformat()
+
+        # Use time from user input if no schedule lookup, or user provided specific time
+        final_time = exam_time or schedule_time
+
+        # Build exam name with class type and location
+        exam_name = exam_type.replace("labtest", "Lab Test").replace("lab test", "Lab Test").title()
+        if class_type:
+            exam_name = f"{exam_name} ({class_type})"
+
+        # Build full name with location if provided
+        full_name = f"{exam_name} - {subject}"
+        if exam_location:
+            full_name += f" at {exam_location.upper()}"
+
+        exam_id = db.add_exam_and_log(
+            subject_code=subject,
+            exam_type=exam_type,
+            exam_date=date_str,
+            exam_time=final_time,
+            name=full_name
+        )
+
+        # Build response
+        parts = [f"✅ {exam_name} added for {subject}"]
+        if actual_date and schedule_day:
+            when = f"📅 {schedule_day}, {actual_date.strftime('%d %b %Y')}"
+            if week_num:
+                when += f" (Week {week_num})"
+            parts.append(when)
+        elif date_str:
+            # Try to format the date nicely
+            try:
+                parsed = date.fromisoformat(date_str)
+                parts.append(f"📅 {parsed.strftime('%A, %d %b %Y')}")
+            except ValueError:
+                parts[0] += f" on {date_str}"
+        if final_time:
+            parts.append(f"⏰ {final_time}")
+        if exam_location:
+            parts.append(f"📍 {exam_location.upper()}")
+        parts.append("🔔 Reminders will be sent before the exam")
+        parts.append(f"ID: {exam_id}")
+
+        await update.message.reply_text("\n".join(parts))
+    else:
+        await update.message.reply_text(
+            "Please specify subject and date. Example:\n"
+            "💬 \"Lab test for OS next week on lab section\"\n"
+            "💬 \"Final exam BITP1113 on 15 Jan 2025\"\n"
+            "💬 \"Final exam Algo 26 jan 9am at BK FPTT\""
+        )
 
-    elif intent in (Intent.COMPLETE_ASSIGNMENT, Intent.COMPLETE_TASK, Intent.COMPLETE_TODO):
-        # Try to find the matching item
-        pending_items = {
-            "assignments": db.get_pending_assignments(),
-            "tasks": db.get_upcoming_tasks(),
-            "todos": db.get_pending_todos()
-        }
 
-        match = await extract_completion_target(message_text, pending_items)
+async def _handle_delete_item(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    entities: ParsedEntities,
+    message_text: str
+) -> None:
+    """Route a natural language delete to /delete."""
+    # Natural language delete
+    item_type = entities.item_type
+    item_id = entities.item_id
 
-        if match:
-            item_type, item = match
-            if item_type == "assignment":
-                db.complete_assignment(item["id"])
-                await update.message.reply_text(
-                    f"Marked assignment '{item['title']}' as completed!"
-                )
-            elif item_type == "task":
-                db.complete_task(item["id"])
-                await update.message.reply_text(
-                    f"Marked task '{item['title']}' as completed!"
-                )
-            elif item_type == "todo":
-                db.complete_todo(item["id"])
-                await update.message.reply_text(
-                    f"Marked TODO '{item['title']}' as completed!"
-                )
-        else:
-            await update.message.reply_text(
-                "I couldn't find which item you want to mark as done.\n"
-                "Try: /done assignment 1, /done task 2, or /done todo 3"
-            )
+    if item_type and item_id:
+        # Simulate /delete command
+        context.args = [item_type, str(item_id)]
+        await delete_command(update, context)
+    else:
+        await update.message.reply_text(
+            "Please specify what to delete. Example:\n"
+            "\"delete assignment 5\""
+        )
+
+
+async def _handle_search_all(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    entities: ParsedEntities,
+    message_text: str
+) -> None:
+    """Route a natural language search to /search."""
+    # Natural language search
+    query = entities.title
+    if query:
+        context.args = [query]
+        await search_command(update, context)
+    else:
+        await update.message.reply_text("What would you like to search for?")
 
-    elif intent == Intent.GENERAL_CHAT:
-        # Simple responses for general chat
-        msg_lower = message_text.lower()
-        # Islamic greeting - respond appropriately
-        if any(g in msg_lower for g in ["assalamualaikum", "salam", "aslm", "slm"]):
-            await update.message.reply_text(
-                "Waalaikumussalam! 👋\n\nHow can I help you today?\nTry /menu for quick access."
-            )
-        # Regular greeting
-        elif any(g in msg_lower for g in ["hi", "hello", "hey", "helo", "hai"]):
-            await update.message.reply_text(
-                "Hello! 👋\n\nHow can I help you today?\nTry /menu for quick access."
-            )
-        elif any(t in msg_lower for t in ["thank", "thanks", "terima kasih"]):
-            await update.message.reply_text("You're welcome! 😊 Let me know if you need anything else.")
-        elif any(b in msg_lower for b in ["bye", "goodbye", "see you"]):
-            await update.message.reply_text("Goodbye! Good luck with your studies! 📚")
-        else:
-            await update.message.reply_text(
-                "I'm here to help with your schedule and tasks.\n\n"
-                "Try: \"What class tomorrow?\" or use /menu"
-            )
 
+async def _handle_set_language(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    entities: ParsedEntities,
+    message_text: str
+) -> None:
+    """Set the reply language."""
+    chat_id = update.effective_chat.id
+    lang = entities.title or "en"
+    db.set_language(chat_id, lang)
+    if lang == "my":
+        await update.message.reply_text("Bahasa ditetapkan kepada Bahasa Melayu.")
     else:
-        await update.message.reply_text(
-            "🤔 I'm not sure what you mean.\n\n"
-            "Try:\n"
-            "📅 \"What class tomorrow?\"\n"
-            "📝 \"Assignment report due Friday\"\n"
-            "✅ \"Remind me buy groceries at 3pm\"\n\n"
-            "Use /menu for quick access or /help for all commands."
-        )
+        await update.message.reply_text("Language set to English.")
 
 
-async def handle_photo_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle incoming photo messages - detect type and parse."""
+async def _handle_mute_notifications(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    entities: ParsedEntities,
+    message_text: str
+) -> None:
+    """Mute notifications for the requested duration."""
     chat_id = update.effective_chat.id
+    duration = int(entities.title or "1")
+    unit = entities.description or "hour"
+    hours = duration * MUTE_UNIT_HOURS.get(unit.lower().rstrip("s"), 1)
 
-    # Get the largest photo
-    photo = update.message.photo[-1]
-    file = await photo.get_file()
-    image_bytes = await file.download_as_bytearray()
+    mute_until = (datetime.now() + timedelta(hours=hours)).isoformat()
+    db.set_mute_until(chat_id, mute_until)
 
-    await update.message.reply_text("Analyzing image... Please wait.")
+    await update.message.reply_text(
+        f"🔇 Notifications muted for {duration} {unit}(s)."
+    )
 
-    # Detect image type
-    image_type = await detect_image_type(bytes(image_bytes))
 
-    if image_type == "calendar":
+async def _handle_add_assignment(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    entities: ParsedEntities,
+    message_text: str
+) -> None:
+    """Add an assignment from the parsed entities."""
+    data = build_assignment_from_entities(entities)
+    if data.get("title") and data.get("due_date"):
+        assignment_id = db.add_assignment(
+            title=data["title"],
+            due_date=data["due_date"],
+            subject_code=data.get("subject_code"),
+            description=data.get("description")
+        )
         await update.message.reply_text(
-            "This looks like an academic calendar!\n"
-            "Processing... Please wait."
-        )
-        # Process the calendar image
-        events = await parse_academic_calendar(bytes(image_bytes))
-        if events:
-            # Store events - unpack AcademicEvent dataclass
-            for event in events:
-                db.add_event(
-                    event_type=event.event_type,
-                    start_date=event.start_date,
-                    name=event.name,
-                    name_en=event.name_en,
-                    end_date=event.end_date,
-                    affects_classes=event.affects_classes
-                )
-            # Try to detect semester start from lecture_period event
-            for event in events:
-                if event.event_type == 'lecture_period':
-                    db.update_user_config(chat_id, semester_start_date=event.start_date)
-                    break
-            await update.message.reply_text(
-                f"✅ Imported {len(events)} events from calendar!\n"
-                f"Use /week_number to check current week."
-            )
-        else:
-            await update.message.reply_text(
-                "Couldn't extract events from this image.\n"
-                "Please try with a clearer image."
-            )
+            f"Assignment added: '{data['title']}'\n"
+            f"Due: {data['due_date']}\n"
+            f"ID: {assignment_id}"
+        )
+    else:
+        await update.message.reply_text(
+            "I understood you want to add an assignment, but I need more details.\n"
+            "Try: 'Assignment [title] for [subject] due [date time]'"
+        )
+
+
+async def _handle_add_task(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    entities: ParsedEntities,
+    message_text: str
+) -> None:
+    """Add a task from the parsed entities."""
+    draft = build_task_from_entities(entities)
+    if draft.title:
+        task_id = db.add_task(
+            title=draft.title,
+            scheduled_date=draft.scheduled_date or get_today().isoformat(),
+            description=draft.description,
+            scheduled_time=draft.scheduled_time,
+            location=draft.location
+        )
+        at_time = f" at {draft.scheduled_time}" if draft.scheduled_time else ""
+        location = f"\nLocation: {draft.location}" if draft.location else ""
+        await update.message.reply_text(
+            f"Task added: '{draft.title}'\n"
+            f"Scheduled: {draft.scheduled_date or 'Today'}{at_time}{location}\n"
+            f"ID: {task_id}"
+        )
+    else:
+        await update.message.reply_text(
+            "I understood you want to add a task, but I need more details.\n"
+            "Try: 'Meet [person] on [date] at [time]'"
+        )
 
-    elif image_type == "timetable":
+
+async def _handle_add_todo(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    entities: ParsedEntities,
+    message_text: str
+) -> None:
+    """Add a TODO from the parsed entities."""
+    data = build_todo_from_entities(entities)
+    if data.get("title"):
+        todo_id = db.add_todo(
+            title=data["title"],
+            scheduled_date=data.get("scheduled_date"),
+            scheduled_time=data.get("scheduled_time")
+        )
         await update.message.reply_text(
-            "This looks like a class timetable!\n"
-            "Processing... Please wait."
-        )
-        # Process the timetable image
-        schedule_entries = await parse_timetable(bytes(image_bytes))
-        if schedule_entries:
-            # Store schedule slots - unpack ScheduleSlot dataclass
-            for entry in schedule_entries:
-                db.add_schedule_slot(
-                    day_of_week=entry.day_of_week,
-                    start_time=entry.start_time,
-                    end_time=entry.end_time,
-                    subject_code=entry.subject_code,
-                    subject_name=entry.subject_name,
-                    class_type=entry.class_type,
-                    room=entry.room,
-                    lecturer_name=entry.lecturer_name
-                )
-            await update.message.reply_text(
-                f"✅ Imported {len(schedule_entries)} class entries!\n"
-                f"Use /today or /week to see your schedule."
-            )
-        else:
-            await update.message.reply_text(
-                "Couldn't extract schedule from this image.\n"
-                "Please try with a clearer image."
-            )
+            f"TODO added: '{data['title']}'\n"
+            f"ID: {todo_id}"
+        )
+    else:
+        await update.message.reply_text(
+            "What would you like to add to your TODO list?"
+        )
+
 
-    elif image_type == "assignment":
-        response = await handle_assignment_image(update, context, bytes(image_bytes))
-        await update.message.reply_text(response)
+async def _handle_complete_item(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    entities: ParsedEntities,
+    message_text: str
+) -> None:
+    """Mark the pending item the message refers to as completed."""
+    # Try to find the matching item
+    pending_items = await asyncio.to_thread(db.get_completion_candidates)
 
+    match = await extract_completion_target(message_text, pending_items)
+
+    if match:
+        item_type, item = match
+        if item_type in ITEM_TYPE_LABELS:
+            completed = await asyncio.to_thread(db.complete_and_log, f"{item_type}s", item["id"])
+            label = ITEM_TYPE_LABELS[item_type]
+            if completed:
+                await update.message.reply_text(
+                    f"Marked {label} '{completed['title']}' as completed!"
+                )
+            else:
+                # Completed or deleted between the lookup and the update
+                await update.message.reply_text(f"That {label} is no longer pending.")
+    else:
+        await update.message.reply_text(
+            "I couldn't find which item you want to mark as done.\n"
+            "Try: /done assignment 1, /done task 2, or /done todo 3"
+        )
+
+
+async def _handle_general_chat(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    entities: ParsedEntities,
+    message_text: str
+) -> None:
+    """Reply to greetings, thanks and other small talk."""
+    # One scan finds every keyword; the highest-priority category answers
+    rank = min(
+        (SMALL_TALK_RANK[match.lower()] for match in SMALL_TALK_RE.findall(message_text)),
+        default=None
+    )
+    if rank is not None:
+        await update.message.reply_text(SMALL_TALK_REPLIES[rank][1])
     else:
         await update.message.reply_text(
-            "🤔 I couldn't determine the type of this image.\n\n"
-            "I can recognize:\n"
-            "📅 Academic calendars → auto-import events\n"
-            "🗓️ Class timetables → auto-import schedule\n"
-            "📝 Assignment sheets → auto-add assignment\n\n"
-            "Try with a clearer image or use /setup for guided upload."
+            "I'm here to help with your schedule and tasks.\n\n"
+            "Try: \"What class tomorrow?\" or use /menu"
+        )
+
+
+async def _handle_unknown(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    entities: ParsedEntities,
+    message_text: str
+) -> None:
+    """Reply to messages that could not be classified."""
+    await update.message.reply_text(
+        "🤔 I'm not sure what you mean.\n\n"
+        "Try:\n"
+        "📅 \"What class tomorrow?\"\n"
+        "📝 \"Assignment report due Friday\"\n"
+        "✅ \"Remind me buy groceries at 3pm\"\n\n"
+        "Use /menu for quick access or /help for all commands."
+    )
+
+
+async def _handle_calendar_image(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    image_bytes: bytes
+) -> None:
+    """Import academic calendar events from a photo."""
+    await update.message.reply_text(
+        "This looks like an academic calendar!\n"
+        "Processing... Please wait."
+    )
+    events = await parse_academic_calendar(image_bytes)
+    if not events:
+        await update.message.reply_text(
+            "Couldn't extract events from this image.\n"
+            "Please try with a clearer image."
+        )
+        return
+
+    # Store events in one transaction, detecting semester start
+    # from the lecture_period event in the same pass
+    rows = []
+    semester_start = None
+    for event in events:
+        rows.append(asdict(event))
+        if semester_start is None and event.event_type == 'lecture_period':
+            semester_start = event.start_date
+    db.add_events_bulk(rows)
+    if semester_start:
+        db.update_user_config(update.effective_chat.id, semester_start_date=semester_start)
+    await update.message.reply_text(
+        f"✅ Imported {len(events)} events from calendar!\n"
+        f"Use /week_number to check current week."
+    )
+
+
+async def _handle_timetable_image(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    image_bytes: bytes
+) -> None:
+    """Import weekly schedule slots from a photo."""
+    await update.message.reply_text(
+        "This looks like a class timetable!\n"
+        "Processing... Please wait."
+    )
+    schedule_entries = await parse_timetable(image_bytes)
+    if not schedule_entries:
+        await update.message.reply_text(
+            "Couldn't extract schedule from this image.\n"
+            "Please try with a clearer image."
         )
+        return
+
+    # Store schedule slots in one transaction
+    db.add_schedule_slots_bulk([asdict(entry) for entry in schedule_entries])
+    await update.message.reply_text(
+        f"✅ Imported {len(schedule_entries)} class entries!\n"
+        f"Use /today or /week to see your schedule."
+    )
+
+
+async def _handle_assignment_photo(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    image_bytes: bytes
+) -> None:
+    """Add an assignment from a photo of the assignment sheet."""
+    response = await handle_assignment_image(update, context, image_bytes)
+    await update.message.reply_text(response)
+
+
+async def _handle_unknown_image(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    image_bytes: bytes
+) -> None:
+    """Explain which kinds of images are supported."""
+    await update.message.reply_text(
+        "🤔 I couldn't determine the type of this image.\n\n"
+        "I can recognize:\n"
+        "📅 Academic calendars → auto-import events\n"
+        "🗓️ Class timetables → auto-import schedule\n"
+        "📝 Assignment sheets → auto-add assignment\n\n"
+        "Try with a clearer image or use /setup for guided upload."
+    )
+
+
+# Detected image type -> handler, each called as handler(update, context, image_bytes)
+IMAGE_DISPATCH = {
+    "calendar": _handle_calendar_image,
+    "timetable": _handle_timetable_image,
+    "assignment": _handle_assignment_photo,
+}
+
+
+async def handle_photo_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle incoming photo messages - detect type and parse."""
+    # Get the largest photo
+    photo = update.message.photo[-1]
+
+    # Telegram reports the size up front, so thumbnails skip the vision model
+    if not could_be_document_image(photo.width, photo.height):
+        await _handle_unknown_image(update, context, b"")
+        return
+
+    file = await photo.get_file()
+    # Downloaded once; detection and parsing both reuse these bytes
+    image_bytes = await download_file_bytes(file)
+
+    await update.message.reply_text("Analyzing image... Please wait.")
+
+    # Detect image type
+    image_type = await detect_image_type(image_bytes)
+
+    handler = IMAGE_DISPATCH.get(image_type, _handle_unknown_image)
+    await handler(update, context, image_bytes)
 
 
 async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle incoming voice messages - transcribe and offer processing options."""
-    from ..ai.gemini_client import get_gemini_client
-
     voice = update.message.voice
     chat_id = update.effective_chat.id
 
@@ -1524,11 +1799,11 @@ async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYP
     try:
         # Download the voice file
         file = await voice.get_file()
-        audio_bytes = await file.download_as_bytearray()
+        audio_bytes = await download_file_bytes(file)
 
         # Transcribe using Gemini
         gemini = get_gemini_client()
-        transcript = await gemini.transcribe_audio(bytes(audio_bytes), "audio/ogg")
+        transcript = await gemini.transcribe_audio(audio_bytes, "audio/ogg")
 
         if not transcript:
             await update.message.reply_text(
@@ -1537,11 +1812,13 @@ async def handle_voice_message(update: Update, context: ContextTypes.DEFAULT_TYP
             return
 
         # Store transcript temporarily for processing
-        context.user_data["pending_voice"] = {
-            "transcript": transcript,
-            "duration": duration,
-            "message_id": update.message.message_id
-        }
+        await asyncio.to_thread(
+            db.save_pending_voice,
+            update.effective_chat.id,
+            update.message.message_id,
+            transcript,
+            duration
+        )
 
         # Show preview and processing options
         preview = transcript[:300] + "..." if len(transcript) > 300 else transcript
@@ -1575,6 +1852,7 @@ async def notes_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             if not notes:
                 await update.message.reply_text(f"No notes found for '{query}'.")
                 return
+            _remember_notes(context, notes[:10])
 
             lines = [f"🔍 Found {len(notes)} note(s) for '{query}':"]
             for note in notes[:10]:
@@ -1622,6 +1900,7 @@ async def notes_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
     # List all notes
     notes = db.get_voice_notes(chat_id, limit=10)
+    _remember_notes(context, notes)
 
     if not notes:
         await update.message.reply_text(
@@ -1651,8 +1930,6 @@ async def notes_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
 async def suggest_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /suggest command - get AI-powered suggestions."""
-    from ..ai.gemini_client import get_gemini_client
-
     await update.message.reply_text("🤔 Analyzing your tasks and schedule...")
 
     try:
@@ -1677,8 +1954,7 @@ async def suggest_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             return
 
         # Get AI suggestions
-        gemini = get_gemini_client()
-        suggestions = await gemini.get_ai_suggestions(data)
+        suggestions = await _get_ai_suggestions_cached(data)
 
         if not suggestions:
             await update.message.reply_text(
@@ -1714,7 +1990,10 @@ async def setdate_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
 
     try:
-        test_date = datetime.strptime(args[0], "%Y-%m-%d").date()
+        match = TEST_DATE_RE.fullmatch(args[0])
+        if not match:
+            raise ValueError(args[0])
+        test_date = date(*map(int, match.groups()))
         _test_date_override = test_date
         await update.message.reply_text(
             f"Test date set to: {test_date.isoformat()}\n"
@@ -1754,7 +2033,10 @@ async def settime_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
 
     try:
-        test_time = datetime.strptime(args[0], "%H:%M").time()
+        match = TEST_TIME_RE.fullmatch(args[0])
+        if not match:
+            raise ValueError(args[0])
+        test_time = time(*map(int, match.groups()))
         _test_time_override = test_time
         await update.message.reply_text(
             f"Test time set to: {test_time.strftime('%H:%M')}\n"
@@ -1778,37 +2060,40 @@ async def resettime_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
     )
 
 
+# /trigger name -> NotificationScheduler method
+VALID_TRIGGERS = {
+    "briefing": "send_class_briefing",
+    "offday": "send_offday_alert",
+    "midnight": "send_midnight_todo_review",
+    "assignments": "check_assignment_reminders",
+    "tasks": "check_task_reminders",
+    "todos": "check_todo_reminders",
+    "exams": "check_exam_reminders",
+    "semester": "check_semester_starting",
+}
+TRIGGER_OPTIONS = ", ".join(VALID_TRIGGERS)
+TRIGGER_USAGE = (
+    "Usage: /trigger <notification_type>\n\n"
+    "Available triggers:\n"
+    + "\n".join(f"  • {name}" for name in VALID_TRIGGERS)
+    + "\n\nExample: /trigger briefing"
+)
+
+
 async def trigger_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /trigger command - manually trigger a notification for testing."""
     from ..scheduler.notifications import get_scheduler
-    from ..utils.semester_logic import is_class_day
 
     args = context.args
-    valid_triggers = {
-        "briefing": "send_class_briefing",
-        "offday": "send_offday_alert",
-        "midnight": "send_midnight_todo_review",
-        "assignments": "check_assignment_reminders",
-        "tasks": "check_task_reminders",
-        "todos": "check_todo_reminders",
-        "exams": "check_exam_reminders",
-        "semester": "check_semester_starting",
-    }
-
     if not args:
-        trigger_list = "\n".join(f"  • {name}" for name in valid_triggers.keys())
-        await update.message.reply_text(
-            f"Usage: /trigger <notification_type>\n\n"
-            f"Available triggers:\n{trigger_list}\n\n"
-            f"Example: /trigger briefing"
-        )
+        await update.message.reply_text(TRIGGER_USAGE)
         return
 
     trigger_name = args[0].lower()
-    if trigger_name not in valid_triggers:
+    if trigger_name not in VALID_TRIGGERS:
         await update.message.reply_text(
             f"Unknown trigger: {trigger_name}\n"
-            f"Valid options: {', '.join(valid_triggers.keys())}"
+            f"Valid options: {TRIGGER_OPTIONS}"
         )
         return
 
@@ -1816,39 +2101,56 @@ async def trigger_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         scheduler = get_scheduler(context.bot)
 
         # Debug info before triggering
-        chat_ids = await scheduler._get_all_chat_ids()
-        tomorrow = get_today() + timedelta(days=1)
-        events = db.get_all_events()
+        now = get_now()
+        tomorrow = now.date() + timedelta(days=1)
         day_of_week = tomorrow.weekday()
-        schedule = db.get_schedule_for_day(day_of_week)
+        chat_ids, events, schedule = await asyncio.gather(
+            scheduler._get_all_chat_ids(),
+            asyncio.to_thread(db.get_all_events),
+            asyncio.to_thread(db.get_schedule_for_day, day_of_week),
+        )
         is_class = is_class_day(tomorrow, events)
 
         debug_info = (
             f"Debug Info:\n"
-            f"• Test datetime: {get_now().strftime('%Y-%m-%d %H:%M')}\n"
-            f"• Tomorrow: {tomorrow} ({['Mon','Tue','Wed','Thu','Fri','Sat','Sun'][day_of_week]})\n"
+            f"• Test datetime: {now.strftime('%Y-%m-%d %H:%M')}\n"
+            f"• Tomorrow: {tomorrow} ({DAY_NAMES_SHORT[day_of_week]})\n"
             f"• Registered chat_ids: {chat_ids or 'None'}\n"
             f"• Is class day: {is_class}\n"
             f"• Classes scheduled: {len(schedule) if schedule else 0}\n"
         )
 
-        await update.message.reply_text(f"Triggering {trigger_name}...\n\n{debug_info}")
+        status = await update.message.reply_text(f"Triggering {trigger_name}...\n\n{debug_info}")
 
-        method_name = valid_triggers[trigger_name]
+        method_name = VALID_TRIGGERS[trigger_name]
         method = getattr(scheduler, method_name)
-        await method()
-
-        await update.message.reply_text(f"Done! Check if you received the notification.")
+        # Broadcasts can take a while, so run them after the handler returns
+        context.application.create_task(
+            _run_trigger(method, status, trigger_name), update=update
+        )
     except Exception as e:
         await update.message.reply_text(f"Error triggering {trigger_name}: {e}")
 
 
+async def _run_trigger(method, status, trigger_name: str) -> None:
+    """Run a triggered notification and report the outcome on the status message."""
+    try:
+        await method()
+        await status.edit_text(f"{status.text}\n\nDone! Check if you received the notification.")
+    except Exception as e:
+        logger.error(f"Error triggering {trigger_name}: {e}")
+        await status.edit_text(f"{status.text}\n\nError triggering {trigger_name}: {e}")
+
+
+MAIN_MENU_TEXT = _md_to_html("📱 *Main Menu*\n\nChoose an option:")
+
+
 async def menu_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /menu command - show interactive menu."""
     await update.message.reply_text(
-        "📱 *Main Menu*\n\nChoose an option:",
+        MAIN_MENU_TEXT,
         reply_markup=get_main_menu_keyboard(),
-        parse_mode="Markdown"
+        parse_mode="HTML"
     )
 
 
@@ -1882,18 +2184,21 @@ async def exams_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     await update.message.reply_text("\n".join(lines))
 
 
+SETEXAM_USAGE = (
+    "Usage: /setexam <subject> <type> <date> [time]\n\n"
+    "Examples:\n"
+    "  /setexam BITP1113 final 2025-01-15\n"
+    "  /setexam BITI1213 midterm 2024-12-20 10:00\n\n"
+    "Type can be: final, midterm, quiz, test"
+)
+
+
 async def setexam_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /setexam command - set exam date for a subject."""
     args = context.args
 
     if not args or len(args) < 3:
-        await update.message.reply_text(
-            "Usage: /setexam <subject> <type> <date> [time]\n\n"
-            "Examples:\n"
-            "  /setexam BITP1113 final 2025-01-15\n"
-            "  /setexam BITI1213 midterm 2024-12-20 10:00\n\n"
-            "Type can be: final, midterm, quiz, test"
-        )
+        await update.message.reply_text(SETEXAM_USAGE)
         return
 
     subject_code = args[0].upper()
@@ -1901,16 +2206,14 @@ async def setexam_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     exam_date = args[2]
     exam_time = args[3] if len(args) > 3 else None
 
-    exam_id = db.add_exam(
+    # Add and record for undo in one transaction
+    exam_id = db.add_exam_and_log(
         subject_code=subject_code,
         exam_type=exam_type,
         exam_date=exam_date,
         exam_time=exam_time
     )
 
-    # Record for undo
-    db.add_action_history("add", "events", exam_id)
-
     response = f"Exam added: {exam_type.title()} for {subject_code} on {exam_date}"
     if exam_time:
         response += f" at {exam_time}"
@@ -1919,24 +2222,28 @@ async def setexam_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     await update.message.reply_text(response)
 
 
+DELETE_USAGE = (
+    "Usage: /delete <type> <id>\n\n"
+    "Examples:\n"
+    "  /delete assignment 5\n"
+    "  /delete task 3\n"
+    "  /delete todo 1\n"
+    "  /delete exam 17\n"
+    "  /delete online 2\n"
+    "  /delete event 10"
+)
+
+
 async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /delete command - delete an item with confirmation."""
     args = context.args
 
     if not args or len(args) < 2:
-        await update.message.reply_text(
-            "Usage: /delete <type> <id>\n\n"
-            "Examples:\n"
-            "  /delete assignment 5\n"
-            "  /delete task 3\n"
-            "  /delete todo 1\n"
-            "  /delete exam 17\n"
-            "  /delete online 2\n"
-            "  /delete event 10"
-        )
+        await update.message.reply_text(DELETE_USAGE)
         return
 
     item_type = args[0].lower()
+    item_type = ITEM_TYPE_ALIASES.get(item_type, item_type)
     try:
         item_id = int(args[1])
     except ValueError:
@@ -1947,18 +2254,17 @@ async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     item = None
     item_name = ""
 
-    if item_type in ("assignment", "a"):
+    if item_type == "assignment":
         item = db.get_assignment_by_id(item_id)
         item_name = item.get("title", "Unknown") if item else ""
-    elif item_type in ("task", "t"):
+    elif item_type == "task":
         item = db.get_task_by_id(item_id)
         item_name = item.get("title", "Unknown") if item else ""
-    elif item_type in ("todo", "td"):
+    elif item_type == "todo":
         item = db.get_todo_by_id(item_id)
         item_name = item.get("title", "Unknown") if item else ""
     elif item_type == "online":
-        overrides = db.get_online_overrides()
-        item = next((o for o in overrides if o.get("id") == item_id), None)
+        item = db.get_online_override_by_id(item_id)
         if item:
             subject = item.get("subject_code") or "ALL"
             week = item.get("week_number")
@@ -1966,8 +2272,7 @@ async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             item_name = f"{subject} online on {'Week ' + str(week) if week else date_val}"
     elif item_type in ("event", "exam"):
         # Both "exam" and "event" look up in events table
-        events = db.get_all_events()
-        item = next((e for e in events if e.get("id") == item_id), None)
+        item = db.get_event_by_id(item_id)
         item_name = item.get("name_en") or item.get("name", "Unknown") if item else ""
         item_type = "event"  # Normalize to "event" for deletion
 
@@ -1980,7 +2285,7 @@ async def delete_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         "type": item_type,
         "id": item_id,
         "name": item_name,
-        "data": json.dumps(dict(item)) if item else None
+        "data": item
     }
 
     await update.message.reply_text(
@@ -1997,7 +2302,7 @@ async def schedule_subject_command(update: Update, context: ContextTypes.DEFAULT
         # Show full week schedule
         schedule = db.get_all_schedule()
         response = format_week_schedule(schedule)
-        await update.message.reply_text(response, parse_mode="Markdown")
+        await update.message.reply_text(response, parse_mode=_markdown_if_needed(response))
         return
 
     subject = " ".join(args)
@@ -2007,11 +2312,10 @@ async def schedule_subject_command(update: Update, context: ContextTypes.DEFAULT
         await update.message.reply_text(f"No schedule found for '{subject}'.")
         return
 
-    day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
     lines = [f"Schedule for {subject.upper()}:"]
 
     for slot in slots:
-        day = day_names[slot.get("day_of_week", 0)]
+        day = DAY_NAMES[slot.get("day_of_week", 0)]
         start = slot.get("start_time", "")
         end = slot.get("end_time", "")
         class_type = slot.get("class_type", "LEC")
@@ -2026,6 +2330,30 @@ async def schedule_subject_command(update: Update, context: ContextTypes.DEFAULT
     await update.message.reply_text("\n".join(lines))
 
 
+# Reply templates for /stats and the Stats menu button
+STATS_TEMPLATE = """📊 *Statistics (Past {days} Days)*
+
+*Assignments*
+Completed: {a[completed]}/{a[total]} ({a_pct}%)
+Pending: {pending[assignments]}
+
+*Tasks*
+Completed: {t[completed]}/{t[total]} ({t_pct}%)
+Pending: {pending[tasks]}
+
+*TODOs*
+Completed: {td[completed]}/{td[total]} ({td_pct}%)
+Pending: {pending[todos]}
+"""
+STATS_SUMMARY_TEMPLATE = (
+    "📊 Stats (Past 7 Days)\n\n"
+    "📚 Assignments: {a[completed]}/{a[total]} ({a_pct}%)\n"
+    "📋 Tasks: {t[completed]}/{t[total]} ({t_pct}%)\n"
+    "✅ TODOs: {td[completed]}/{td[total]} ({td_pct}%)\n\n"
+    "Pending: {pending[assignments]} assignments, {pending[tasks]} tasks, {pending[todos]} todos"
+)
+
+
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /stats command - show productivity statistics."""
     args = context.args
@@ -2037,37 +2365,22 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         except ValueError:
             pass
 
-    stats = db.get_completion_stats(days)
-    pending = db.get_pending_counts()
-
-    # Calculate percentages
-    def calc_pct(completed, total):
-        if total == 0:
-            return 0
-        return int((completed / total) * 100)
+    stats, pending = await asyncio.to_thread(db.get_stats_overview, days)
 
     a_stats = stats["assignments"]
     t_stats = stats["tasks"]
     td_stats = stats["todos"]
 
-    a_pct = calc_pct(a_stats["completed"], a_stats["total"])
-    t_pct = calc_pct(t_stats["completed"], t_stats["total"])
-    td_pct = calc_pct(td_stats["completed"], td_stats["total"])
-
-    response = f"""📊 *Statistics (Past {days} Days)*
-
-*Assignments*
-Completed: {a_stats['completed']}/{a_stats['total']} ({a_pct}%)
-Pending: {pending['assignments']}
-
-*Tasks*
-Completed: {t_stats['completed']}/{t_stats['total']} ({t_pct}%)
-Pending: {pending['tasks']}
-
-*TODOs*
-Completed: {td_stats['completed']}/{td_stats['total']} ({td_pct}%)
-Pending: {pending['todos']}
-"""
+    response = STATS_TEMPLATE.format(
+        days=days,
+        a=a_stats,
+        t=t_stats,
+        td=td_stats,
+        a_pct=100 * a_stats["completed"] // a_stats["total"] if a_stats["total"] else 0,
+        t_pct=100 * t_stats["completed"] // t_stats["total"] if t_stats["total"] else 0,
+        td_pct=100 * td_stats["completed"] // td_stats["total"] if td_stats["total"] else 0,
+        pending=pending,
+    )
     await update.message.reply_text(response, parse_mode="Markdown")
 
 
@@ -2083,9 +2396,7 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
 
     query = " ".join(args)
-    results = db.search_all(query)
-
-    total_count = sum(len(v) for v in results.values())
+    results, total_count = db.search_preview(query)
 
     if total_count == 0:
         await update.message.reply_text(f"No results found for '{query}'.")
@@ -2093,36 +2404,27 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     lines = [f"🔍 Found {total_count} result(s) for '{query}':"]
 
-    if results["assignments"]:
-        lines.append("\n📚 *Assignments:*")
-        for a in results["assignments"][:5]:
-            status = "✅" if a.get("is_completed") else "⏳"
-            lines.append(f"  {status} {a['title']} (ID:{a['id']})")
-
-    if results["tasks"]:
-        lines.append("\n📋 *Tasks:*")
-        for t in results["tasks"][:5]:
-            status = "✅" if t.get("is_completed") else "⏳"
-            lines.append(f"  {status} {t['title']} (ID:{t['id']})")
-
-    if results["todos"]:
-        lines.append("\n✅ *TODOs:*")
-        for td in results["todos"][:5]:
-            status = "✅" if td.get("is_completed") else "⏳"
-            lines.append(f"  {status} {td['title']} (ID:{td['id']})")
+    sections = (
+        ("assignments", "\n📚 *Assignments:*"),
+        ("tasks", "\n📋 *Tasks:*"),
+        ("todos", "\n✅ *TODOs:*"),
+    )
+    for kind, heading in sections:
+        if results[kind]:
+            lines.append(heading)
+            for item_id, title, done in results[kind]:
+                status = "✅" if done else "⏳"
+                lines.append(f"  {status} {title} (ID:{item_id})")
 
     if results["schedule"]:
         lines.append("\n📅 *Schedule:*")
-        day_names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-        for s in results["schedule"][:5]:
-            day = day_names[s.get("day_of_week", 0)]
-            lines.append(f"  {s['subject_code']} - {day} {s['start_time']}")
+        for subject_code, day_of_week, start_time in results["schedule"]:
+            lines.append(f"  {subject_code} - {DAY_NAMES_SHORT[day_of_week or 0]} {start_time}")
 
     if results["events"]:
         lines.append("\n📆 *Events:*")
-        for e in results["events"][:5]:
-            name = e.get("name_en") or e.get("name", "Unknown")
-            lines.append(f"  {name} - {e['start_date']}")
+        for name, start_date in results["events"]:
+            lines.append(f"  {name} - {start_date}")
 
     await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
 
@@ -2185,18 +2487,10 @@ async def undo_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 
         elif action_type == "complete":
             # Undo complete = uncomplete (reset is_completed to 0)
-            conn = db._get_conn()
-            try:
-                conn.execute(
-                    f"UPDATE {table_name} SET is_completed = 0, completed_at = NULL WHERE id = ?",
-                    (item_id,)
-                )
-                conn.commit()
-            finally:
-                conn.close()
-
-            db.delete_action_history(last_action["id"])
-            await update.message.reply_text(f"Undone: Unmarked {table_name[:-1]} #{item_id} as complete")
+            if db.undo_complete(last_action):
+                await update.message.reply_text(f"Undone: Unmarked {table_name[:-1]} #{item_id} as complete")
+            else:
+                await update.message.reply_text("Cannot undo this action.")
 
         else:
             await update.message.reply_text("Cannot undo this action.")
@@ -2218,47 +2512,47 @@ async def mute_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         except ValueError:
             pass
 
-    mute_until = (datetime.now() + timedelta(hours=hours)).isoformat()
-    db.set_mute_until(chat_id, mute_until)
+    mute_until = datetime.now() + timedelta(hours=hours)
+    db.set_mute_until(chat_id, mute_until.isoformat())
 
     await update.message.reply_text(
         f"🔇 Notifications muted for {hours} hour(s).\n"
-        f"Will resume at {mute_until[:16].replace('T', ' ')}"
+        f"Will resume at {mute_until.strftime('%Y-%m-%d %H:%M')}"
     )
 
 
-async def settings_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle /settings command - show settings menu."""
-    global _test_date_override, _test_time_override
-
+def _build_settings_view() -> dict:
+    """Build the settings menu message as reply/edit keyword arguments."""
     # Get current date/time info
-    current_date = get_today()
     current_time = get_now()
-    real_date = date.today()
-    real_time = datetime.now(MY_TZ)
+    current_date = current_time.date()
 
     has_date_override = _test_date_override is not None
     has_time_override = _test_time_override is not None
 
     # Build settings message
-    msg = "⚙️ *Settings*\n\n"
-    msg += f"📅 Date: `{current_date.strftime('%a, %d %b %Y')}`"
-    if has_date_override:
-        msg += " ⚠️ _Override_"
-    msg += f"\n⏰ Time: `{current_time.strftime('%H:%M')}`"
-    if has_time_override:
-        msg += " ⚠️ _Override_"
-
+    lines = [
+        "⚙️ *Settings*\n",
+        f"📅 Date: `{current_date.strftime('%a, %d %b %Y')}`"
+        + (" ⚠️ _Override_" if has_date_override else ""),
+        f"⏰ Time: `{current_time.strftime('%H:%M')}`"
+        + (" ⚠️ _Override_" if has_time_override else ""),
+    ]
     if has_date_override or has_time_override:
-        msg += f"\n\n_Real: {real_date.strftime('%d %b %Y')} {real_time.strftime('%H:%M')}_"
+        real_time = datetime.now(MY_TZ)
+        lines.append(f"\n_Real: {real_time.strftime('%d %b %Y %H:%M')}_")
+    lines.append("\nChoose an option:")
 
-    msg += "\n\nChoose an option:"
+    return {
+        "text": "\n".join(lines),
+        "reply_markup": get_settings_keyboard(has_date_override, has_time_override),
+        "parse_mode": "Markdown",
+    }
 
-    await update.message.reply_text(
-        msg,
-        reply_markup=get_settings_keyboard(has_date_override, has_time_override),
-        parse_mode="Markdown"
-    )
+
+async def settings_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /settings command - show settings menu."""
+    await update.message.reply_text(**_build_settings_view())
 
 
 async def language_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -2284,6 +2578,25 @@ async def language_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         await update.message.reply_text("Invalid language. Use 'en' or 'my'.")
 
 
+@contextmanager
+def _export_document(filename: str) -> Iterator[tuple[io.BytesIO, io.TextIOWrapper]]:
+    """Write UTF-8 text straight into an in-memory file for reply_document.
+
+    Yields (bio, out); text written to out is encoded into bio as it goes,
+    and bio is rewound and named once the block exits.
+    """
+    bio = io.BytesIO()
+    out = io.TextIOWrapper(bio, encoding="utf-8", newline="\n")
+    try:
+        yield bio, out
+    finally:
+        out.flush()
+        # Detach so the wrapper does not close bio when it is collected
+        out.detach()
+    bio.seek(0)
+    bio.name = filename
+
+
 async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /export command - export data."""
     args = context.args
@@ -2304,27 +2617,17 @@ async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             await update.message.reply_text("No schedule data to export.")
             return
 
-        lines = ["# Class Schedule\n"]
-        day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        by_day = {}
-        for slot in schedule:
-            day = slot.get("day_of_week", 0)
-            if day not in by_day:
-                by_day[day] = []
-            by_day[day].append(slot)
-
-        for day in sorted(by_day.keys()):
-            lines.append(f"\n## {day_names[day]}")
-            for slot in sorted(by_day[day], key=lambda x: x.get("start_time", "")):
-                lines.append(
-                    f"- {slot['start_time']}-{slot['end_time']}: "
-                    f"{slot['subject_code']} ({slot.get('class_type', 'LEC')}) "
-                    f"Room: {slot.get('room', 'TBA')}"
-                )
-
-        content = "\n".join(lines)
-        bio = io.BytesIO(content.encode("utf-8"))
-        bio.name = "schedule.md"
+        with _export_document("schedule.md") as (bio, out):
+            out.write("# Class Schedule\n")
+            # get_all_schedule is already ordered by day, then start time
+            for day, slots in groupby(schedule, key=lambda x: x.get("day_of_week", 0)):
+                out.write(f"\n\n## {DAY_NAMES[day]}")
+                for slot in slots:
+                    out.write(
+                        f"\n- {slot['start_time']}-{slot['end_time']}: "
+                        f"{slot['subject_code']} ({slot.get('class_type', 'LEC')}) "
+                        f"Room: {slot.get('room', 'TBA')}"
+                    )
         await update.message.reply_document(bio, caption="Your class schedule")
 
     elif export_type == "assignments":
@@ -2333,19 +2636,16 @@ async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             await update.message.reply_text("No assignments to export.")
             return
 
-        lines = ["# Pending Assignments\n"]
-        for a in assignments:
-            lines.append(f"- **{a['title']}**")
-            if a.get("subject_code"):
-                lines.append(f"  Subject: {a['subject_code']}")
-            lines.append(f"  Due: {a['due_date']}")
-            if a.get("description"):
-                lines.append(f"  Description: {a['description']}")
-            lines.append("")
-
-        content = "\n".join(lines)
-        bio = io.BytesIO(content.encode("utf-8"))
-        bio.name = "assignments.md"
+        with _export_document("assignments.md") as (bio, out):
+            out.write("# Pending Assignments\n")
+            for a in assignments:
+                out.write(f"\n- **{a['title']}**")
+                if a.get("subject_code"):
+                    out.write(f"\n  Subject: {a['subject_code']}")
+                out.write(f"\n  Due: {a['due_date']}")
+                if a.get("description"):
+                    out.write(f"\n  Description: {a['description']}")
+                out.write("\n")
         await update.message.reply_document(bio, caption="Your pending assignments")
 
     elif export_type == "all":
@@ -2357,238 +2657,345 @@ async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             "events": db.get_all_events(),
         }
 
-        content = json.dumps(data, indent=2, default=str)
-        bio = io.BytesIO(content.encode("utf-8"))
-        bio.name = "all_data.json"
+        with _export_document("all_data.json") as (bio, out):
+            json.dump(data, out, indent=2, default=str)
         await update.message.reply_document(bio, caption="All your data (JSON)")
 
     else:
         await update.message.reply_text("Unknown export type. Use: schedule, assignments, or all")
 
 
-async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle inline keyboard button callbacks."""
-    global _test_date_override, _test_time_override
+QUICK_HELP_TEXT = _md_to_html(
+    "📖 *Quick Help*\n\n"
+    "*📅 Schedule:* /today, /tomorrow, /week\n"
+    "*📝 Items:* /assignments, /tasks, /todos\n"
+    "*✅ Actions:* /done, /delete, /edit, /undo\n"
+    "*📝 Exams:* /exams, /setexam\n"
+    "*🎤 Voice:* /notes, /suggest\n"
+    "*⚙️ Settings:* /settings, /mute, /language\n\n"
+    "*💬 Just chat naturally!*\n"
+    "• \"What class tomorrow?\"\n"
+    "• \"Assignment due Friday 5pm\"\n"
+    "• \"Done with BITP report\"\n\n"
+    "Use /help for detailed topics."
+)
 
-    query = update.callback_query
-    await query.answer()
 
-    data = query.data
-    chat_id = query.message.chat_id
+async def _callback_menu_main(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show the main menu."""
+    await _EDITS.edit(
+        query,
+        MAIN_MENU_TEXT,
+        reply_markup=get_main_menu_keyboard(),
+        parse_mode="HTML"
+    )
 
-    # Menu navigation
-    if data == "menu_main":
-        await query.edit_message_text(
-            "📱 *Main Menu*\n\nChoose an option:",
-            reply_markup=get_main_menu_keyboard(),
-            parse_mode="Markdown"
-        )
 
-    elif data == "menu_settings":
-        # Get current date/time info
-        current_date = get_today()
-        current_time = get_now()
-        real_date = date.today()
-        real_time = datetime.now(MY_TZ)
+async def _callback_menu_settings(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show the settings menu."""
+    await _EDITS.edit(query, **_build_settings_view())
 
-        has_date_override = _test_date_override is not None
-        has_time_override = _test_time_override is not None
 
-        # Build settings message
-        msg = "⚙️ *Settings*\n\n"
-        msg += f"📅 Date: `{current_date.strftime('%a, %d %b %Y')}`"
-        if has_date_override:
-            msg += " ⚠️ _Override_"
-        msg += f"\n⏰ Time: `{current_time.strftime('%H:%M')}`"
-        if has_time_override:
-            msg += " ⚠️ _Override_"
+async def _callback_reset_date(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Clear the test date override."""
+    global _test_date_override
+    _test_date_override = None
+    await _EDITS.edit(
+        query,
+        f"✅ Date reset to real date: {date.today().strftime('%a, %d %b %Y')}",
+        reply_markup=get_content_with_menu_keyboard()
+    )
 
-        if has_date_override or has_time_override:
-            msg += f"\n\n_Real: {real_date.strftime('%d %b %Y')} {real_time.strftime('%H:%M')}_"
 
-        msg += "\n\nChoose an option:"
+async def _callback_reset_time(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Clear the test time override."""
+    global _test_time_override
+    _test_time_override = None
+    await _EDITS.edit(
+        query,
+        f"✅ Time reset to real time: {datetime.now(MY_TZ).strftime('%H:%M')}",
+        reply_markup=get_content_with_menu_keyboard()
+    )
 
-        await query.edit_message_text(
-            msg,
-            reply_markup=get_settings_keyboard(has_date_override, has_time_override),
-            parse_mode="Markdown"
-        )
 
-    elif data == "reset_date":
-        _test_date_override = None
-        await query.edit_message_text(
-            f"✅ Date reset to real date: {date.today().strftime('%a, %d %b %Y')}",
-            reply_markup=get_content_with_menu_keyboard()
-        )
+async def _callback_menu_language(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show the language picker."""
+    await _EDITS.edit(
+        query,
+        "🌐 *Language*\n\nChoose your language:",
+        reply_markup=get_language_keyboard(),
+        parse_mode="Markdown"
+    )
 
-    elif data == "reset_time":
-        _test_time_override = None
-        await query.edit_message_text(
-            f"✅ Time reset to real time: {datetime.now(MY_TZ).strftime('%H:%M')}",
-            reply_markup=get_content_with_menu_keyboard()
-        )
 
-    elif data == "menu_language":
-        await query.edit_message_text(
-            "🌐 *Language*\n\nChoose your language:",
-            reply_markup=get_language_keyboard(),
-            parse_mode="Markdown"
-        )
+async def _callback_menu_semester(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show the semester settings."""
+    user_config = await asyncio.to_thread(db.get_user_config, chat_id)
+    current = user_config.get("semester_start_date") if user_config else None
+    current_display = current if current else "Not set"
+
+    await _EDITS.edit(
+        query,
+        f"📅 *Semester Settings*\n\n"
+        f"Current semester start: *{current_display}*\n\n"
+        f"Choose an option:",
+        reply_markup=get_semester_keyboard(),
+        parse_mode="Markdown"
+    )
 
-    elif data == "menu_semester":
-        user_config = db.get_user_config(chat_id)
-        current = user_config.get("semester_start_date") if user_config else None
-        current_display = current if current else "Not set"
 
-        await query.edit_message_text(
-            f"📅 *Semester Settings*\n\n"
-            f"Current semester start: *{current_display}*\n\n"
-            f"Choose an option:",
-            reply_markup=get_semester_keyboard(),
-            parse_mode="Markdown"
-        )
+async def _callback_semester_set(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Explain how to set the semester start date."""
+    await _EDITS.edit(
+        query,
+        "📅 *Set Semester Start Date*\n\n"
+        "Send the date in this format:\n"
+        "`/setsemester YYYY-MM-DD`\n\n"
+        "Example: `/setsemester 2025-01-06`\n\n"
+        "This is the first day of Week 1.",
+        reply_markup=get_semester_keyboard(),
+        parse_mode="Markdown"
+    )
 
-    elif data == "semester_set":
-        await query.edit_message_text(
-            "📅 *Set Semester Start Date*\n\n"
-            "Send the date in this format:\n"
-            "`/setsemester YYYY-MM-DD`\n\n"
-            "Example: `/setsemester 2025-01-06`\n\n"
-            "This is the first day of Week 1.",
-            reply_markup=get_semester_keyboard(),
-            parse_mode="Markdown"
-        )
 
-    elif data == "semester_week":
-        user_config = db.get_user_config(chat_id)
-        events = db.get_all_events()
-        semester_start_str = user_config.get("semester_start_date") if user_config else None
-        semester_start = parse_date(semester_start_str) if semester_start_str else None
+async def _callback_semester_week(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show the current semester week."""
+    user_config, events = await asyncio.gather(
+        asyncio.to_thread(_get_user_config, chat_id),
+        asyncio.to_thread(db.get_all_events),
+    )
+    semester_start_str = user_config.get("semester_start_date") if user_config else None
+    semester_start = user_config["_semester_start_date"] if user_config else None
 
-        if semester_start:
-            week = get_current_week(get_today(), semester_start, events)
-            response = format_current_week(week, semester_start_str)
-        else:
-            response = "Semester start date not set.\nUse 'Set Semester Start' to configure."
+    if semester_start:
+        week = get_current_week(get_today(), semester_start, events)
+        response = format_current_week(week, semester_start_str)
+    else:
+        response = "Semester start date not set.\nUse 'Set Semester Start' to configure."
 
-        await query.edit_message_text(
-            f"📊 *Current Week*\n\n{response}",
-            reply_markup=get_semester_keyboard(),
-            parse_mode="Markdown"
-        )
+    await _EDITS.edit(
+        query,
+        f"📊 *Current Week*\n\n{response}",
+        reply_markup=get_semester_keyboard(),
+        parse_mode="Markdown"
+    )
 
-    elif data == "menu_notifications":
-        settings = db.get_all_notification_settings(chat_id)
-        await query.edit_message_text(
-            "🔔 *Notification Settings*\n\nToggle notifications:",
-            reply_markup=get_notification_settings_keyboard(settings),
-            parse_mode="Markdown"
-        )
 
-    # Commands via buttons - keep menu visible
-    elif data == "cmd_today":
-        schedule = db.get_all_schedule()
-        events = db.get_all_events()
-        response = format_today_classes(schedule, events, today=get_today())
-        await query.edit_message_text(
-            response,
-            reply_markup=get_content_with_menu_keyboard()
-        )
+async def _callback_menu_notifications(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show the notification toggles."""
+    settings = await asyncio.to_thread(db.get_all_notification_settings, chat_id)
+    await _EDITS.edit(
+        query,
+        "🔔 *Notification Settings*\n\nToggle notifications:",
+        reply_markup=get_notification_settings_keyboard(settings),
+        parse_mode="Markdown"
+    )
 
-    elif data == "cmd_tomorrow":
-        schedule = db.get_all_schedule()
-        events = db.get_all_events()
-        response = format_tomorrow_classes(schedule, events, today=get_today())
-        await query.edit_message_text(
-            response,
-            reply_markup=get_content_with_menu_keyboard()
-        )
 
-    elif data == "cmd_assignments":
-        assignments = db.get_pending_assignments()
-        response = format_pending_assignments(assignments)
-        await query.edit_message_text(
-            response,
-            reply_markup=get_content_with_menu_keyboard()
-        )
+async def _callback_today(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show today's classes."""
+    schedule, events = await asyncio.gather(
+        asyncio.to_thread(db.get_all_schedule),
+        asyncio.to_thread(db.get_all_events),
+    )
+    response = format_today_classes(schedule, events, today=get_today())
+    await _EDITS.edit(
+        query,
+        response,
+        reply_markup=get_content_with_menu_keyboard()
+    )
 
-    elif data == "cmd_tasks":
-        tasks = db.get_upcoming_tasks()
-        response = format_pending_tasks(tasks)
-        await query.edit_message_text(
-            response,
-            reply_markup=get_content_with_menu_keyboard()
-        )
 
-    elif data == "cmd_todos":
-        todos = db.get_pending_todos()
-        response = format_pending_todos(todos)
-        await query.edit_message_text(
-            response,
-            reply_markup=get_content_with_menu_keyboard()
-        )
+async def _callback_tomorrow(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show tomorrow's classes."""
+    schedule, events = await asyncio.gather(
+        asyncio.to_thread(db.get_all_schedule),
+        asyncio.to_thread(db.get_all_events),
+    )
+    response = format_tomorrow_classes(schedule, events, today=get_today())
+    await _EDITS.edit(
+        query,
+        response,
+        reply_markup=get_content_with_menu_keyboard()
+    )
 
-    elif data == "cmd_stats":
-        stats = db.get_completion_stats(7)
-        pending = db.get_pending_counts()
 
-        def calc_pct(c, t):
-            return int((c / t) * 100) if t > 0 else 0
+async def _callback_assignments(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show pending assignments."""
+    assignments = await asyncio.to_thread(db.get_pending_assignments)
+    response = format_pending_assignments(assignments)
+    await _EDITS.edit(
+        query,
+        response,
+        reply_markup=get_content_with_menu_keyboard()
+    )
 
-        a = stats["assignments"]
-        t = stats["tasks"]
-        td = stats["todos"]
 
-        response = (
-            f"📊 Stats (Past 7 Days)\n\n"
-            f"📚 Assignments: {a['completed']}/{a['total']} ({calc_pct(a['completed'], a['total'])}%)\n"
-            f"📋 Tasks: {t['completed']}/{t['total']} ({calc_pct(t['completed'], t['total'])}%)\n"
-            f"✅ TODOs: {td['completed']}/{td['total']} ({calc_pct(td['completed'], td['total'])}%)\n\n"
-            f"Pending: {pending['assignments']} assignments, {pending['tasks']} tasks, {pending['todos']} todos"
-        )
-        await query.edit_message_text(
-            response,
-            reply_markup=get_content_with_menu_keyboard()
-        )
+async def _callback_tasks(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show upcoming tasks."""
+    tasks = await asyncio.to_thread(db.get_upcoming_tasks)
+    response = format_pending_tasks(tasks)
+    await _EDITS.edit(
+        query,
+        response,
+        reply_markup=get_content_with_menu_keyboard()
+    )
 
-    elif data == "cmd_help":
-        help_text = (
-            "📖 *Quick Help*\n\n"
-            "*📅 Schedule:* /today, /tomorrow, /week\n"
-            "*📝 Items:* /assignments, /tasks, /todos\n"
-            "*✅ Actions:* /done, /delete, /edit, /undo\n"
-            "*📝 Exams:* /exams, /setexam\n"
-            "*🎤 Voice:* /notes, /suggest\n"
-            "*⚙️ Settings:* /settings, /mute, /language\n\n"
-            "*💬 Just chat naturally!*\n"
-            "• \"What class tomorrow?\"\n"
-            "• \"Assignment due Friday 5pm\"\n"
-            "• \"Done with BITP report\"\n\n"
-            "Use /help for detailed topics."
-        )
-        await query.edit_message_text(
-            help_text,
-            reply_markup=get_content_with_menu_keyboard(),
-            parse_mode="Markdown"
-        )
 
-    # Language selection
-    elif data.startswith("lang_"):
-        lang = data.split("_")[1]
-        db.set_language(chat_id, lang)
-        msg = "✅ Language set to English." if lang == "en" else "✅ Bahasa ditetapkan kepada Bahasa Melayu."
-        await query.edit_message_text(
-            msg,
-            reply_markup=get_content_with_menu_keyboard()
-        )
+async def _callback_todos(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show pending TODOs."""
+    todos = await asyncio.to_thread(db.get_pending_todos)
+    response = format_pending_todos(todos)
+    await _EDITS.edit(
+        query,
+        response,
+        reply_markup=get_content_with_menu_keyboard()
+    )
+
+
+async def _callback_stats(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show 7-day completion stats."""
+    stats, pending = await asyncio.to_thread(db.get_stats_overview, 7)
+
+    a = stats["assignments"]
+    t = stats["tasks"]
+    td = stats["todos"]
+
+    response = STATS_SUMMARY_TEMPLATE.format(
+        a=a,
+        t=t,
+        td=td,
+        a_pct=100 * a["completed"] // a["total"] if a["total"] else 0,
+        t_pct=100 * t["completed"] // t["total"] if t["total"] else 0,
+        td_pct=100 * td["completed"] // td["total"] if td["total"] else 0,
+        pending=pending,
+    )
+    await _EDITS.edit(
+        query,
+        response,
+        reply_markup=get_content_with_menu_keyboard()
+    )
+
+
+async def _callback_help(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show the quick help."""
+    await _EDITS.edit(
+        query,
+        QUICK_HELP_TEXT,
+        reply_markup=get_content_with_menu_keyboard(),
+        parse_mode="HTML"
+    )
+
+
+async def _callback_language(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Set the language (lang_<code>)."""
+    (lang,) = args
+    await asyncio.to_thread(db.set_language, chat_id, lang)
+    msg = "✅ Language set to English." if lang == "en" else "✅ Bahasa ditetapkan kepada Bahasa Melayu."
+    await _EDITS.edit(
+        query,
+        msg,
+        reply_markup=get_content_with_menu_keyboard()
+    )
 
-    # Initial language selection (for new users in onboarding)
-    elif data.startswith("initial_lang_"):
-        lang = data.split("_")[2]  # initial_lang_en -> en
-        db.set_language(chat_id, lang)
 
-        if lang == "en":
-            msg = """✅ Language set to English.
+async def _callback_initial_language(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Set the language during onboarding (initial_lang_<code>)."""
+    (lang,) = args
+    await asyncio.to_thread(db.set_language, chat_id, lang)
+
+    if lang == "en":
+        msg = """✅ Language set to English.
 
 Welcome! I can help you with:
 📅 Class schedule & week tracking
@@ -2601,8 +3008,8 @@ Welcome! I can help you with:
 
 Use /setup to configure your calendar and timetable.
 Use /help to see all available commands."""
-        else:
-            msg = """✅ Bahasa ditetapkan kepada Bahasa Melayu.
+    else:
+        msg = """✅ Bahasa ditetapkan kepada Bahasa Melayu.
 
 Selamat datang! Saya boleh membantu anda dengan:
 📅 Jadual kelas & penjejakan minggu
@@ -2616,339 +3023,565 @@ Selamat datang! Saya boleh membantu anda dengan:
 Gunakan /setup untuk mengkonfigurasi kalendar dan jadual anda.
 Gunakan /help untuk melihat semua arahan."""
 
-        await query.edit_message_text(
-            msg,
-            reply_markup=get_main_menu_keyboard(),
-            parse_mode="Markdown"
-        )
+    await _EDITS.edit(
+        query,
+        msg,
+        reply_markup=get_main_menu_keyboard(),
+        parse_mode="Markdown"
+    )
 
-    # Mute
-    elif data.startswith("mute_"):
-        hours = int(data.split("_")[1].replace("h", ""))
-        mute_until = (datetime.now() + timedelta(hours=hours)).isoformat()
-        db.set_mute_until(chat_id, mute_until)
-        await query.edit_message_text(
-            f"🔇 Notifications muted for {hours} hour(s).",
-            reply_markup=get_content_with_menu_keyboard()
-        )
 
-    # Notification toggles
-    elif data.startswith("toggle_"):
-        parts = data.split("_")
-        setting_type = parts[1]
-        current = parts[2]
-        new_value = "off" if current == "on" else "on"
+async def _callback_mute(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Mute notifications (mute_<hours>h)."""
+    hours = int(args[0].removesuffix("h"))
+    mute_until = (datetime.now() + timedelta(hours=hours)).isoformat()
+    await asyncio.to_thread(db.set_mute_until, chat_id, mute_until)
+    await _EDITS.edit(
+        query,
+        f"🔇 Notifications muted for {hours} hour(s).",
+        reply_markup=get_content_with_menu_keyboard()
+    )
 
-        setting_key = f"{setting_type}_alert" if setting_type != "briefing" else "daily_briefing"
-        if setting_type == "midnight":
-            setting_key = "midnight_review"
 
-        db.set_notification_setting(chat_id, setting_key, new_value)
+async def _callback_toggle_notification(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Toggle a notification setting (toggle_<type>_<on|off>)."""
+    setting_type, current = args
+    new_value = "off" if current == "on" else "on"
+
+    setting_key = f"{setting_type}_alert" if setting_type != "briefing" else "daily_briefing"
+    if setting_type == "midnight":
+        setting_key = "midnight_review"
+
+    # Read before writing, while the cached copy is still valid, and apply
+    # the change locally rather than reloading after the write
+    settings = await asyncio.to_thread(db.get_all_notification_settings, chat_id)
+    await asyncio.to_thread(db.set_notification_setting, chat_id, setting_key, new_value)
+    settings[setting_key] = new_value
+
+    await _EDITS.edit(
+        query,
+        "🔔 *Notification Settings*\n\nToggle notifications:",
+        reply_markup=get_notification_settings_keyboard(settings),
+        parse_mode="Markdown"
+    )
 
-        settings = db.get_all_notification_settings(chat_id)
-        await query.edit_message_text(
-            "🔔 *Notification Settings*\n\nToggle notifications:",
-            reply_markup=get_notification_settings_keyboard(settings),
-            parse_mode="Markdown"
+
+async def _callback_done(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Mark an item as completed (done_<type>_<id>)."""
+    item_type, item_id = args[0], int(args[1])
+
+    if item_type not in ("assignment", "task", "todo"):
+        return
+
+    item = await asyncio.to_thread(db.complete_and_log, f"{item_type}s", item_id)
+    if item:
+        await _EDITS.edit(
+            query,
+            f"✅ Marked '{item['title']}' as completed!",
+            reply_markup=get_content_with_menu_keyboard()
         )
 
-    # Done action
-    elif data.startswith("done_"):
-        parts = data.split("_")
-        item_type = parts[1]
-        item_id = int(parts[2])
 
-        if item_type == "assignment":
-            item = db.get_assignment_by_id(item_id)
-            if item:
-                db.complete_assignment(item_id)
-                db.add_action_history("complete", "assignments", item_id)
-                await query.edit_message_text(
-                    f"✅ Marked '{item['title']}' as completed!",
-                    reply_markup=get_content_with_menu_keyboard()
-                )
-        elif item_type == "task":
-            item = db.get_task_by_id(item_id)
-            if item:
-                db.complete_task(item_id)
-                db.add_action_history("complete", "tasks", item_id)
-                await query.edit_message_text(
-                    f"✅ Marked '{item['title']}' as completed!",
-                    reply_markup=get_content_with_menu_keyboard()
-                )
-        elif item_type == "todo":
-            item = db.get_todo_by_id(item_id)
-            if item:
-                db.complete_todo(item_id)
-                db.add_action_history("complete", "todos", item_id)
-                await query.edit_message_text(
-                    f"✅ Marked '{item['title']}' as completed!",
-                    reply_markup=get_content_with_menu_keyboard()
-                )
+async def _callback_delete(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Ask to confirm a delete (delete_<type>_<id>)."""
+    item_type, item_id = args[0], int(args[1])
 
-    # Delete confirmation
-    elif data.startswith("delete_"):
-        parts = data.split("_")
-        item_type = parts[1]
-        item_id = int(parts[2])
-
-        await query.edit_message_text(
-            f"Are you sure you want to delete this {item_type}?",
-            reply_markup=get_confirmation_keyboard("delete", item_type, item_id)
-        )
-
-    elif data.startswith("confirm_delete_"):
-        parts = data.split("_")
-        item_type = parts[2]
-        item_id = int(parts[3])
-
-        deleted = None
-        if item_type == "assignment":
-            deleted = db.delete_assignment(item_id)
-        elif item_type == "task":
-            deleted = db.delete_task(item_id)
-        elif item_type == "todo":
-            deleted = db.delete_todo(item_id)
-
-        if deleted:
-            db.add_action_history("delete", f"{item_type}s", item_id, json.dumps(deleted))
-            await query.edit_message_text(
-                f"🗑️ Deleted {item_type} successfully!",
-                reply_markup=get_content_with_menu_keyboard()
-            )
-        else:
-            await query.edit_message_text(
-                f"{item_type.title()} not found.",
-                reply_markup=get_content_with_menu_keyboard()
-            )
+    await _EDITS.edit(
+        query,
+        f"Are you sure you want to delete this {item_type}?",
+        reply_markup=get_confirmation_keyboard("delete", item_type, item_id)
+    )
+
+
+async def _callback_confirm_delete(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Delete an item (confirm_delete_<type>_<id>)."""
+    item_type, item_id = args[0], int(args[1])
 
-    elif data.startswith("cancel_"):
-        await query.edit_message_text(
-            "Action cancelled.",
+    deleted = None
+    if item_type in ("assignment", "task", "todo"):
+        deleted = await asyncio.to_thread(db.delete_and_log, f"{item_type}s", item_id)
+
+    if deleted:
+        await _EDITS.edit(
+            query,
+            f"🗑️ Deleted {item_type} successfully!",
             reply_markup=get_content_with_menu_keyboard()
         )
+    else:
+        await _EDITS.edit(
+            query,
+            f"{item_type.title()} not found.",
+            reply_markup=get_content_with_menu_keyboard()
+        )
+
+
+async def _callback_cancel(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Cancel a pending action."""
+    await _EDITS.edit(
+        query,
+        "Action cancelled.",
+        reply_markup=get_content_with_menu_keyboard()
+    )
+
+
+async def _callback_snooze(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Acknowledge a snooze (snooze_<type>_<id>_<minutes>)."""
+    item_type, item_id, minutes = args[0], int(args[1]), int(args[2])
+
+    # For snooze, we just acknowledge - actual scheduling would need more infrastructure
+    await _EDITS.edit(
+        query,
+        f"⏰ Snoozed for {minutes} minutes. I'll remind you again later.",
+        reply_markup=get_content_with_menu_keyboard()
+    )
 
-    # Snooze
-    elif data.startswith("snooze_"):
-        parts = data.split("_")
-        item_type = parts[1]
-        item_id = int(parts[2])
-        minutes = int(parts[3])
 
-        # For snooze, we just acknowledge - actual scheduling would need more infrastructure
-        await query.edit_message_text(
-            f"⏰ Snoozed for {minutes} minutes. I'll remind you again later.",
+async def _callback_export(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Start an export (export_<type>)."""
+    (export_type,) = args
+    # Trigger export through message
+    context.user_data["export_type"] = export_type
+    await _EDITS.edit(query, f"Processing {export_type} export...")
+
+    # Create a fake update for the export command
+    await context.bot.send_message(
+        chat_id=chat_id,
+        text=f"Exporting {export_type}..."
+    )
+
+
+async def _callback_voice(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Process a pending voice message (voice_<action>_<message_id>)."""
+    action = args[0]
+    message_id = int(args[1]) if len(args) > 1 else 0
+
+    # Get pending voice data
+    pending = await asyncio.to_thread(db.get_pending_voice, chat_id, message_id)
+    if not pending:
+        await _EDITS.edit(
+            query,
+            "Voice data expired. Please send a new voice message.",
             reply_markup=get_content_with_menu_keyboard()
         )
+        return
 
-    # Export
-    elif data.startswith("export_"):
-        export_type = data.split("_")[1]
-        # Trigger export through message
-        context.user_data["export_type"] = export_type
-        await query.edit_message_text(f"Processing {export_type} export...")
+    transcript = pending.get("transcript", "")
+    duration = pending.get("duration", 0)
 
-        # Create a fake update for the export command
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text=f"Exporting {export_type}..."
+    if action == "cancel":
+        await asyncio.to_thread(db.delete_pending_voice, chat_id, message_id)
+        await _EDITS.edit(
+            query,
+            "Voice processing cancelled.",
+            reply_markup=get_content_with_menu_keyboard()
         )
+        return
+
+    processing_type = action if action in VOICE_PROCESSING_TYPES else "summary"
 
-    # Voice processing callbacks
-    elif data.startswith("voice_"):
-        from ..ai.gemini_client import get_gemini_client
+    await _EDITS.edit(query, f"🔄 Processing as {processing_type}...")
 
-        parts = data.split("_")
-        action = parts[1]
-        message_id = int(parts[2]) if len(parts) > 2 else 0
+    try:
+        gemini = get_gemini_client()
 
-        # Get pending voice data
-        pending = context.user_data.get("pending_voice")
-        if not pending:
-            await query.edit_message_text(
-                "Voice data expired. Please send a new voice message.",
+        if processing_type == "transcript":
+            # Just save the raw transcript
+            processed_content = transcript
+        else:
+            # Process with AI, showing the output in the placeholder as it arrives
+            pieces = []
+            shown = 0
+            last_edit = monotonic()
+            async for piece in gemini.stream_audio_content(transcript, processing_type):
+                pieces.append(piece)
+                if shown < 2000 and monotonic() - last_edit >= _VOICE_STREAM_INTERVAL:
+                    partial = "".join(pieces)[:2000]
+                    shown = len(partial)
+                    last_edit = monotonic()
+                    await _EDITS.edit(query, f"🔄 Processing as {processing_type}...\n\n{partial}")
+            processed_content = "".join(pieces)
+
+        if not processed_content:
+            await _EDITS.edit(
+                query,
+                "Failed to process content. Please try again.",
                 reply_markup=get_content_with_menu_keyboard()
             )
             return
 
-        transcript = pending.get("transcript", "")
-        duration = pending.get("duration", 0)
+        # Generate title from first line or summary
+        title_preview = processed_content[:50].split("\n")[0]
+        if len(title_preview) > 40:
+            title_preview = title_preview[:37] + "..."
 
-        if action == "cancel":
-            del context.user_data["pending_voice"]
-            await query.edit_message_text(
-                "Voice processing cancelled.",
-                reply_markup=get_content_with_menu_keyboard()
-            )
-            return
+        # Save to database
+        note_id = await asyncio.to_thread(
+            db.add_voice_note,
+            chat_id=chat_id,
+            original_transcript=transcript,
+            processed_content=processed_content,
+            processing_type=processing_type,
+            duration_seconds=duration,
+            title=title_preview
+        )
 
-        # Map action to processing type
-        type_map = {
-            "summary": "summary",
-            "minutes": "minutes",
-            "tasks": "tasks",
-            "study": "study",
-            "transcript": "transcript",
-            "smart": "smart"
-        }
+        # Clean up pending data
+        await asyncio.to_thread(db.delete_pending_voice, chat_id, message_id)
 
-        processing_type = type_map.get(action, "summary")
+        # Show result, building the message in one go
+        truncated = "\n\n... (truncated)" if len(processed_content) > 2000 else ""
 
-        await query.edit_message_text(f"🔄 Processing as {processing_type}...")
+        await _EDITS.edit(
+            query,
+            f"✅ *Saved as {processing_type.title()}!*\n"
+            f"Note ID: {note_id}\n\n"
+            f"{processed_content[:2000]}{truncated}\n\n"
+            "_Use /notes to see all your notes._",
+            reply_markup=get_note_actions_keyboard(note_id),
+            parse_mode="Markdown"
+        )
 
-        try:
-            gemini = get_gemini_client()
+    except Exception as e:
+        logger.error(f"Voice processing callback error: {e}")
+        await _EDITS.edit(
+            query,
+            f"Error processing: {e}",
+            reply_markup=get_content_with_menu_keyboard()
+        )
 
-            if processing_type == "transcript":
-                # Just save the raw transcript
-                processed_content = transcript
-            else:
-                # Process with AI
-                processed_content = await gemini.process_audio_content(transcript, processing_type)
 
-            if not processed_content:
-                await query.edit_message_text(
-                    "Failed to process content. Please try again.",
-                    reply_markup=get_content_with_menu_keyboard()
-                )
-                return
+async def _callback_notes(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """List recent voice notes."""
+    notes = await asyncio.to_thread(db.get_voice_notes, chat_id, limit=10)
+    _remember_notes(context, notes)
+    if not notes:
+        await _EDITS.edit(
+            query,
+            "📝 No voice notes yet.\n\nSend a voice message to get started!",
+            reply_markup=get_content_with_menu_keyboard()
+        )
+        return
 
-            # Generate title from first line or summary
-            title_preview = processed_content[:50].split("\n")[0]
-            if len(title_preview) > 40:
-                title_preview = title_preview[:37] + "..."
-
-            # Save to database
-            note_id = db.add_voice_note(
-                chat_id=chat_id,
-                original_transcript=transcript,
-                processed_content=processed_content,
-                processing_type=processing_type,
-                duration_seconds=duration,
-                title=title_preview
-            )
+    lines = ["📝 *Your Voice Notes:*"]
+    for note in notes:
+        title = note.get("title") or f"Note #{note['id']}"
+        ptype = note.get("processing_type", "").title()
+        created = note.get("created_at", "")[:10]
+        lines.append(f"\n[ID:{note['id']}] {title}\n  {ptype} | {created}")
 
-            # Clean up pending data
-            del context.user_data["pending_voice"]
+    await _EDITS.edit(
+        query,
+        "\n".join(lines),
+        reply_markup=get_notes_list_keyboard(notes),
+        parse_mode="Markdown"
+    )
 
-            # Show result
-            display_content = processed_content[:2000]
-            if len(processed_content) > 2000:
-                display_content += "\n\n... (truncated)"
 
-            await query.edit_message_text(
-                f"✅ *Saved as {processing_type.title()}!*\n"
-                f"Note ID: {note_id}\n\n"
-                f"{display_content}\n\n"
-                "_Use /notes to see all your notes._",
-                reply_markup=get_note_actions_keyboard(note_id),
-                parse_mode="Markdown"
-            )
+async def _callback_view_note(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show a voice note (view_note_<id>)."""
+    note_id = int(args[0])
+    note = await _get_voice_note(context, note_id)
+
+    if not note:
+        await _EDITS.edit(
+            query,
+            f"Note #{note_id} not found.",
+            reply_markup=get_content_with_menu_keyboard()
+        )
+        return
 
-        except Exception as e:
-            logger.error(f"Voice processing callback error: {e}")
-            await query.edit_message_text(
-                f"Error processing: {e}",
-                reply_markup=get_content_with_menu_keyboard()
-            )
+    title = note.get("title") or f"Note #{note_id}"
+    ptype = note.get("processing_type", "").title()
+    created = note.get("created_at", "")[:16].replace("T", " ")
+    content = note.get("processed_content", "")[:2500]
+
+    await _EDITS.edit(
+        query,
+        f"📄 *{title}*\n"
+        f"Type: {ptype} | Created: {created}\n\n"
+        f"{content}",
+        reply_markup=get_note_actions_keyboard(note_id),
+        parse_mode="Markdown"
+    )
 
-    # Notes list callback
-    elif data == "cmd_notes":
-        notes = db.get_voice_notes(chat_id, limit=10)
-        if not notes:
-            await query.edit_message_text(
-                "📝 No voice notes yet.\n\nSend a voice message to get started!",
-                reply_markup=get_content_with_menu_keyboard()
+
+async def _callback_note_full(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show a voice note's full content (note_full_<id>)."""
+    note_id = int(args[0])
+    note = await _get_voice_note(context, note_id)
+
+    if note:
+        content = note.get("processed_content", "")
+        # Split into multiple messages if too long
+        if len(content) > 4000:
+            await _EDITS.edit(
+                query,
+                content[:4000] + "\n\n... (continued)",
+                reply_markup=get_note_actions_keyboard(note_id)
+            )
+            # Send the rest as new messages, in order, each within Telegram's limit
+            for start in range(4000, len(content), 4000):
+                await context.bot.send_message(
+                    chat_id=chat_id,
+                    text=content[start:start + 4000]
+                )
+        else:
+            await _EDITS.edit(
+                query,
+                content,
+                reply_markup=get_note_actions_keyboard(note_id)
             )
-            return
 
-        lines = ["📝 *Your Voice Notes:*"]
-        for note in notes:
-            title = note.get("title") or f"Note #{note['id']}"
-            ptype = note.get("processing_type", "").title()
-            created = note.get("created_at", "")[:10]
-            lines.append(f"\n[ID:{note['id']}] {title}\n  {ptype} | {created}")
 
-        await query.edit_message_text(
-            "\n".join(lines),
-            reply_markup=get_notes_list_keyboard(notes),
+async def _callback_note_transcript(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Show a voice note's transcript (note_transcript_<id>)."""
+    note_id = int(args[0])
+    note = await _get_voice_note(context, note_id)
+
+    if note:
+        transcript = note.get("original_transcript", "")[:4000]
+        await _EDITS.edit(
+            query,
+            f"📝 *Original Transcript*\n\n{transcript}",
+            reply_markup=get_note_actions_keyboard(note_id),
             parse_mode="Markdown"
         )
 
-    # View note callback
-    elif data.startswith("view_note_"):
-        note_id = int(data.split("_")[2])
-        note = db.get_voice_note_by_id(note_id)
-
-        if not note:
-            await query.edit_message_text(
-                f"Note #{note_id} not found.",
-                reply_markup=get_content_with_menu_keyboard()
-            )
-            return
 
-        title = note.get("title") or f"Note #{note_id}"
-        ptype = note.get("processing_type", "").title()
-        created = note.get("created_at", "")[:16].replace("T", " ")
-        content = note.get("processed_content", "")[:2500]
+async def _callback_note_delete(
+    query: CallbackQuery,
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    args: tuple[str, ...]
+) -> None:
+    """Delete a voice note (note_delete_<id>)."""
+    note_id = int(args[0])
+    deleted = await asyncio.to_thread(db.delete_voice_note, note_id)
+    context.chat_data.get("notes_by_id", {}).pop(note_id, None)
 
-        await query.edit_message_text(
-            f"📄 *{title}*\n"
-            f"Type: {ptype} | Created: {created}\n\n"
-            f"{content}",
-            reply_markup=get_note_actions_keyboard(note_id),
-            parse_mode="Markdown"
+    if deleted:
+        await _EDITS.edit(
+            query,
+            f"🗑️ Note #{note_id} deleted.",
+            reply_markup=get_content_with_menu_keyboard()
+        )
+    else:
+        await _EDITS.edit(
+            query,
+            f"Note #{note_id} not found.",
+            reply_markup=get_content_with_menu_keyboard()
         )
 
-    # Note full content callback
-    elif data.startswith("note_full_"):
-        note_id = int(data.split("_")[2])
-        note = db.get_voice_note_by_id(note_id)
 
-        if note:
-            content = note.get("processed_content", "")
-            # Split into multiple messages if too long
-            if len(content) > 4000:
-                await query.edit_message_text(
-                    content[:4000] + "\n\n... (continued)",
-                    reply_markup=get_note_actions_keyboard(note_id)
-                )
-                # Send rest as new message
-                await context.bot.send_message(chat_id=chat_id, text=content[4000:])
-            else:
-                await query.edit_message_text(
-                    content,
-                    reply_markup=get_note_actions_keyboard(note_id)
-                )
+# Button callback data -> handler, each called as handler(query, context, chat_id, args)
+CALLBACK_DISPATCH = {
+    "menu_main": _callback_menu_main,
+    "menu_settings": _callback_menu_settings,
+    "reset_date": _callback_reset_date,
+    "reset_time": _callback_reset_time,
+    "menu_language": _callback_menu_language,
+    "menu_semester": _callback_menu_semester,
+    "semester_set": _callback_semester_set,
+    "semester_week": _callback_semester_week,
+    "menu_notifications": _callback_menu_notifications,
+    "cmd_today": _callback_today,
+    "cmd_tomorrow": _callback_tomorrow,
+    "cmd_assignments": _callback_assignments,
+    "cmd_tasks": _callback_tasks,
+    "cmd_todos": _callback_todos,
+    "cmd_stats": _callback_stats,
+    "cmd_help": _callback_help,
+    "cmd_notes": _callback_notes,
+}
+
+# Parameterized callbacks, keyed by the prefix matched by CALLBACK_RE
+CALLBACK_PREFIX_DISPATCH = {
+    "lang": _callback_language,
+    "initial_lang": _callback_initial_language,
+    "mute": _callback_mute,
+    "toggle": _callback_toggle_notification,
+    "done": _callback_done,
+    "delete": _callback_delete,
+    "confirm_delete": _callback_confirm_delete,
+    "cancel": _callback_cancel,
+    "snooze": _callback_snooze,
+    "export": _callback_export,
+    "voice": _callback_voice,
+    "view_note": _callback_view_note,
+    "note_full": _callback_note_full,
+    "note_transcript": _callback_note_transcript,
+    "note_delete": _callback_note_delete,
+}
+
+# Splits callback data into its dispatch prefix and the "_"-separated
+# arguments after it; longer prefixes first so confirm_delete beats delete
+CALLBACK_RE = re.compile(
+    r"^(%s)(?:_(.+))?$"
+    % "|".join(sorted(CALLBACK_PREFIX_DISPATCH, key=len, reverse=True))
+)
 
-    # Note transcript callback
-    elif data.startswith("note_transcript_"):
-        note_id = int(data.split("_")[2])
-        note = db.get_voice_note_by_id(note_id)
 
-        if note:
-            transcript = note.get("original_transcript", "")[:4000]
-            await query.edit_message_text(
-                f"📝 *Original Transcript*\n\n{transcript}",
-                reply_markup=get_note_actions_keyboard(note_id),
-                parse_mode="Markdown"
-            )
+async def callback_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle inline keyboard button callbacks."""
+    query = update.callback_query
+    await query.answer()
 
-    # Note delete callback
-    elif data.startswith("note_delete_"):
-        note_id = int(data.split("_")[2])
-        deleted = db.delete_voice_note(note_id)
+    data = query.data
+    chat_id = query.message.chat_id
 
-        if deleted:
-            await query.edit_message_text(
-                f"🗑️ Note #{note_id} deleted.",
-                reply_markup=get_content_with_menu_keyboard()
-            )
-        else:
-            await query.edit_message_text(
-                f"Note #{note_id} not found.",
-                reply_markup=get_content_with_menu_keyboard()
-            )
+    # Ignore a repeat of the same button pressed within the debounce window
+    now = monotonic()
+    last = _LAST_CALLBACK.get(chat_id)
+    _LAST_CALLBACK[chat_id] = (data, now)
+    if last and last[0] == data and now - last[1] < _CALLBACK_DEBOUNCE:
+        return
+
+    handler = CALLBACK_DISPATCH.get(data)
+    if handler:
+        await handler(query, context, chat_id, ())
+        return
+
+    match = CALLBACK_RE.match(data)
+    if match:
+        prefix, rest = match.groups()
+        args = tuple(rest.split("_")) if rest else ()
+        await CALLBACK_PREFIX_DISPATCH[prefix](query, context, chat_id, args)
+
+
+# Intent -> handler, each called as handler(update, context, entities, message_text)
+INTENT_DISPATCH = {
+    Intent.QUERY_CURRENT_WEEK: _run_command(week_number_command),
+    Intent.QUERY_NEXT_WEEK: _handle_query_next_week,
+    Intent.QUERY_TODAY_CLASSES: _run_command(today_command),
+    Intent.QUERY_TOMORROW_CLASSES: _run_command(tomorrow_command),
+    Intent.QUERY_WEEK_CLASSES: _run_command(week_command),
+    Intent.QUERY_NEXT_OFFDAY: _run_command(offday_command),
+    Intent.QUERY_MIDTERM_BREAK: _reply_event_period(
+        EVENT_CATEGORY_MIDTERM_BREAK,
+        "Mid Semester Break",
+        "Mid semester break dates not found in calendar."
+    ),
+    Intent.QUERY_FINAL_EXAM: _reply_event_period(
+        EVENT_CATEGORY_FINAL_EXAM,
+        "Final Examination",
+        "Final exam dates not found in calendar."
+    ),
+    Intent.QUERY_MIDTERM_EXAM: _reply_event_period(
+        EVENT_CATEGORY_MIDTERM_EXAM,
+        "Mid Semester Examination",
+        "Midterm exam dates not found in calendar."
+    ),
+    Intent.EDIT_SCHEDULE: _handle_edit_schedule,
+    Intent.EDIT_ASSIGNMENT: _handle_edit_assignment,
+    Intent.SET_ONLINE: _handle_set_online,
+    Intent.QUERY_ONLINE: _run_command(online_command),
+    Intent.ADD_EXAM: _handle_add_exam,
+    Intent.QUERY_EXAMS: _run_command(exams_command),
+    Intent.DELETE_ITEM: _handle_delete_item,
+    Intent.SEARCH_ALL: _handle_search_all,
+    Intent.QUERY_STATS: _run_command(stats_command),
+    Intent.SET_LANGUAGE: _handle_set_language,
+    Intent.MUTE_NOTIFICATIONS: _handle_mute_notifications,
+    Intent.QUERY_ASSIGNMENTS: _run_command(assignments_command),
+    Intent.QUERY_TASKS: _run_command(tasks_command),
+    Intent.QUERY_TODOS: _run_command(todos_command),
+    Intent.ADD_ASSIGNMENT: _handle_add_assignment,
+    Intent.ADD_TASK: _handle_add_task,
+    Intent.ADD_TODO: _handle_add_todo,
+    Intent.COMPLETE_ASSIGNMENT: _handle_complete_item,
+    Intent.COMPLETE_TASK: _handle_complete_item,
+    Intent.COMPLETE_TODO: _handle_complete_item,
+    Intent.GENERAL_CHAT: _handle_general_chat,
+}
+
+
+# Update types the registered handlers consume; Telegram skips the rest
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+
+
+def configure_transport(builder: ApplicationBuilder) -> ApplicationBuilder:
+    """
+    Size the bot's HTTP connection pool for bursts of button callbacks and
+    pace outgoing calls under Telegram's flood limit.
+
+    The library default of a handful of connections is easily exhausted when
+    many edits are in flight, which surfaces as pool timeout errors. Apply this
+    to the builder before build(); connections are only opened as needed.
+    """
+    return (
+        builder
+        .connection_pool_size(256)
+        .pool_timeout(10.0)
+        .connect_timeout(5.0)
+        .read_timeout(30.0)
+        .get_updates_connection_pool_size(16)
+        .rate_limiter(TokenBucketRateLimiter())
+    )
 
 
 def register_handlers(application: Application) -> None:
@@ -1,8 +1,15 @@
-"""Telegram inline keyboard layouts for interactive UI."""
+"""Telegram inline keyboard layouts for interactive UI.
+
+Keyboards are immutable once built, so layouts that depend only on a few
+flags or an item ID are built once and shared between messages.
+"""
+
+from functools import lru_cache
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
 
+@lru_cache(maxsize=1)
 def get_main_menu_keyboard() -> InlineKeyboardMarkup:
     """Create the main menu keyboard."""
     keyboard = [
@@ -26,6 +33,7 @@ def get_main_menu_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=1)
 def get_schedule_menu_keyboard() -> InlineKeyboardMarkup:
     """Create the schedule submenu keyboard."""
     keyboard = [
@@ -45,6 +53,7 @@ def get_schedule_menu_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=4)
 def get_settings_keyboard(has_date_override: bool = False, has_time_override: bool = False) -> InlineKeyboardMarkup:
     """Create the settings menu keyboard."""
     keyboard = [
@@ -76,6 +85,7 @@ def get_settings_keyboard(has_date_override: bool = False, has_time_override: bo
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=1)
 def get_language_keyboard() -> InlineKeyboardMarkup:
     """Create language selection keyboard."""
     keyboard = [
@@ -90,6 +100,7 @@ def get_language_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=1)
 def get_initial_language_keyboard() -> InlineKeyboardMarkup:
     """Create language selection keyboard for first-time users (no back button)."""
     keyboard = [
@@ -101,6 +112,7 @@ def get_initial_language_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=1)
 def get_semester_keyboard() -> InlineKeyboardMarkup:
     """Create semester settings keyboard."""
     keyboard = [
@@ -119,10 +131,20 @@ def get_semester_keyboard() -> InlineKeyboardMarkup:
 
 def get_notification_settings_keyboard(settings: dict) -> InlineKeyboardMarkup:
     """Create notification settings keyboard with current status."""
-    briefing = settings.get("daily_briefing", "on")
-    offday = settings.get("offday_alert", "on")
-    midnight = settings.get("midnight_review", "on")
-
+    return _notification_settings_keyboard(
+        settings.get("daily_briefing", "on"),
+        settings.get("offday_alert", "on"),
+        settings.get("midnight_review", "on"),
+    )
+
+
+@lru_cache(maxsize=8)
+def _notification_settings_keyboard(
+    briefing: str,
+    offday: str,
+    midnight: str
+) -> InlineKeyboardMarkup:
+    """Build the notification settings keyboard for one on/off combination."""
     keyboard = [
         [
             InlineKeyboardButton(
@@ -187,6 +209,7 @@ def get_snooze_keyboard(item_type: str, item_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=1)
 def get_export_keyboard() -> InlineKeyboardMarkup:
     """Create export options keyboard."""
     keyboard = [
@@ -205,6 +228,7 @@ def get_export_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=1)
 def get_back_to_menu_keyboard() -> InlineKeyboardMarkup:
     """Create a simple back to menu keyboard."""
     keyboard = [
@@ -215,6 +239,7 @@ def get_back_to_menu_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=1)
 def get_content_with_menu_keyboard() -> InlineKeyboardMarkup:
     """Create quick actions + back to menu keyboard for content views."""
     keyboard = [
@@ -278,6 +303,7 @@ def get_notes_list_keyboard(notes: list) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=512)
 def get_note_actions_keyboard(note_id: int) -> InlineKeyboardMarkup:
     """Create action buttons for a voice note."""
     keyboard = [
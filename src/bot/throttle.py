@@ -0,0 +1,154 @@
+"""Throttling helpers for outgoing Telegram API calls."""
+
+import asyncio
+import logging
+from datetime import timedelta
+from time import monotonic
+from typing import Any, Callable, Coroutine
+
+from telegram import CallbackQuery
+from telegram.error import BadRequest, RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class EditCoalescer:
+    """
+    Merge rapid edits of the same message into as few API calls as possible.
+
+    The first edit of a message is sent straight away. Edits arriving within
+    `window` seconds of the last one sent are held back, and only the newest
+    of them is sent once the window has passed. Repeating the edit just sent
+    is dropped instead of being sent again.
+    """
+
+    def __init__(self, window: float = 0.2, max_tracked: int = 1024):
+        self.window = window
+        self.max_tracked = max_tracked
+        # (chat_id, message_id) -> (sent at, text, markup) of the last edit sent
+        self._sent: dict[tuple[int, int], tuple[float, str, object]] = {}
+        # (chat_id, message_id) -> (query, text, kwargs) waiting to be flushed
+        self._pending: dict[tuple[int, int], tuple[CallbackQuery, str, dict]] = {}
+        # Scheduled flushes, referenced so they are not garbage collected
+        self._flushes: set[asyncio.Task] = set()
+
+    async def edit(self, query: CallbackQuery, text: str, **kwargs) -> None:
+        """Edit the query's message, coalescing with other edits of it."""
+        message = query.message
+        key = (message.chat_id, message.message_id)
+
+        if key in self._pending:
+            # A flush is already scheduled; it will send this text instead
+            self._pending[key] = (query, text, kwargs)
+            return
+
+        last = self._sent.get(key)
+        delay = last[0] + self.window - monotonic() if last else 0
+        if delay > 0 and last[1:] == (text, kwargs.get("reply_markup")):
+            return
+
+        if delay <= 0:
+            await self._send(key, query, text, kwargs)
+            return
+
+        self._pending[key] = (query, text, kwargs)
+        task = asyncio.create_task(self._flush(key, delay))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, key: tuple[int, int], delay: float) -> None:
+        """Send the newest held-back edit for a message after `delay` seconds."""
+        await asyncio.sleep(delay)
+        query, text, kwargs = self._pending.pop(key)
+        try:
+            await self._send(key, query, text, kwargs)
+        except Exception as e:
+            logger.error(f"Delayed message edit failed: {e}")
+
+    async def _send(
+        self,
+        key: tuple[int, int],
+        query: CallbackQuery,
+        text: str,
+        kwargs: dict
+    ) -> None:
+        """Send an edit and remember it as the message's current content."""
+        if len(self._sent) >= self.max_tracked:
+            self._prune()
+        self._sent[key] = (monotonic(), text, kwargs.get("reply_markup"))
+        try:
+            await query.edit_message_text(text, **kwargs)
+        except BadRequest as e:
+            # Editing to unchanged content is harmless; anything else is not
+            if "not modified" not in str(e).lower():
+                raise
+
+    def _prune(self) -> None:
+        """Forget messages whose last edit is outside the window."""
+        cutoff = monotonic() - self.window
+        for key in [k for k, (sent, _, _) in self._sent.items() if sent < cutoff]:
+            del self._sent[key]
+
+
+class TokenBucketRateLimiter(BaseRateLimiter[None]):
+    """
+    Keep the bot's outgoing API calls under Telegram's bot-wide limit.
+
+    Telegram allows roughly 30 messages per second per bot and answers
+    bursts beyond that with 429 errors. Up to `capacity` calls go out at
+    once, then calls are spaced `1 / rate` seconds apart. A call rejected
+    with RetryAfter anyway is retried after the wait Telegram asks for.
+    Install with ApplicationBuilder.rate_limiter(); getUpdates is exempt.
+    """
+
+    def __init__(self, rate: float = 28.0, capacity: int = 28, max_retries: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_retries = max_retries
+        self._tokens = float(capacity)
+        self._updated = monotonic()
+        # Waiters queue here in arrival order while the bucket refills
+        self._lock = asyncio.Lock()
+
+    async def initialize(self) -> None:
+        """Nothing to set up; the bucket starts full."""
+
+    async def shutdown(self) -> None:
+        """Nothing to release."""
+
+    async def _take(self) -> None:
+        """Wait until a token is available and consume it."""
+        async with self._lock:
+            now = monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._tokens = 0.0
+                self._updated = monotonic()
+            else:
+                self._tokens -= 1
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: None
+    ) -> Any:
+        """Send a request once the bucket allows it."""
+        for attempt in range(self.max_retries + 1):
+            await self._take()
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                logger.warning(f"Rate limited on {endpoint}; retrying in {retry_after}s")
+                await asyncio.sleep(retry_after)
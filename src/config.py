@@ -40,6 +40,12 @@ class Config:
                 keys.append(key)
         return keys
 
+    # Webhook mode (optional) - polling is used when WEBHOOK_URL is empty
+    WEBHOOK_URL: str = os.getenv("WEBHOOK_URL", "")
+    WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_LISTEN: str = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+    WEBHOOK_PORT: int = int(os.getenv("WEBHOOK_PORT", "8443"))
+
     # Database
     DATABASE_PATH: str = os.getenv("DATABASE_PATH", str(DATA_DIR / "bot.db"))
 
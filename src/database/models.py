@@ -1,7 +1,23 @@
 """Database schema and initialization."""
 
 import sqlite3
+import threading
 from pathlib import Path
+from typing import Optional
+
+# Event categories, resolved from the event name when the event is saved
+EVENT_CATEGORY_MIDTERM_BREAK = "midterm_break"
+EVENT_CATEGORY_MIDTERM_EXAM = "midterm_exam"
+EVENT_CATEGORY_FINAL_EXAM = "final_exam"
+
+# Columns covered by the full-text search index of each searchable table
+FTS_COLUMNS = {
+    "assignments": ("title", "description", "subject_code"),
+    "tasks": ("title", "description", "location"),
+    "todos": ("title",),
+    "schedule": ("subject_code", "subject_name", "room"),
+    "events": ("name", "name_en"),
+}
 
 
 SCHEMA = """
@@ -31,6 +47,7 @@ CREATE TABLE IF NOT EXISTS events (
     subject_code TEXT,
     exam_time TEXT,
     last_reminder_level INTEGER DEFAULT 0,
+    category TEXT,
     created_at TEXT DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -133,9 +150,53 @@ CREATE TABLE IF NOT EXISTS voice_notes (
     tags TEXT,
     created_at TEXT DEFAULT CURRENT_TIMESTAMP
 );
+
+-- Transcripts waiting for the user to pick a processing option
+CREATE TABLE IF NOT EXISTS pending_voice (
+    chat_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    transcript TEXT NOT NULL,
+    duration INTEGER,
+    expires_at TEXT NOT NULL,
+    PRIMARY KEY (chat_id, message_id)
+);
 """
 
 
+def classify_event_category(
+    event_type: str,
+    name: Optional[str],
+    name_en: Optional[str]
+) -> Optional[str]:
+    """
+    Classify an event into a lookup category from its type and names.
+
+    Args:
+        event_type: The event type (e.g. 'break', 'exam').
+        name: The Malay event name.
+        name_en: The English event name.
+
+    Returns:
+        One of the EVENT_CATEGORY_* constants, or None if uncategorized.
+        Break events only ever get EVENT_CATEGORY_MIDTERM_BREAK, which
+        semester_logic.classify_break_event relies on.
+    """
+    name = (name or "").lower()
+    name_en = (name_en or "").lower()
+
+    def mentions(*keywords: str) -> bool:
+        return any(k in name or k in name_en for k in keywords)
+
+    if event_type == "break" and mentions("pertengahan", "mid"):
+        return EVENT_CATEGORY_MIDTERM_BREAK
+    if event_type == "exam":
+        if mentions("akhir", "final"):
+            return EVENT_CATEGORY_FINAL_EXAM
+        if mentions("pertengahan", "mid"):
+            return EVENT_CATEGORY_MIDTERM_EXAM
+    return None
+
+
 def get_connection(db_path: str) -> sqlite3.Connection:
     """Get a database connection with row factory enabled."""
     conn = sqlite3.connect(db_path)
@@ -143,6 +204,75 @@ def get_connection(db_path: str) -> sqlite3.Connection:
     return conn
 
 
+class PooledConnection(sqlite3.Connection):
+    """A connection whose close() hands it back to its pool when there is room."""
+
+    pool: Optional["ConnectionPool"] = None
+
+    def close(self) -> None:
+        if self.in_transaction:
+            self.rollback()
+        if self.pool is not None and self.pool.release(self):
+            return
+        super().close()
+
+
+class ConnectionPool:
+    """
+    Keep up to `size` open connections to one database for reuse.
+
+    Opening a connection per call throws away SQLite's page cache; pooled
+    connections keep it warm between calls. Connections are handed to one
+    caller at a time, so they may move between worker threads.
+    """
+
+    def __init__(self, db_path: str, size: int = 8):
+        self.db_path = db_path
+        self.size = size
+        self._idle: list[PooledConnection] = []
+        self._lock = threading.Lock()
+
+    def acquire(self) -> PooledConnection:
+        """Take an idle connection, or open a new one."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+
+        # Pooled connections live long enough for sqlite3's per-connection
+        # statement cache to matter; size it to hold every query in operations
+        conn = sqlite3.connect(
+            self.db_path,
+            factory=PooledConnection,
+            check_same_thread=False,
+            cached_statements=256
+        )
+        conn.row_factory = sqlite3.Row
+        # Safe with WAL: a crash can lose the last commits but not corrupt the file
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA cache_size = -20000")
+        # Sorts and temp indexes stay in RAM; reads map the file instead of copying pages
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA mmap_size = 268435456")
+        conn.pool = self
+        return conn
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.pool = None
+            conn.close()
+
+    def release(self, conn: PooledConnection) -> bool:
+        """Return a connection to the pool. False if the pool is full."""
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return True
+        return False
+
+
 def init_db(db_path: str) -> None:
     """Initialize the database with all required tables."""
     # Ensure parent directory exists
@@ -150,6 +280,8 @@ def init_db(db_path: str) -> None:
 
     conn = get_connection(db_path)
     try:
+        # WAL lets readers run alongside a writer; the mode persists in the file
+        conn.execute("PRAGMA journal_mode = WAL")
         conn.executescript(SCHEMA)
         conn.commit()
 
@@ -174,3 +306,69 @@ def _run_migrations(conn: sqlite3.Connection) -> None:
     if "last_reminder_level" not in columns:
         cursor.execute("ALTER TABLE events ADD COLUMN last_reminder_level INTEGER DEFAULT 0")
         conn.commit()
+
+    if "category" not in columns:
+        cursor.execute("ALTER TABLE events ADD COLUMN category TEXT")
+        # Backfill categories for events saved before the column existed
+        cursor.execute("SELECT id, event_type, name, name_en FROM events")
+        cursor.executemany(
+            "UPDATE events SET category = ? WHERE id = ?",
+            [
+                (classify_event_category(row[1], row[2], row[3]), row[0])
+                for row in cursor.fetchall()
+            ]
+        )
+        conn.commit()
+
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_events_category ON events(category, start_date)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_events_subject ON events(subject_code, start_date)"
+    )
+    conn.commit()
+
+    _create_search_indexes(conn)
+
+
+def _create_search_indexes(conn: sqlite3.Connection) -> None:
+    """
+    Create trigram FTS5 indexes that mirror the searchable tables.
+
+    The trigram tokenizer keeps the case-insensitive substring semantics of
+    the LIKE search. SQLite builds without FTS5 (or older than 3.34) skip
+    this step and search falls back to LIKE.
+    """
+    for table, columns in FTS_COLUMNS.items():
+        fts = f"{table}_fts"
+        cols = ", ".join(columns)
+        new_vals = ", ".join(f"new.{c}" for c in columns)
+        old_vals = ", ".join(f"old.{c}" for c in columns)
+
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (fts,)
+        ).fetchone()
+        if exists:
+            continue
+
+        try:
+            conn.executescript(f"""
+                CREATE VIRTUAL TABLE {fts} USING fts5(
+                    {cols}, content='{table}', content_rowid='id', tokenize='trigram'
+                );
+                CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals});
+                END;
+                CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+                END;
+                CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+                    INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+                    INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_vals});
+                END;
+                INSERT INTO {fts}({fts}) VALUES ('rebuild');
+            """)
+        except sqlite3.OperationalError:
+            # FTS5 or the trigram tokenizer is not available
+            conn.rollback()
+            return
@@ -3,8 +3,34 @@
 import json
 import sqlite3
 from datetime import datetime, timedelta
-from typing import Optional
-from .models import get_connection
+from functools import lru_cache
+from time import monotonic
+from types import MappingProxyType
+from typing import Mapping, Optional, Union
+from .models import FTS_COLUMNS, ConnectionPool, classify_event_category
+
+# Write counters per table; bumping one invalidates every instance's cache
+_TABLE_VERSIONS: dict[str, int] = {}
+TABLE_CACHE_TTL = 60  # seconds
+PENDING_VOICE_TTL = timedelta(minutes=10)
+
+_COMPLETABLE_TABLES = ("assignments", "tasks", "todos")
+
+# Fixed statements for (un)doing a completion, one per completable table
+_COMPLETE_SQL = {
+    table: f"UPDATE {table} SET is_completed = 1, completed_at = ? WHERE id = ?"
+    for table in _COMPLETABLE_TABLES
+}
+_UNCOMPLETE_SQL = {
+    table: f"UPDATE {table} SET is_completed = 0, completed_at = NULL WHERE id = ?"
+    for table in _COMPLETABLE_TABLES
+}
+
+# Written by every undoable action; one string so it is prepared once per connection
+_INSERT_ACTION_SQL = (
+    "INSERT INTO action_history (action_type, table_name, item_id, old_data, new_data) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
 
 
 class DatabaseOperations:
@@ -12,14 +38,82 @@ class DatabaseOperations:
 
     def __init__(self, db_path: str):
         self.db_path = db_path
+        self._pool = ConnectionPool(db_path)
+        # Single-table reads: query -> (table version, expires_at, rows)
+        self._table_cache: dict[str, tuple[int, float, tuple[dict, ...]]] = {}
+        # Subject aliases: (schedule version, expires_at, alias -> code)
+        self._aliases_cache: Optional[tuple[int, float, Mapping[str, str]]] = None
+        # Earliest event per category: (events version, expires_at, category -> event)
+        self._category_cache: Optional[tuple[int, float, dict[str, dict]]] = None
+        # Whether the FTS5 search indexes exist, checked on first search
+        self._fts_enabled: Optional[bool] = None
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self._pool.close()
 
     def _get_conn(self) -> sqlite3.Connection:
-        return get_connection(self.db_path)
+        """Get a pooled connection; closing it returns it to the pool."""
+        return self._pool.acquire()
+
+    def _cached_table(self, table: str, query: str) -> list[dict]:
+        """
+        Run a parameterless read of one table, reusing it until the table changes.
+
+        Entries also expire after TABLE_CACHE_TTL as a backstop for writes
+        made outside this class. Callers get fresh dict copies.
+        """
+        version = _TABLE_VERSIONS.get(table, 0)
+        now = monotonic()
+        cached = self._table_cache.get(query)
+        if cached is None or cached[0] != version or cached[1] <= now:
+            conn = self._get_conn()
+            try:
+                rows = tuple(dict(row) for row in conn.execute(query).fetchall())
+            finally:
+                conn.close()
+            # Store the version read before querying, so a write that
+            # lands mid-read leaves this entry stale rather than wrong
+            cached = (version, now + TABLE_CACHE_TTL, rows)
+            self._table_cache[query] = cached
+        return [dict(row) for row in cached[2]]
+
+    @staticmethod
+    def get_table_version(table: str) -> int:
+        """Get a table's write counter, which changes whenever the table does."""
+        return _TABLE_VERSIONS.get(table, 0)
+
+    @staticmethod
+    def _invalidate_table_cache(table: str) -> None:
+        """Mark cached reads of a table as stale."""
+        _TABLE_VERSIONS[table] = _TABLE_VERSIONS.get(table, 0) + 1
+
+    def _invalidate_schedule_caches(self) -> None:
+        """Drop caches derived from the schedule table."""
+        self._invalidate_table_cache("schedule")
+
+    def _invalidate_event_caches(self) -> None:
+        """Drop caches derived from the events table."""
+        self._invalidate_table_cache("events")
+
+    def _invalidate_user_config_cache(self) -> None:
+        """Drop cached user config rows."""
+        DatabaseOperations._fetch_user_config.cache_clear()
+
+    def _invalidate_notification_settings_cache(self) -> None:
+        """Drop cached notification settings."""
+        DatabaseOperations._fetch_notification_settings.cache_clear()
 
     # ==================== User Config ====================
 
     def get_user_config(self, chat_id: int) -> Optional[dict]:
         """Get user configuration by Telegram chat ID."""
+        row = self._fetch_user_config(chat_id)
+        return dict(row) if row is not None else None
+
+    @lru_cache(maxsize=1024)
+    def _fetch_user_config(self, chat_id: int) -> Optional[Mapping]:
+        """Fetch a user config row, cached (read-only) until config changes."""
         conn = self._get_conn()
         try:
             cursor = conn.execute(
@@ -27,7 +121,7 @@ class DatabaseOperations:
                 (chat_id,)
             )
             row = cursor.fetchone()
-            return dict(row) if row else None
+            return MappingProxyType(dict(row)) if row else None
         finally:
             conn.close()
 
@@ -40,6 +134,7 @@ class DatabaseOperations:
                 (chat_id,)
             )
             conn.commit()
+            self._invalidate_user_config_cache()
             return cursor.lastrowid
         finally:
             conn.close()
@@ -59,6 +154,7 @@ class DatabaseOperations:
                 values
             )
             conn.commit()
+            self._invalidate_user_config_cache()
             return True
         finally:
             conn.close()
@@ -75,19 +171,57 @@ class DatabaseOperations:
         affects_classes: bool = True
     ) -> int:
         """Add an academic event. Returns the new ID."""
+        category = classify_event_category(event_type, name, name_en)
         conn = self._get_conn()
         try:
             cursor = conn.execute(
                 """INSERT INTO events
-                   (event_type, name, name_en, start_date, end_date, affects_classes)
-                   VALUES (?, ?, ?, ?, ?, ?)""",
-                (event_type, name, name_en, start_date, end_date, int(affects_classes))
+                   (event_type, name, name_en, start_date, end_date, affects_classes, category)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (event_type, name, name_en, start_date, end_date, int(affects_classes), category)
             )
             conn.commit()
+            self._invalidate_event_caches()
             return cursor.lastrowid
         finally:
             conn.close()
 
+    def add_events_bulk(self, events: list[dict]) -> int:
+        """
+        Add many academic events in a single transaction.
+
+        Args:
+            events: Dicts with the same keys as add_event's arguments.
+
+        Returns:
+            Number of events added.
+        """
+        rows = [
+            (
+                e["event_type"],
+                e.get("name"),
+                e.get("name_en"),
+                e["start_date"],
+                e.get("end_date"),
+                int(e.get("affects_classes", True)),
+                classify_event_category(e["event_type"], e.get("name"), e.get("name_en")),
+            )
+            for e in events
+        ]
+        conn = self._get_conn()
+        try:
+            conn.executemany(
+                """INSERT INTO events
+                   (event_type, name, name_en, start_date, end_date, affects_classes, category)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                rows
+            )
+            conn.commit()
+            self._invalidate_event_caches()
+            return len(rows)
+        finally:
+            conn.close()
+
     def get_events_in_range(self, start: str, end: str) -> list[dict]:
         """Get events within a date range."""
         conn = self._get_conn()
@@ -118,12 +252,46 @@ class DatabaseOperations:
         finally:
             conn.close()
 
+    def get_event_by_category(self, category: str) -> Optional[dict]:
+        """
+        Get the earliest event in a category (see EVENT_CATEGORY_* in models).
+
+        Events are bucketed by category in one pass over the cached event
+        list, and the buckets are reused until the events change.
+        """
+        version = _TABLE_VERSIONS.get("events", 0)
+        now = monotonic()
+        cached = self._category_cache
+        if cached is None or cached[0] != version or cached[1] <= now:
+            earliest = {}
+            # get_all_events is ordered by start date, so the first seen wins
+            for event in self.get_all_events():
+                if event["category"]:
+                    earliest.setdefault(event["category"], event)
+            cached = self._category_cache = (version, now + TABLE_CACHE_TTL, earliest)
+        event = cached[2].get(category)
+        return dict(event) if event else None
+
+    def get_break_events(self) -> list[dict]:
+        """Get break events, the only events week-number calculation uses."""
+        conn = self._get_conn()
+        try:
+            cursor = conn.execute(
+                """SELECT * FROM events
+                   WHERE event_type = 'break'
+                   ORDER BY start_date"""
+            )
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
     def clear_events(self) -> int:
         """Clear all events. Returns number deleted."""
         conn = self._get_conn()
         try:
             cursor = conn.execute("DELETE FROM events")
             conn.commit()
+            self._invalidate_event_caches()
             return cursor.rowcount
         finally:
             conn.close()
@@ -153,10 +321,49 @@ class DatabaseOperations:
                  class_type, room, lecturer_name)
             )
             conn.commit()
+            self._invalidate_schedule_caches()
             return cursor.lastrowid
         finally:
             conn.close()
 
+    def add_schedule_slots_bulk(self, slots: list[dict]) -> int:
+        """
+        Add many schedule slots in a single transaction.
+
+        Args:
+            slots: Dicts with the same keys as add_schedule_slot's arguments.
+
+        Returns:
+            Number of slots added.
+        """
+        rows = [
+            (
+                s["day_of_week"],
+                s["start_time"],
+                s["end_time"],
+                s["subject_code"],
+                s.get("subject_name"),
+                s.get("class_type") or "LEC",
+                s.get("room"),
+                s.get("lecturer_name"),
+            )
+            for s in slots
+        ]
+        conn = self._get_conn()
+        try:
+            conn.executemany(
+                """INSERT INTO schedule
+                   (day_of_week, start_time, end_time, subject_code, subject_name,
+                    class_type, room, lecturer_name)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                rows
+            )
+            conn.commit()
+            self._invalidate_schedule_caches()
+            return len(rows)
+        finally:
+            conn.close()
+
     def get_schedule_for_day(self, day_of_week: int) -> list[dict]:
         """Get all schedule slots for a day (0=Monday, 6=Sunday)."""
         conn = self._get_conn()
@@ -172,15 +379,10 @@ class DatabaseOperations:
             conn.close()
 
     def get_all_schedule(self) -> list[dict]:
-        """Get entire weekly schedule."""
-        conn = self._get_conn()
-        try:
-            cursor = conn.execute(
-                "SELECT * FROM schedule ORDER BY day_of_week, start_time"
-            )
-            return [dict(row) for row in cursor.fetchall()]
-        finally:
-            conn.close()
+        """Get entire weekly schedule (cached until the schedule changes)."""
+        return self._cached_table(
+            "schedule", "SELECT * FROM schedule ORDER BY day_of_week, start_time"
+        )
 
     def clear_schedule(self) -> int:
         """Clear all schedule slots. Returns number deleted."""
@@ -188,6 +390,7 @@ class DatabaseOperations:
         try:
             cursor = conn.execute("DELETE FROM schedule")
             conn.commit()
+            self._invalidate_schedule_caches()
             return cursor.rowcount
         finally:
             conn.close()
@@ -205,30 +408,53 @@ class DatabaseOperations:
         finally:
             conn.close()
 
-    def get_schedule_by_subject(self, search: str) -> list[dict]:
+    def get_schedule_by_subject(
+        self,
+        search: str,
+        class_type: str = None,
+        limit: int = None
+    ) -> list[dict]:
         """
         Find schedule slots by subject code OR subject name (fuzzy match).
         Returns all matching slots (could be multiple for same subject on different days).
+
+        If class_type is given (e.g. "LAB"), slots of that type are listed first.
         """
         conn = self._get_conn()
         try:
-            search_upper = search.upper()
             search_pattern = f"%{search}%"
             cursor = conn.execute(
                 """SELECT * FROM schedule
                    WHERE subject_code LIKE ? OR subject_name LIKE ?
-                   ORDER BY day_of_week, start_time""",
-                (search_pattern, search_pattern)
+                   ORDER BY UPPER(COALESCE(class_type, '')) = ? DESC, day_of_week, start_time
+                   LIMIT ?""",
+                (search_pattern, search_pattern,
+                 class_type.upper() if class_type else None,
+                 limit if limit is not None else -1)
             )
             return [dict(row) for row in cursor.fetchall()]
         finally:
             conn.close()
 
-    def get_subject_aliases(self) -> dict:
+    def get_subject_aliases(self) -> Mapping[str, str]:
         """
-        Build a mapping of subject name aliases to subject codes.
+        Get a mapping of subject name aliases to subject codes.
         Returns dict like {"database design": "BITI1113", "programming": "BITP1113"}
+
+        The result is cached (read-only) until the schedule table version
+        changes, so every instance sees writes made through any other.
         """
+        version = _TABLE_VERSIONS.get("schedule", 0)
+        now = monotonic()
+        cached = self._aliases_cache
+        if cached is None or cached[0] != version or cached[1] <= now:
+            cached = self._aliases_cache = (
+                version, now + TABLE_CACHE_TTL, self._build_subject_aliases()
+            )
+        return cached[2]
+
+    def _build_subject_aliases(self) -> Mapping[str, str]:
+        """Build the subject alias mapping from the schedule table."""
         # Common filler words to skip when building abbreviations
         FILLER_WORDS = {"and", "or", "of", "the", "for", "in", "to", "a", "an", "&"}
 
@@ -301,7 +527,7 @@ class DatabaseOperations:
                         for length in [3, 4, 5]:
                             aliases[name_lower[:length]] = code
 
-            return aliases
+            return MappingProxyType(aliases)
         finally:
             conn.close()
 
@@ -334,6 +560,7 @@ class DatabaseOperations:
             query = f"UPDATE schedule SET {', '.join(updates)} WHERE id = ?"
             conn.execute(query, tuple(params))
             conn.commit()
+            self._invalidate_schedule_caches()
             return True
         finally:
             conn.close()
@@ -357,22 +584,19 @@ class DatabaseOperations:
                 (title, subject_code, description, due_date)
             )
             conn.commit()
+            self._invalidate_table_cache("assignments")
             return cursor.lastrowid
         finally:
             conn.close()
 
     def get_pending_assignments(self) -> list[dict]:
         """Get all incomplete assignments ordered by due date."""
-        conn = self._get_conn()
-        try:
-            cursor = conn.execute(
-                """SELECT * FROM assignments
-                   WHERE is_completed = 0
-                   ORDER BY due_date"""
-            )
-            return [dict(row) for row in cursor.fetchall()]
-        finally:
-            conn.close()
+        return self._cached_table(
+            "assignments",
+            """SELECT * FROM assignments
+               WHERE is_completed = 0
+               ORDER BY due_date"""
+        )
 
     def get_assignments_due_soon(self, hours: int) -> list[dict]:
         """Get assignments due within specified hours."""
@@ -402,6 +626,7 @@ class DatabaseOperations:
                 (datetime.now().isoformat(), assignment_id)
             )
             conn.commit()
+            self._invalidate_table_cache("assignments")
             return True
         finally:
             conn.close()
@@ -415,6 +640,7 @@ class DatabaseOperations:
                 (level, assignment_id)
             )
             conn.commit()
+            self._invalidate_table_cache("assignments")
             return True
         finally:
             conn.close()
@@ -518,22 +744,19 @@ class DatabaseOperations:
                 (title, scheduled_date, scheduled_time)
             )
             conn.commit()
+            self._invalidate_table_cache("todos")
             return cursor.lastrowid
         finally:
             conn.close()
 
     def get_pending_todos(self) -> list[dict]:
         """Get all incomplete TODOs."""
-        conn = self._get_conn()
-        try:
-            cursor = conn.execute(
-                """SELECT * FROM todos
-                   WHERE is_completed = 0
-                   ORDER BY scheduled_date, scheduled_time, created_at"""
-            )
-            return [dict(row) for row in cursor.fetchall()]
-        finally:
-            conn.close()
+        return self._cached_table(
+            "todos",
+            """SELECT * FROM todos
+               WHERE is_completed = 0
+               ORDER BY scheduled_date, scheduled_time, created_at"""
+        )
 
     def get_todos_without_time(self) -> list[dict]:
         """Get TODOs without specific scheduled time (for midnight review)."""
@@ -573,6 +796,7 @@ class DatabaseOperations:
                 (datetime.now().isoformat(), todo_id)
             )
             conn.commit()
+            self._invalidate_table_cache("todos")
             return True
         finally:
             conn.close()
@@ -583,6 +807,7 @@ class DatabaseOperations:
         try:
             conn.execute("UPDATE todos SET reminded = 1 WHERE id = ?", (todo_id,))
             conn.commit()
+            self._invalidate_table_cache("todos")
             return True
         finally:
             conn.close()
@@ -635,6 +860,7 @@ class DatabaseOperations:
             query = f"UPDATE assignments SET {', '.join(updates)} WHERE id = ?"
             conn.execute(query, tuple(params))
             conn.commit()
+            self._invalidate_table_cache("assignments")
             return True
         finally:
             conn.close()
@@ -666,15 +892,8 @@ class DatabaseOperations:
             conn.close()
 
     def get_all_events(self) -> list[dict]:
-        """Get all academic events."""
-        conn = self._get_conn()
-        try:
-            cursor = conn.execute(
-                "SELECT * FROM events ORDER BY start_date"
-            )
-            return [dict(row) for row in cursor.fetchall()]
-        finally:
-            conn.close()
+        """Get all academic events (cached until the events change)."""
+        return self._cached_table("events", "SELECT * FROM events ORDER BY start_date")
 
     def find_assignment_by_title(self, search: str) -> Optional[dict]:
         """Find assignment by partial title or subject code match."""
@@ -730,30 +949,66 @@ class DatabaseOperations:
         finally:
             conn.close()
 
+    def get_completion_candidates(self, task_days: int = 7) -> dict[str, list[dict]]:
+        """
+        Get the pending items a completion message may refer to.
+
+        Only the columns needed to identify an item are loaded, in a single
+        query over all three tables.
+
+        Args:
+            task_days: How many days ahead to include scheduled tasks.
+
+        Returns:
+            Dict with 'assignments', 'tasks' and 'todos' lists of
+            {id, title[, subject_code]} dicts.
+        """
+        conn = self._get_conn()
+        try:
+            today = datetime.now().date().isoformat()
+            rows = conn.execute(
+                """SELECT kind, id, title, subject_code FROM (
+                       SELECT 'assignments' AS kind, 0 AS rank, id, title, subject_code,
+                              due_date AS k1, NULL AS k2, NULL AS k3
+                       FROM assignments WHERE is_completed = 0
+                       UNION ALL
+                       SELECT 'tasks', 1, id, title, NULL,
+                              scheduled_date, scheduled_time, NULL
+                       FROM tasks
+                       WHERE is_completed = 0
+                       AND scheduled_date >= ?
+                       AND scheduled_date <= date(?, '+' || ? || ' days')
+                       UNION ALL
+                       SELECT 'todos', 2, id, title, NULL,
+                              scheduled_date, scheduled_time, created_at
+                       FROM todos WHERE is_completed = 0
+                   )
+                   ORDER BY rank, k1, k2, k3""",
+                (today, today, task_days)
+            ).fetchall()
+            candidates = {"assignments": [], "tasks": [], "todos": []}
+            for kind, item_id, title, subject_code in rows:
+                item = {"id": item_id, "title": title}
+                if kind == "assignments":
+                    item["subject_code"] = subject_code
+                candidates[kind].append(item)
+            return candidates
+        finally:
+            conn.close()
+
     # ==================== Stats ====================
 
     def get_pending_counts(self) -> dict:
         """Get counts of pending items for status display."""
         conn = self._get_conn()
         try:
-            counts = {}
-
-            cursor = conn.execute(
-                "SELECT COUNT(*) FROM assignments WHERE is_completed = 0"
-            )
-            counts["assignments"] = cursor.fetchone()[0]
-
-            cursor = conn.execute(
-                "SELECT COUNT(*) FROM tasks WHERE is_completed = 0"
-            )
-            counts["tasks"] = cursor.fetchone()[0]
-
-            cursor = conn.execute(
-                "SELECT COUNT(*) FROM todos WHERE is_completed = 0"
-            )
-            counts["todos"] = cursor.fetchone()[0]
-
-            return counts
+            row = conn.execute(
+                """SELECT
+                       (SELECT COUNT(*) FROM assignments WHERE is_completed = 0),
+                       (SELECT COUNT(*) FROM tasks WHERE is_completed = 0),
+                       (SELECT COUNT(*) FROM todos WHERE is_completed = 0)"""
+            ).fetchone()
+            return {"assignments": row[0], "tasks": row[1], "todos": row[2]}
         finally:
             conn.close()
 
@@ -779,20 +1034,17 @@ class DatabaseOperations:
                 (subject_code, week_number, specific_date)
             )
             conn.commit()
+            self._invalidate_table_cache("online_overrides")
             return cursor.lastrowid
         finally:
             conn.close()
 
     def get_online_overrides(self) -> list[dict]:
-        """Get all online overrides."""
-        conn = self._get_conn()
-        try:
-            cursor = conn.execute(
-                "SELECT * FROM online_overrides ORDER BY week_number, specific_date"
-            )
-            return [dict(row) for row in cursor.fetchall()]
-        finally:
-            conn.close()
+        """Get all online overrides (cached until the overrides change)."""
+        return self._cached_table(
+            "online_overrides",
+            "SELECT * FROM online_overrides ORDER BY week_number, specific_date"
+        )
 
     def is_class_online(
         self,
@@ -852,6 +1104,7 @@ class DatabaseOperations:
                 (override_id,)
             )
             conn.commit()
+            self._invalidate_table_cache("online_overrides")
             return True
         finally:
             conn.close()
@@ -867,27 +1120,61 @@ class DatabaseOperations:
         name: str = None
     ) -> int:
         """Add an exam event for a subject. Returns the new ID."""
-        event_type = "exam"
-        name = name or f"{exam_type.title()} Exam - {subject_code}"
-        name_en = name
-
         conn = self._get_conn()
         try:
-            # Store time in name_en if provided (for display)
-            if exam_time:
-                name_en = f"{name} at {exam_time}"
+            exam_id = self._insert_exam(conn, subject_code, exam_type, exam_date, exam_time, name)
+            conn.commit()
+            self._invalidate_event_caches()
+            return exam_id
+        finally:
+            conn.close()
 
-            cursor = conn.execute(
-                """INSERT INTO events
-                   (event_type, name, name_en, start_date, subject_code, exam_time, affects_classes)
-                   VALUES (?, ?, ?, ?, ?, ?, 0)""",
-                (event_type, name, name_en, exam_date, subject_code, exam_time)
-            )
+    def add_exam_and_log(
+        self,
+        subject_code: str,
+        exam_type: str,
+        exam_date: str,
+        exam_time: str = None,
+        name: str = None
+    ) -> int:
+        """Add an exam and record it for undo in one transaction. Returns the new ID."""
+        conn = self._get_conn()
+        try:
+            exam_id = self._insert_exam(conn, subject_code, exam_type, exam_date, exam_time, name)
+            self._insert_action(conn, "add", "events", exam_id)
             conn.commit()
-            return cursor.lastrowid
+            self._invalidate_event_caches()
+            return exam_id
         finally:
             conn.close()
 
+    def _insert_exam(
+        self,
+        conn: sqlite3.Connection,
+        subject_code: str,
+        exam_type: str,
+        exam_date: str,
+        exam_time: Optional[str],
+        name: Optional[str]
+    ) -> int:
+        """Insert an exam event on an open connection without committing."""
+        event_type = "exam"
+        name = name or f"{exam_type.title()} Exam - {subject_code}"
+        name_en = name
+
+        # Store time in name_en if provided (for display)
+        if exam_time:
+            name_en = f"{name} at {exam_time}"
+        category = classify_event_category(event_type, name, name_en)
+
+        cursor = conn.execute(
+            """INSERT INTO events
+               (event_type, name, name_en, start_date, subject_code, exam_time, affects_classes, category)
+               VALUES (?, ?, ?, ?, ?, ?, 0, ?)""",
+            (event_type, name, name_en, exam_date, subject_code, exam_time, category)
+        )
+        return cursor.lastrowid
+
     def update_exam_reminder_level(self, exam_id: int, level: int) -> bool:
         """Update the last reminder level for an exam."""
         conn = self._get_conn()
@@ -897,6 +1184,7 @@ class DatabaseOperations:
                 (level, exam_id)
             )
             conn.commit()
+            self._invalidate_event_caches()
             return True
         finally:
             conn.close()
@@ -955,6 +1243,7 @@ class DatabaseOperations:
                 (assignment_id,)
             )
             conn.commit()
+            self._invalidate_table_cache("assignments")
             return item_dict
         finally:
             conn.close()
@@ -999,6 +1288,7 @@ class DatabaseOperations:
                 (todo_id,)
             )
             conn.commit()
+            self._invalidate_table_cache("todos")
             return item_dict
         finally:
             conn.close()
@@ -1021,6 +1311,7 @@ class DatabaseOperations:
                 (event_id,)
             )
             conn.commit()
+            self._invalidate_event_caches()
             return item_dict
         finally:
             conn.close()
@@ -1032,23 +1323,38 @@ class DatabaseOperations:
         action_type: str,
         table_name: str,
         item_id: int,
-        old_data: str = None,
-        new_data: str = None
+        old_data: Union[str, dict] = None,
+        new_data: Union[str, dict] = None
     ) -> int:
-        """Record an action for undo functionality."""
+        """Record an action for undo functionality. Dict data is stored as JSON."""
         conn = self._get_conn()
         try:
-            cursor = conn.execute(
-                """INSERT INTO action_history
-                   (action_type, table_name, item_id, old_data, new_data)
-                   VALUES (?, ?, ?, ?, ?)""",
-                (action_type, table_name, item_id, old_data, new_data)
-            )
+            action_id = self._insert_action(conn, action_type, table_name, item_id, old_data, new_data)
             conn.commit()
-            return cursor.lastrowid
+            return action_id
         finally:
             conn.close()
 
+    def _insert_action(
+        self,
+        conn: sqlite3.Connection,
+        action_type: str,
+        table_name: str,
+        item_id: int,
+        old_data: Union[str, dict] = None,
+        new_data: Union[str, dict] = None
+    ) -> int:
+        """Insert an action history row on an open connection without committing."""
+        if isinstance(old_data, dict):
+            old_data = json.dumps(old_data)
+        if isinstance(new_data, dict):
+            new_data = json.dumps(new_data)
+        cursor = conn.execute(
+            _INSERT_ACTION_SQL,
+            (action_type, table_name, item_id, old_data, new_data)
+        )
+        return cursor.lastrowid
+
     def get_last_action(self, chat_id: int = None) -> Optional[dict]:
         """Get the most recent action for undo."""
         conn = self._get_conn()
@@ -1076,6 +1382,91 @@ class DatabaseOperations:
         finally:
             conn.close()
 
+    def undo_complete(self, action: dict) -> bool:
+        """
+        Undo a completion and drop its history entry in one transaction.
+
+        Args:
+            action: The action history row recording the completion.
+
+        Returns:
+            False if the action's table has no completion state.
+        """
+        sql = _UNCOMPLETE_SQL.get(action["table_name"])
+        if sql is None:
+            return False
+
+        conn = self._get_conn()
+        try:
+            conn.execute(sql, (action["item_id"],))
+            conn.execute("DELETE FROM action_history WHERE id = ?", (action["id"],))
+            conn.commit()
+            self._invalidate_table_cache(action["table_name"])
+            return True
+        finally:
+            conn.close()
+
+    def complete_and_log(self, table_name: str, item_id: int) -> Optional[dict]:
+        """
+        Mark an item as completed and record it for undo in one transaction.
+
+        Args:
+            table_name: One of 'assignments', 'tasks' or 'todos'.
+            item_id: The item's ID.
+
+        Returns:
+            The item as it was before completion, or None if it does not exist.
+        """
+        sql = _COMPLETE_SQL[table_name]
+        conn = self._get_conn()
+        try:
+            row = conn.execute(
+                f"SELECT * FROM {table_name} WHERE id = ?",
+                (item_id,)
+            ).fetchone()
+            if not row:
+                return None
+
+            conn.execute(sql, (datetime.now().isoformat(), item_id))
+            self._insert_action(conn, "complete", table_name, item_id)
+            conn.commit()
+            self._invalidate_table_cache(table_name)
+            return dict(row)
+        finally:
+            conn.close()
+
+    def delete_and_log(self, table_name: str, item_id: int) -> Optional[dict]:
+        """
+        Delete an item and record it for undo in one transaction.
+
+        Args:
+            table_name: One of 'assignments', 'tasks' or 'todos'.
+            item_id: The item's ID.
+
+        Returns:
+            The deleted item, or None if it does not exist.
+        """
+        if table_name not in _COMPLETABLE_TABLES:
+            raise KeyError(table_name)
+
+        conn = self._get_conn()
+        try:
+            row = conn.execute(
+                f"SELECT * FROM {table_name} WHERE id = ?",
+                (item_id,)
+            ).fetchone()
+            if not row:
+                return None
+
+            item = dict(row)
+            conn.execute(f"DELETE FROM {table_name} WHERE id = ?", (item_id,))
+            self._insert_action(conn, "delete", table_name, item_id, item)
+            conn.commit()
+            self._invalidate_table_cache(table_name)
+            return item
+        finally:
+            conn.close()
+
     # ==================== Notification Settings ====================
 
     def set_notification_setting(
@@ -1094,6 +1485,7 @@ class DatabaseOperations:
                 (chat_id, setting_key, setting_value)
             )
             conn.commit()
+            self._invalidate_notification_settings_cache()
             return True
         finally:
             conn.close()
@@ -1104,20 +1496,15 @@ class DatabaseOperations:
         setting_key: str
     ) -> Optional[str]:
         """Get a notification setting for a user."""
-        conn = self._get_conn()
-        try:
-            cursor = conn.execute(
-                """SELECT setting_value FROM notification_settings
-                   WHERE chat_id = ? AND setting_key = ?""",
-                (chat_id, setting_key)
-            )
-            row = cursor.fetchone()
-            return row[0] if row else None
-        finally:
-            conn.close()
+        return self._fetch_notification_settings(chat_id).get(setting_key)
 
     def get_all_notification_settings(self, chat_id: int) -> dict:
         """Get all notification settings for a user."""
+        return dict(self._fetch_notification_settings(chat_id))
+
+    @lru_cache(maxsize=32)
+    def _fetch_notification_settings(self, chat_id: int) -> Mapping:
+        """Fetch a user's notification settings, cached (read-only) until one changes."""
         conn = self._get_conn()
         try:
             cursor = conn.execute(
@@ -1125,7 +1512,7 @@ class DatabaseOperations:
                    WHERE chat_id = ?""",
                 (chat_id,)
             )
-            return {row[0]: row[1] for row in cursor.fetchall()}
+            return MappingProxyType({row[0]: row[1] for row in cursor.fetchall()})
         finally:
             conn.close()
 
@@ -1226,68 +1613,177 @@ class DatabaseOperations:
         finally:
             conn.close()
 
+    def get_stats_overview(self, days: int = 7) -> tuple[dict, dict]:
+        """
+        Get completion statistics and pending counts in one query.
+
+        Args:
+            days: How many past days the completion statistics cover.
+
+        Returns:
+            Tuple of (stats, pending) shaped like get_completion_stats()
+            and get_pending_counts().
+        """
+        conn = self._get_conn()
+        try:
+            cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+            cursor = conn.execute(
+                """SELECT 'assignments' AS kind,
+                          TOTAL(is_completed = 1 AND completed_at >= :cutoff) AS completed,
+                          TOTAL(created_at >= :cutoff) AS total,
+                          TOTAL(is_completed = 0) AS pending
+                   FROM assignments
+                   UNION ALL
+                   SELECT 'tasks', TOTAL(is_completed = 1 AND completed_at >= :cutoff),
+                          TOTAL(created_at >= :cutoff), TOTAL(is_completed = 0)
+                   FROM tasks
+                   UNION ALL
+                   SELECT 'todos', TOTAL(is_completed = 1 AND completed_at >= :cutoff),
+                          TOTAL(created_at >= :cutoff), TOTAL(is_completed = 0)
+                   FROM todos""",
+                {"cutoff": cutoff}
+            )
+
+            stats = {}
+            pending = {}
+            for row in cursor:
+                stats[row["kind"]] = {
+                    "completed": int(row["completed"]),
+                    "total": int(row["total"])
+                }
+                pending[row["kind"]] = int(row["pending"])
+            return stats, pending
+        finally:
+            conn.close()
+
     # ==================== Global Search ====================
 
+    def _search_filters(self, conn: sqlite3.Connection, query: str) -> tuple[dict, dict]:
+        """
+        Build the WHERE clause for each searchable table.
+
+        Uses the trigram FTS5 index when it exists and the query is long
+        enough to form a trigram; otherwise falls back to LIKE scans.
+
+        Returns:
+            Tuple of (clauses keyed by table, named query parameters).
+        """
+        if self._fts_enabled is None:
+            self._fts_enabled = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'assignments_fts'"
+            ).fetchone() is not None
+
+        if self._fts_enabled and len(query) >= 3:
+            clauses = {
+                table: f"id IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH :q)"
+                for table in FTS_COLUMNS
+            }
+            # Quote as a single FTS phrase so operators in the query are literal
+            return clauses, {"q": '"' + query.replace('"', '""') + '"'}
+
+        clauses = {
+            table: " OR ".join(f"{col} LIKE :q" for col in columns)
+            for table, columns in FTS_COLUMNS.items()
+        }
+        return clauses, {"q": f"%{query}%"}
+
     def search_all(self, query: str) -> dict:
         """Search across all tables for a query string."""
         conn = self._get_conn()
         try:
-            results = {
-                "assignments": [],
-                "tasks": [],
-                "todos": [],
-                "schedule": [],
-                "events": []
+            where, params = self._search_filters(conn, query)
+            orders = {
+                "assignments": "due_date",
+                "tasks": "scheduled_date",
+                "todos": "created_at",
+                "schedule": "day_of_week, start_time",
+                "events": "start_date",
             }
 
-            search_pattern = f"%{query}%"
+            results = {}
+            for table, order in orders.items():
+                cursor = conn.execute(
+                    f"SELECT * FROM {table} WHERE {where[table]} ORDER BY {order}",
+                    params
+                )
+                results[table] = [dict(row) for row in cursor.fetchall()]
 
-            # Search assignments
-            cursor = conn.execute(
-                """SELECT * FROM assignments
-                   WHERE title LIKE ? OR description LIKE ? OR subject_code LIKE ?
-                   ORDER BY due_date""",
-                (search_pattern, search_pattern, search_pattern)
-            )
-            results["assignments"] = [dict(row) for row in cursor.fetchall()]
+            return results
+        finally:
+            conn.close()
 
-            # Search tasks
-            cursor = conn.execute(
-                """SELECT * FROM tasks
-                   WHERE title LIKE ? OR description LIKE ? OR location LIKE ?
-                   ORDER BY scheduled_date""",
-                (search_pattern, search_pattern, search_pattern)
-            )
-            results["tasks"] = [dict(row) for row in cursor.fetchall()]
+    def search_preview(self, query: str, limit: int = 5) -> tuple[dict, int]:
+        """
+        Search across all tables, returning at most `limit` rows per kind.
 
-            # Search todos
-            cursor = conn.execute(
-                """SELECT * FROM todos
-                   WHERE title LIKE ?
-                   ORDER BY created_at""",
-                (search_pattern,)
-            )
-            results["todos"] = [dict(row) for row in cursor.fetchall()]
+        Runs a single UNION ALL query and keeps only the fields the /search
+        reply displays: (id, title, is_completed) for assignments, tasks and
+        todos, (subject_code, day_of_week, start_time) for schedule slots and
+        (name, start_date) for events.
 
-            # Search schedule
-            cursor = conn.execute(
-                """SELECT * FROM schedule
-                   WHERE subject_code LIKE ? OR subject_name LIKE ? OR room LIKE ?
-                   ORDER BY day_of_week, start_time""",
-                (search_pattern, search_pattern, search_pattern)
+        Returns:
+            Tuple of (result tuples keyed by kind, total number of matches).
+        """
+        conn = self._get_conn()
+        try:
+            where, params = self._search_filters(conn, query)
+            cursor = conn.execute(
+                f"""SELECT * FROM (
+                       SELECT 'assignments' AS kind, id, title AS label, is_completed,
+                              NULL AS day_of_week, NULL AS start_time, NULL AS start_date,
+                              ROW_NUMBER() OVER (ORDER BY due_date, id) AS rn,
+                              COUNT(*) OVER () AS total
+                       FROM assignments
+                       WHERE {where['assignments']}
+                       UNION ALL
+                       SELECT 'tasks', id, title, is_completed, NULL, NULL, NULL,
+                              ROW_NUMBER() OVER (ORDER BY scheduled_date, id),
+                              COUNT(*) OVER ()
+                       FROM tasks
+                       WHERE {where['tasks']}
+                       UNION ALL
+                       SELECT 'todos', id, title, is_completed, NULL, NULL, NULL,
+                              ROW_NUMBER() OVER (ORDER BY created_at, id),
+                              COUNT(*) OVER ()
+                       FROM todos
+                       WHERE {where['todos']}
+                       UNION ALL
+                       SELECT 'schedule', id, subject_code, NULL, day_of_week, start_time, NULL,
+                              ROW_NUMBER() OVER (ORDER BY day_of_week, start_time, id),
+                              COUNT(*) OVER ()
+                       FROM schedule
+                       WHERE {where['schedule']}
+                       UNION ALL
+                       SELECT 'events', id, COALESCE(NULLIF(name_en, ''), name, 'Unknown'),
+                              NULL, NULL, NULL, start_date,
+                              ROW_NUMBER() OVER (ORDER BY start_date, id),
+                              COUNT(*) OVER ()
+                       FROM events
+                       WHERE {where['events']}
+                   )
+                   WHERE rn <= :limit
+                   ORDER BY kind, rn""",
+                {**params, "limit": limit}
             )
-            results["schedule"] = [dict(row) for row in cursor.fetchall()]
 
-            # Search events
-            cursor = conn.execute(
-                """SELECT * FROM events
-                   WHERE name LIKE ? OR name_en LIKE ?
-                   ORDER BY start_date""",
-                (search_pattern, search_pattern)
-            )
-            results["events"] = [dict(row) for row in cursor.fetchall()]
+            results = {
+                "assignments": [],
+                "tasks": [],
+                "todos": [],
+                "schedule": [],
+                "events": []
+            }
+            totals = {}
+            for kind, item_id, label, is_completed, day_of_week, start_time, start_date, _, total in cursor:
+                if kind == "schedule":
+                    results[kind].append((label, day_of_week, start_time))
+                elif kind == "events":
+                    results[kind].append((label, start_date))
+                else:
+                    results[kind].append((item_id, label, is_completed))
+                totals[kind] = total
 
-            return results
+            return results, sum(totals.values())
         finally:
             conn.close()
 
@@ -1379,33 +1875,6 @@ class DatabaseOperations:
             return "en"
         return user_config.get("language", "en")
 
-    # ==================== Pending Counts ====================
-
-    def get_pending_counts(self) -> dict:
-        """Get counts of pending items."""
-        conn = self._get_conn()
-        try:
-            counts = {}
-
-            cursor = conn.execute(
-                "SELECT COUNT(*) FROM assignments WHERE is_completed = 0"
-            )
-            counts["assignments"] = cursor.fetchone()[0]
-
-            cursor = conn.execute(
-                "SELECT COUNT(*) FROM tasks WHERE is_completed = 0"
-            )
-            counts["tasks"] = cursor.fetchone()[0]
-
-            cursor = conn.execute(
-                "SELECT COUNT(*) FROM todos WHERE is_completed = 0"
-            )
-            counts["todos"] = cursor.fetchone()[0]
-
-            return counts
-        finally:
-            conn.close()
-
     # ==================== Get Item By ID ====================
 
     def get_assignment_by_id(self, assignment_id: int) -> Optional[dict]:
@@ -1447,18 +1916,29 @@ class DatabaseOperations:
         finally:
             conn.close()
 
-    def get_schedule_by_subject(self, subject: str) -> list[dict]:
-        """Get schedule slots for a subject by code or name."""
+    def get_event_by_id(self, event_id: int) -> Optional[dict]:
+        """Get a specific event by ID."""
         conn = self._get_conn()
         try:
-            search_pattern = f"%{subject}%"
             cursor = conn.execute(
-                """SELECT * FROM schedule
-                   WHERE subject_code LIKE ? OR subject_name LIKE ?
-                   ORDER BY day_of_week, start_time""",
-                (search_pattern, search_pattern)
+                "SELECT * FROM events WHERE id = ?",
+                (event_id,)
             )
-            return [dict(row) for row in cursor.fetchall()]
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    def get_online_override_by_id(self, override_id: int) -> Optional[dict]:
+        """Get a specific online override by ID."""
+        conn = self._get_conn()
+        try:
+            cursor = conn.execute(
+                "SELECT * FROM online_overrides WHERE id = ?",
+                (override_id,)
+            )
+            row = cursor.fetchone()
+            return dict(row) if row else None
         finally:
             conn.close()
 
@@ -1556,6 +2036,58 @@ class DatabaseOperations:
         finally:
             conn.close()
 
+    def save_pending_voice(
+        self,
+        chat_id: int,
+        message_id: int,
+        transcript: str,
+        duration: int
+    ) -> None:
+        """Store a transcript until the user picks how to process it."""
+        now = datetime.now()
+        conn = self._get_conn()
+        try:
+            conn.execute(
+                "DELETE FROM pending_voice WHERE expires_at <= ?",
+                (now.isoformat(),)
+            )
+            conn.execute(
+                """INSERT OR REPLACE INTO pending_voice
+                   (chat_id, message_id, transcript, duration, expires_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (chat_id, message_id, transcript, duration,
+                 (now + PENDING_VOICE_TTL).isoformat())
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get_pending_voice(self, chat_id: int, message_id: int) -> Optional[dict]:
+        """Get a pending transcript, or None if it is missing or expired."""
+        conn = self._get_conn()
+        try:
+            cursor = conn.execute(
+                """SELECT transcript, duration FROM pending_voice
+                   WHERE chat_id = ? AND message_id = ? AND expires_at > ?""",
+                (chat_id, message_id, datetime.now().isoformat())
+            )
+            row = cursor.fetchone()
+            return dict(row) if row else None
+        finally:
+            conn.close()
+
+    def delete_pending_voice(self, chat_id: int, message_id: int) -> None:
+        """Drop a pending transcript once it has been handled."""
+        conn = self._get_conn()
+        try:
+            conn.execute(
+                "DELETE FROM pending_voice WHERE chat_id = ? AND message_id = ?",
+                (chat_id, message_id)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
     def update_voice_note_title(self, note_id: int, title: str) -> bool:
         """Update a voice note's title."""
         conn = self._get_conn()
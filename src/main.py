@@ -3,12 +3,13 @@
 import asyncio
 import logging
 import sys
+from urllib.parse import urlparse
 
 from telegram.ext import Application
 
 from .config import config, Config
 from .database.models import init_db
-from .bot.handlers import register_handlers
+from .bot.handlers import ALLOWED_UPDATES, configure_transport, register_handlers
 from .scheduler.notifications import start_scheduler, stop_scheduler
 from .utils.logging_config import setup_logging
 from .utils.error_handlers import error_handler
@@ -53,7 +54,7 @@ def main() -> None:
     # Create the Application
     logger.info("Starting bot...")
     application = (
-        Application.builder()
+        configure_transport(Application.builder())
         .token(config.TELEGRAM_TOKEN)
         .post_init(post_init)
         .post_shutdown(post_shutdown)
@@ -67,8 +68,19 @@ def main() -> None:
     application.add_error_handler(error_handler)
 
     # Run the bot until Ctrl+C
-    logger.info("Bot is running. Press Ctrl+C to stop.")
-    application.run_polling()
+    if config.WEBHOOK_URL:
+        logger.info(f"Bot is running with webhook {config.WEBHOOK_URL}. Press Ctrl+C to stop.")
+        application.run_webhook(
+            listen=config.WEBHOOK_LISTEN,
+            port=config.WEBHOOK_PORT,
+            url_path=urlparse(config.WEBHOOK_URL).path.lstrip("/"),
+            webhook_url=config.WEBHOOK_URL,
+            secret_token=config.WEBHOOK_SECRET or None,
+            allowed_updates=ALLOWED_UPDATES
+        )
+    else:
+        logger.info("Bot is running. Press Ctrl+C to stop.")
+        application.run_polling(allowed_updates=ALLOWED_UPDATES)
 
 
 if __name__ == "__main__":
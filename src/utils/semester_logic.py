@@ -1,11 +1,13 @@
 """Semester week calculation and academic calendar logic."""
 
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 from typing import Optional, Union, Tuple
 
 # Day name mappings for display
-DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-DAY_NAMES_MALAY = ["Isnin", "Selasa", "Rabu", "Khamis", "Jumaat", "Sabtu", "Ahad"]
+DAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+DAY_NAMES_SHORT = tuple(name[:3] for name in DAY_NAMES)
+DAY_NAMES_MALAY = ("Isnin", "Selasa", "Rabu", "Khamis", "Jumaat", "Sabtu", "Ahad")
 
 # Break type constants
 BREAK_MID_SEMESTER = "mid_semester"
@@ -22,6 +24,13 @@ def classify_break_event(event: dict) -> str:
     Returns:
         'mid_semester' or 'inter_semester' based on event name.
     """
+    # Events loaded from the database carry a category computed at insert
+    # time, so the name scan is only needed for events without one. The
+    # database only files breaks under the midterm break category, so any
+    # category on a break marks the mid-semester break.
+    if "category" in event:
+        return BREAK_MID_SEMESTER if event["category"] else BREAK_INTER_SEMESTER
+
     name = (event.get("name") or "").lower()
     name_en = (event.get("name_en") or "").lower()
 
@@ -83,6 +92,62 @@ def get_current_break(today: date, events: list[dict]) -> Optional[dict]:
     return None
 
 
+def get_current_break_with_type(
+    today: date,
+    events: list[dict]
+) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Get the current break event together with its break type.
+
+    Args:
+        today: The current date.
+        events: List of academic events.
+
+    Returns:
+        Tuple of (break_event, break_type), or (None, None) if not in a break.
+    """
+    current_break = get_current_break(today, events)
+    if current_break is None:
+        return None, None
+    return current_break, classify_break_event(current_break)
+
+
+def get_break_window(
+    today: date,
+    events: list[dict]
+) -> Tuple[Optional[dict], Optional[str], date]:
+    """
+    Get the current break, its type and the first date on which they may change.
+
+    Until that date, get_current_break_with_type returns the same answer for
+    any day from `today` on, so callers can reuse it instead of rescanning.
+
+    Args:
+        today: The current date.
+        events: List of academic events.
+
+    Returns:
+        Tuple of (break_event, break_type, first date the answer may differ).
+        The event and type are None if not in a break; the date is date.max
+        if no break starts or ends after today.
+    """
+    valid_until = date.max
+    for event in events:
+        if event.get("event_type") != "break":
+            continue
+        event_start = parse_date(event.get("start_date"))
+        event_end = parse_date(event.get("end_date")) or event_start
+        if not event_start:
+            continue
+        if event_start > today:
+            valid_until = min(valid_until, event_start)
+        elif event_end >= today:
+            valid_until = min(valid_until, event_end + timedelta(days=1))
+
+    current_break, break_type = get_current_break_with_type(today, events)
+    return current_break, break_type, valid_until
+
+
 def is_semester_active(today: date, semester_start: date, events: list[dict]) -> bool:
     """
     Check if the semester is currently active (lectures happening).
@@ -99,8 +164,9 @@ def is_semester_active(today: date, semester_start: date, events: list[dict]) ->
     return isinstance(week, int) and 1 <= week <= 14
 
 
+@lru_cache(maxsize=1024)
 def parse_date(date_str: str) -> Optional[date]:
-    """Parse ISO date string to date object."""
+    """Parse ISO date string to date object (memoized; dates are immutable)."""
     if not date_str:
         return None
     try:
@@ -1,6 +1,7 @@
 """Tests for database CRUD operations."""
 
 import pytest
+import json
 import os
 import tempfile
 from datetime import datetime, date
@@ -11,7 +12,12 @@ from pathlib import Path
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
-from database.models import init_db, get_connection
+from database.models import (
+    init_db,
+    get_connection,
+    EVENT_CATEGORY_MIDTERM_BREAK,
+    EVENT_CATEGORY_FINAL_EXAM,
+)
 from database.operations import DatabaseOperations
 
 
@@ -30,6 +36,7 @@ def test_db():
     yield db
 
     # Cleanup
+    db.close()
     os.unlink(path)
 
 
@@ -51,6 +58,39 @@ class TestUserConfig:
         assert config is not None
         assert config["telegram_chat_id"] == chat_id
 
+    def test_get_user_config_returns_copy(self, test_db):
+        """Mutating a returned config does not affect later reads."""
+        chat_id = 12345
+        test_db.create_user_config(chat_id)
+
+        config = test_db.get_user_config(chat_id)
+        config["semester_start_date"] = "2099-01-01"
+
+        assert test_db.get_user_config(chat_id)["semester_start_date"] is None
+
+    def test_user_config_refreshes_across_instances(self, test_db):
+        """Writes through another instance are visible on the next read."""
+        chat_id = 12345
+        test_db.create_user_config(chat_id)
+        assert test_db.get_user_config(chat_id)["semester_start_date"] is None
+
+        other = DatabaseOperations(test_db.db_path)
+        other.update_user_config(chat_id, semester_start_date="2025-10-06")
+        other.close()
+
+        assert test_db.get_user_config(chat_id)["semester_start_date"] == "2025-10-06"
+
+    def test_notification_settings_refresh_after_set(self, test_db):
+        """Cached notification settings reflect a later change."""
+        chat_id = 12345
+        test_db.set_notification_setting(chat_id, "daily_briefing", "on")
+        assert test_db.get_notification_setting(chat_id, "daily_briefing") == "on"
+
+        test_db.set_notification_setting(chat_id, "daily_briefing", "off")
+        test_db.get_all_notification_settings(chat_id)["daily_briefing"] = "on"
+
+        assert test_db.get_all_notification_settings(chat_id) == {"daily_briefing": "off"}
+
     def test_get_nonexistent_user(self, test_db):
         """Get nonexistent user returns None."""
         config = test_db.get_user_config(99999)
@@ -101,6 +141,55 @@ class TestEvents:
         assert event is not None
         assert event["name"] == "Deepavali"
 
+    def test_add_events_bulk(self, test_db):
+        """Add several events at once."""
+        count = test_db.add_events_bulk([
+            {"event_type": "holiday", "name": "Hari Deepavali", "start_date": "2025-10-20"},
+            {"event_type": "break", "name": "Cuti Pertengahan Semester",
+             "start_date": "2025-11-17", "end_date": "2025-11-23", "affects_classes": True},
+        ])
+        assert count == 2
+        assert len(test_db.get_all_events()) == 2
+        assert test_db.get_event_by_category(EVENT_CATEGORY_MIDTERM_BREAK) is not None
+
+    def test_get_break_events(self, test_db):
+        """Only break events are returned, ordered by start date."""
+        test_db.add_event("holiday", "2025-10-20", name="Hari Deepavali")
+        test_db.add_event("break", "2026-02-09", name="Cuti Antara Semester")
+        test_db.add_event("break", "2025-11-17", name="Cuti Pertengahan Semester")
+
+        breaks = test_db.get_break_events()
+        assert [e["start_date"] for e in breaks] == ["2025-11-17", "2026-02-09"]
+
+    def test_get_all_events_refreshes_after_delete(self, test_db):
+        """Cached events reflect deletes."""
+        event_id = test_db.add_event("holiday", "2025-10-20", name="Hari Deepavali")
+        assert len(test_db.get_all_events()) == 1
+
+        test_db.delete_event(event_id)
+        assert test_db.get_all_events() == []
+
+    def test_get_event_by_id(self, test_db):
+        """Look up a single event by ID."""
+        event_id = test_db.add_event("holiday", "2025-10-20", name="Hari Deepavali")
+        assert test_db.get_event_by_id(event_id)["name"] == "Hari Deepavali"
+        assert test_db.get_event_by_id(event_id + 1) is None
+
+    def test_get_online_override_by_id(self, test_db):
+        """Look up a single online override by ID."""
+        override_id = test_db.add_online_override(subject_code="BITP1113", week_number=12)
+        override = test_db.get_online_override_by_id(override_id)
+        assert (override["subject_code"], override["week_number"]) == ("BITP1113", 12)
+        assert test_db.get_online_override_by_id(override_id + 1) is None
+
+    def test_online_overrides_refresh_after_writes(self, test_db):
+        """Cached online overrides reflect additions and deletions."""
+        override_id = test_db.add_online_override(week_number=12)
+        assert [o["week_number"] for o in test_db.get_online_overrides()] == [12]
+
+        test_db.delete_online_override(override_id)
+        assert test_db.get_online_overrides() == []
+
     def test_clear_events(self, test_db):
         """Clear all events."""
         test_db.add_event("holiday", "2025-10-20")
@@ -113,6 +202,68 @@ class TestEvents:
         assert len(events) == 0
 
 
+class TestEventCategories:
+    """Tests for event category lookups."""
+
+    def test_add_event_sets_category(self, test_db):
+        """Mid-semester break is categorized on insert."""
+        test_db.add_event(
+            event_type="break",
+            name="Cuti Pertengahan Semester",
+            start_date="2025-11-17",
+            end_date="2025-11-23"
+        )
+        event = test_db.get_event_by_category(EVENT_CATEGORY_MIDTERM_BREAK)
+        assert event is not None
+        assert event["name"] == "Cuti Pertengahan Semester"
+
+    def test_add_exam_sets_category(self, test_db):
+        """Final exam added via add_exam is categorized."""
+        exam_id = test_db.add_exam("BITP1113", "final", "2026-01-20")
+        event = test_db.get_event_by_category(EVENT_CATEGORY_FINAL_EXAM)
+        assert event["id"] == exam_id
+
+    def test_add_exam_and_log(self, test_db):
+        """Exam insert and its undo record are written together."""
+        exam_id = test_db.add_exam_and_log("BITP1113", "midterm", "2025-11-10", exam_time="09:00")
+
+        action = test_db.get_last_action()
+        assert (action["action_type"], action["table_name"], action["item_id"]) == (
+            "add", "events", exam_id
+        )
+        assert test_db.get_exams_for_subject("BITP1113")[0]["exam_time"] == "09:00"
+
+    def test_uncategorized_event(self, test_db):
+        """Holidays have no category."""
+        test_db.add_event(event_type="holiday", name="Hari Deepavali", start_date="2025-10-20")
+        assert test_db.get_event_by_category(EVENT_CATEGORY_MIDTERM_BREAK) is None
+
+    def test_category_lookup_refreshes_after_event_change(self, test_db):
+        """An earlier event added later takes over its category."""
+        test_db.add_event("exam", "2026-01-20", name_en="Final Examination")
+        assert test_db.get_event_by_category(EVENT_CATEGORY_FINAL_EXAM)["start_date"] == "2026-01-20"
+
+        test_db.add_event("exam", "2026-01-05", name_en="Final Examination (Part 1)")
+        assert test_db.get_event_by_category(EVENT_CATEGORY_FINAL_EXAM)["start_date"] == "2026-01-05"
+
+    def test_backfill_existing_events(self, test_db):
+        """Migration backfills categories for events saved without one."""
+        conn = get_connection(test_db.db_path)
+        conn.execute(
+            """INSERT INTO events (event_type, name, name_en, start_date)
+               VALUES ('exam', 'Peperiksaan Akhir', 'Final Examination', '2026-01-20')"""
+        )
+        conn.execute("DROP INDEX idx_events_category")
+        conn.execute("ALTER TABLE events DROP COLUMN category")
+        conn.commit()
+        conn.close()
+
+        init_db(test_db.db_path)
+
+        event = test_db.get_event_by_category(EVENT_CATEGORY_FINAL_EXAM)
+        assert event["name_en"] == "Final Examination"
+
+
 class TestSchedule:
     """Tests for schedule operations."""
 
@@ -150,6 +301,19 @@ class TestSchedule:
         schedule = test_db.get_all_schedule()
         assert len(schedule) == 2
 
+    def test_add_schedule_slots_bulk(self, test_db):
+        """Add several schedule slots at once."""
+        count = test_db.add_schedule_slots_bulk([
+            {"day_of_week": 0, "start_time": "08:00", "end_time": "10:00",
+             "subject_code": "BITP1113", "subject_name": "Programming"},
+            {"day_of_week": 1, "start_time": "14:00", "end_time": "16:00",
+             "subject_code": "BITM1113", "class_type": "LAB"},
+        ])
+        assert count == 2
+        schedule = test_db.get_all_schedule()
+        assert [s["class_type"] for s in schedule] == ["LEC", "LAB"]
+        assert test_db.get_subject_aliases().get("programming") == "BITP1113"
+
     def test_clear_schedule(self, test_db):
         """Clear all schedule slots."""
         test_db.add_schedule_slot(0, "08:00", "10:00", "BITP1113")
@@ -158,6 +322,52 @@ class TestSchedule:
         count = test_db.clear_schedule()
         assert count == 2
 
+    def test_get_schedule_by_subject_prefers_class_type(self, test_db):
+        """Slots matching the requested class type come first."""
+        test_db.add_schedule_slot(0, "08:00", "10:00", "BITP1113", class_type="LEC")
+        test_db.add_schedule_slot(2, "14:00", "16:00", "BITP1113", class_type="LAB")
+
+        slots = test_db.get_schedule_by_subject("BITP", class_type="lab", limit=1)
+        assert len(slots) == 1
+        assert slots[0]["class_type"] == "LAB"
+
+        slots = test_db.get_schedule_by_subject("BITP")
+        assert [s["day_of_week"] for s in slots] == [0, 2]
+
+    def test_get_all_schedule_cached_until_change(self, test_db):
+        """Schedule reads are cached and refreshed by writes from any instance."""
+        test_db.add_schedule_slot(0, "08:00", "10:00", "BITP1113")
+        first = test_db.get_all_schedule()
+        first[0]["subject_code"] = "MUTATED"
+        assert test_db.get_all_schedule()[0]["subject_code"] == "BITP1113"
+
+        other = DatabaseOperations(test_db.db_path)
+        other.add_schedule_slot(1, "14:00", "16:00", "BITM1113")
+        other.close()
+        assert len(test_db.get_all_schedule()) == 2
+
+    def test_subject_aliases_refresh_on_schedule_change(self, test_db):
+        """Cached aliases are rebuilt after schedule writes."""
+        test_db.add_schedule_slot(0, "08:00", "10:00", "BITP1113", subject_name="Programming")
+        assert test_db.get_subject_aliases().get("programming") == "BITP1113"
+
+        test_db.clear_schedule()
+        assert "programming" not in test_db.get_subject_aliases()
+
+        test_db.add_schedule_slot(1, "14:00", "16:00", "BITS1123", subject_name="Statistics")
+        assert test_db.get_subject_aliases().get("stat") == "BITS1123"
+
+    def test_subject_aliases_refresh_across_instances(self, test_db):
+        """A schedule write through one instance refreshes another's aliases."""
+        test_db.add_schedule_slot(0, "08:00", "10:00", "BITP1113", subject_name="Programming")
+        assert "programming" in test_db.get_subject_aliases()
+
+        other = DatabaseOperations(test_db.db_path)
+        other.add_schedule_slot(1, "14:00", "16:00", "BITS1123", subject_name="Statistics")
+        assert other.get_subject_aliases().get("statistics") == "BITS1123"
+        other.close()
+        assert test_db.get_subject_aliases().get("statistics") == "BITS1123"
+
 
 class TestAssignments:
     """Tests for assignment operations."""
@@ -179,6 +389,17 @@ class TestAssignments:
         pending = test_db.get_pending_assignments()
         assert len(pending) == 2
 
+    def test_pending_assignments_refresh_after_writes(self, test_db):
+        """Cached pending assignments reflect completions and new rows."""
+        first_id = test_db.add_assignment("Report", "2099-01-01T23:59:00")
+        assert len(test_db.get_pending_assignments()) == 1
+
+        test_db.complete_assignment(first_id)
+        assert test_db.get_pending_assignments() == []
+
+        test_db.add_assignment("Lab", "2099-01-02T23:59:00")
+        assert [a["title"] for a in test_db.get_pending_assignments()] == ["Lab"]
+
     def test_complete_assignment(self, test_db):
         """Mark assignment as complete."""
         assignment_id = test_db.add_assignment("Report", "2025-10-25T17:00:00")
@@ -214,6 +435,56 @@ class TestAssignments:
         assignment = test_db.get_assignment_by_id(assignment_id)
         assert assignment["last_reminder_level"] == 3
 
+    def test_undo_complete(self, test_db):
+        """Undoing a completion reopens the item and drops the history entry."""
+        assignment_id = test_db.add_assignment("Report", "2025-10-25T17:00:00")
+        test_db.complete_assignment(assignment_id)
+        test_db.add_action_history("complete", "assignments", assignment_id)
+
+        assert test_db.undo_complete(test_db.get_last_action())
+        assert len(test_db.get_pending_assignments()) == 1
+        assert test_db.get_last_action() is None
+
+    def test_undo_complete_rejects_other_tables(self, test_db):
+        """Only completable tables can be uncompleted."""
+        test_db.add_action_history("complete", "events", 1)
+
+        assert not test_db.undo_complete(test_db.get_last_action())
+        assert test_db.get_last_action() is not None
+
+    def test_complete_and_log(self, test_db):
+        """Completion and its history entry are written together."""
+        assignment_id = test_db.add_assignment("Report", "2025-10-25T17:00:00")
+
+        item = test_db.complete_and_log("assignments", assignment_id)
+
+        assert item["title"] == "Report"
+        assert test_db.get_pending_assignments() == []
+        action = test_db.get_last_action()
+        assert action["action_type"] == "complete"
+        assert action["item_id"] == assignment_id
+
+    def test_complete_and_log_missing_item(self, test_db):
+        """A missing item is not logged."""
+        assert test_db.complete_and_log("assignments", 999) is None
+        assert test_db.get_last_action() is None
+
+    def test_delete_and_log(self, test_db):
+        """Deletion stores the removed row in its history entry."""
+        assignment_id = test_db.add_assignment("Report", "2025-10-25T17:00:00")
+
+        item = test_db.delete_and_log("assignments", assignment_id)
+
+        assert test_db.get_assignment_by_id(assignment_id) is None
+        action = test_db.get_last_action()
+        assert action["action_type"] == "delete"
+        assert json.loads(action["old_data"]) == item
+
+    def test_action_history_serializes_dict_data(self, test_db):
+        """Dict data passed to the history is stored as JSON."""
+        test_db.add_action_history("delete", "events", 1, {"name": "Deepavali"})
+        assert json.loads(test_db.get_last_action()["old_data"]) == {"name": "Deepavali"}
+
 
 class TestTasks:
     """Tests for task operations."""
@@ -293,6 +564,33 @@ class TestTodos:
         todos = test_db.get_pending_todos()
         assert len(todos) == 2
 
+    def test_get_completion_candidates(self, test_db):
+        """Completion candidates include only pending items, slimmed down."""
+        test_db.add_assignment("Report", "2099-01-01T23:59:00", subject_code="BITP1113")
+        test_db.add_task("Meet Dr Intan", date.today().isoformat())
+        done_id = test_db.add_todo("Done already")
+        test_db.add_todo("Buy groceries")
+        test_db.complete_todo(done_id)
+
+        candidates = test_db.get_completion_candidates()
+        assert candidates["assignments"] == [
+            {"id": 1, "title": "Report", "subject_code": "BITP1113"}
+        ]
+        assert [t["title"] for t in candidates["tasks"]] == ["Meet Dr Intan"]
+        assert [t["title"] for t in candidates["todos"]] == ["Buy groceries"]
+
+    def test_completion_candidates_keep_per_table_order(self, test_db):
+        """Each candidate list keeps its table's natural ordering."""
+        test_db.add_assignment("Later", "2099-02-01T23:59:00")
+        test_db.add_assignment("Sooner", "2099-01-01T23:59:00")
+        test_db.add_todo("Afternoon", scheduled_date="2099-01-01", scheduled_time="15:00")
+        test_db.add_todo("Morning", scheduled_date="2099-01-01", scheduled_time="08:00")
+
+        candidates = test_db.get_completion_candidates()
+        assert [a["title"] for a in candidates["assignments"]] == ["Sooner", "Later"]
+        assert [t["title"] for t in candidates["todos"]] == ["Morning", "Afternoon"]
+        assert candidates["tasks"] == []
+
     def test_get_todos_without_time(self, test_db):
         """Get TODOs without specific time."""
         test_db.add_todo("Floating task")
@@ -355,6 +653,116 @@ class TestPendingCounts:
         counts = test_db.get_pending_counts()
         assert counts["assignments"] == 0
 
+    def test_get_stats_overview_matches_separate_queries(self, test_db):
+        """The combined query agrees with the per-table statistics."""
+        assignment_id = test_db.add_assignment("Assignment", "2025-10-25T17:00:00")
+        test_db.add_assignment("Assignment 2", "2025-10-28T17:00:00")
+        test_db.complete_assignment(assignment_id)
+        test_db.add_task("Task 1", "2025-10-22")
+        test_db.add_todo("TODO 1")
+
+        stats, pending = test_db.get_stats_overview(7)
+        assert stats == test_db.get_completion_stats(7)
+        assert pending == test_db.get_pending_counts()
+        assert stats["assignments"] == {"completed": 1, "total": 2}
+
+
+class TestSearch:
+    """Tests for global search."""
+
+    def test_search_preview_limits_rows_not_total(self, test_db):
+        """Rows are capped per kind while the total counts every match."""
+        for i in range(7):
+            test_db.add_assignment(f"Database report {i}", f"2025-10-{20 + i}T17:00:00")
+        test_db.add_todo("Revise database notes")
+        test_db.add_todo("Buy groceries")
+
+        results, total = test_db.search_preview("database", limit=5)
+        assert total == 8
+        assert [title for _, title, _ in results["assignments"]] == [
+            f"Database report {i}" for i in range(5)
+        ]
+        assert [title for _, title, _ in results["todos"]] == ["Revise database notes"]
+        assert results["tasks"] == []
+
+
+    def test_search_index_tracks_changes(self, test_db):
+        """Substring search sees inserts, updates and deletes."""
+        assignment_id = test_db.add_assignment(
+            "Lab sheet", "2025-10-25T17:00:00", subject_code="BITP1113"
+        )
+        todo_id = test_db.add_todo("Print lab sheet")
+
+        assert test_db.search_all("P111")["assignments"][0]["id"] == assignment_id
+
+        test_db.update_assignment(assignment_id, title="Quiz prep")
+        test_db.delete_todo(todo_id)
+
+        results = test_db.search_all("sheet")
+        assert results["assignments"] == []
+        assert results["todos"] == []
+        assert test_db.search_all("quiz")["assignments"][0]["id"] == assignment_id
+
+    def test_search_index_built_for_existing_rows(self, test_db):
+        """Rows saved before the index existed are searchable after init."""
+        test_db.add_todo("Renew library card")
+        conn = get_connection(test_db.db_path)
+        conn.execute("DROP TABLE todos_fts")
+        conn.commit()
+        conn.close()
+
+        init_db(test_db.db_path)
+
+        fresh = DatabaseOperations(test_db.db_path)
+        results, total = fresh.search_preview("library")
+        fresh.close()
+        assert total == 1
+        assert results["todos"][0][1] == "Renew library card"
+
+
+class TestConnectionPool:
+    """Tests for pooled connection reuse."""
+
+    def test_closed_connection_is_reused(self, test_db):
+        """Closing a connection returns it for the next caller."""
+        conn = test_db._get_conn()
+        conn.close()
+        assert test_db._get_conn() is conn
+
+    def test_uncommitted_work_rolled_back_on_close(self, test_db):
+        """A connection returned mid-transaction does not leak its writes."""
+        conn = test_db._get_conn()
+        conn.execute("INSERT INTO todos (title) VALUES ('Half done')")
+        conn.close()
+
+        assert test_db.get_pending_todos() == []
+
+
+class TestPendingVoice:
+    """Tests for transcripts awaiting a processing choice."""
+
+    def test_save_and_get(self, test_db):
+        """A saved transcript is found by chat and message."""
+        test_db.save_pending_voice(12345, 7, "Hello", 42)
+        assert test_db.get_pending_voice(12345, 7) == {"transcript": "Hello", "duration": 42}
+        assert test_db.get_pending_voice(12345, 8) is None
+
+    def test_delete(self, test_db):
+        """A handled transcript is removed."""
+        test_db.save_pending_voice(12345, 7, "Hello", 42)
+        test_db.delete_pending_voice(12345, 7)
+        assert test_db.get_pending_voice(12345, 7) is None
+
+    def test_expired_transcript_ignored(self, test_db):
+        """Transcripts past their expiry are not returned."""
+        test_db.save_pending_voice(12345, 7, "Hello", 42)
+        conn = test_db._get_conn()
+        conn.execute("UPDATE pending_voice SET expires_at = '2000-01-01T00:00:00'")
+        conn.commit()
+        conn.close()
+
+        assert test_db.get_pending_voice(12345, 7) is None
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,36 @@
+"""Tests for the photo size check run before image type detection."""
+
+import pytest
+
+import sys
+from pathlib import Path
+
+# Add the repo root to path; the ai package uses relative imports of config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.ai.image_parser import could_be_document_image
+
+
+class TestCouldBeDocumentImage:
+    """Tests for rejecting photos that cannot be documents."""
+
+    def test_phone_screenshot_accepted(self):
+        """A normal phone screenshot is sent for detection."""
+        assert could_be_document_image(576, 1280)
+
+    def test_tall_scrolling_screenshot_accepted(self):
+        """A long scrolling screenshot, downscaled by Telegram, is still accepted."""
+        assert could_be_document_image(276, 2560)
+
+    def test_wide_calendar_accepted(self):
+        """A wide landscape calendar is accepted."""
+        assert could_be_document_image(2560, 400)
+
+    def test_thumbnail_rejected(self):
+        """Thumbnail-sized photos are rejected."""
+        assert not could_be_document_image(90, 90)
+        assert not could_be_document_image(160, 199)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,52 @@
+"""Tests for completion target extraction."""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import sys
+from pathlib import Path
+
+# Add the repo root to path; the ai package uses relative imports of config
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.ai.intent_parser import extract_completion_target
+
+
+PENDING = {
+    "assignments": [{"id": 1, "title": "Lab Report", "subject_code": "BITP1113"}],
+    "tasks": [],
+    "todos": [{"id": 2, "title": "work"}],
+}
+
+
+def _mock_client(response: str) -> MagicMock:
+    client = MagicMock()
+    client.send_text = AsyncMock(return_value=response)
+    return client
+
+
+class TestExtractCompletionTarget:
+    """Tests for matching a completion message to a pending item."""
+
+    def test_whole_title_matched_without_model(self):
+        """A message naming one title outright skips Gemini."""
+        client = _mock_client('{"match": null}')
+        with patch("src.ai.intent_parser.get_gemini_client", return_value=client):
+            result = asyncio.run(extract_completion_target("done with the lab report!", PENDING))
+
+        assert result == ("assignment", PENDING["assignments"][0])
+        client.send_text.assert_not_called()
+
+    def test_title_inside_another_word_not_matched(self):
+        """A title found only inside a longer word is left to Gemini."""
+        client = _mock_client('{"match": null}')
+        with patch("src.ai.intent_parser.get_gemini_client", return_value=client):
+            result = asyncio.run(extract_completion_target("finished my homework", PENDING))
+
+        assert result is None
+        client.send_text.assert_called_once()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -16,6 +16,11 @@ from utils.semester_logic import (
     get_event_on_date,
     get_affected_classes,
     get_next_offday,
+    classify_break_event,
+    get_current_break_with_type,
+    get_break_window,
+    BREAK_MID_SEMESTER,
+    BREAK_INTER_SEMESTER,
     format_date,
     format_time,
     parse_date,
@@ -236,6 +241,111 @@ class TestGetNextOffday:
         assert result is None
 
 
+class TestClassifyBreakEvent:
+    """Tests for break classification."""
+
+    def test_uses_stored_category(self):
+        """A stored category takes precedence over the event name."""
+        event = {
+            "event_type": "break",
+            "name": "Cuti Khas",
+            "start_date": "2025-11-17",
+            "end_date": "2025-11-23",
+            "category": "midterm_break",
+        }
+        assert classify_break_event(event) == BREAK_MID_SEMESTER
+
+    def test_missing_stored_category_is_inter_semester(self):
+        """A break stored without a category is not the mid-semester break."""
+        event = {
+            "event_type": "break",
+            "name_en": "Mid-Semester Break",
+            "start_date": "2025-11-17",
+            "end_date": "2025-11-23",
+            "category": None,
+        }
+        assert classify_break_event(event) == BREAK_INTER_SEMESTER
+
+    def test_falls_back_to_name_without_category(self):
+        """Events not loaded from the database are classified by name."""
+        assert classify_break_event({"name_en": "Mid-Semester Break"}) == BREAK_MID_SEMESTER
+        assert classify_break_event({"name": "Cuti Antara Semester"}) == BREAK_INTER_SEMESTER
+
+
+class TestGetCurrentBreakWithType:
+    """Tests for current break lookup with classification."""
+
+    @pytest.fixture
+    def sample_events(self):
+        return [
+            {
+                "event_type": "break",
+                "name": "Cuti Pertengahan Semester",
+                "name_en": "Mid-Semester Break",
+                "start_date": "2025-11-17",
+                "end_date": "2025-11-23",
+            },
+            {
+                "event_type": "break",
+                "name": "Cuti Antara Semester",
+                "name_en": "Inter-Semester Break",
+                "start_date": "2026-02-09",
+                "end_date": "2026-03-01",
+            },
+        ]
+
+    def test_mid_semester_break(self, sample_events):
+        """Date inside the mid-semester break."""
+        event, break_type = get_current_break_with_type(date(2025, 11, 19), sample_events)
+        assert event["name_en"] == "Mid-Semester Break"
+        assert break_type == BREAK_MID_SEMESTER
+
+    def test_inter_semester_break(self, sample_events):
+        """Date inside the inter-semester break."""
+        event, break_type = get_current_break_with_type(date(2026, 2, 15), sample_events)
+        assert event["name_en"] == "Inter-Semester Break"
+        assert break_type == BREAK_INTER_SEMESTER
+
+    def test_not_in_break(self, sample_events):
+        """Regular day returns (None, None)."""
+        assert get_current_break_with_type(date(2025, 10, 15), sample_events) == (None, None)
+
+
+class TestGetBreakWindow:
+    """Tests for the cached break window."""
+
+    @pytest.fixture
+    def sample_events(self):
+        return [
+            {
+                "event_type": "break",
+                "name_en": "Mid-Semester Break",
+                "start_date": "2025-11-17",
+                "end_date": "2025-11-23",
+            },
+            {
+                "event_type": "holiday",
+                "name_en": "Deepavali",
+                "start_date": "2025-10-20",
+            },
+        ]
+
+    def test_before_break_valid_until_start(self, sample_events):
+        """Outside a break, the answer holds until the next break starts."""
+        assert get_break_window(date(2025, 10, 1), sample_events) == (None, None, date(2025, 11, 17))
+
+    def test_in_break_valid_until_day_after_end(self, sample_events):
+        """Inside a break, the answer holds until the day after it ends."""
+        event, break_type, valid_until = get_break_window(date(2025, 11, 20), sample_events)
+        assert event["name_en"] == "Mid-Semester Break"
+        assert break_type == BREAK_MID_SEMESTER
+        assert valid_until == date(2025, 11, 24)
+
+    def test_after_last_break_never_changes(self, sample_events):
+        """With no later break, the answer holds indefinitely."""
+        assert get_break_window(date(2025, 12, 1), sample_events) == (None, None, date.max)
+
+
 class TestFormatDate:
     """Tests for date formatting."""
 
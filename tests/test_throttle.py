@@ -0,0 +1,127 @@
+"""Tests for outgoing API call throttling."""
+
+import asyncio
+import pytest
+
+import sys
+from pathlib import Path
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from telegram.error import RetryAfter
+
+from bot.throttle import EditCoalescer, TokenBucketRateLimiter
+
+
+class FakeMessage:
+    chat_id = 1
+    message_id = 10
+
+
+class FakeQuery:
+    """Records the texts it is edited to."""
+
+    message = FakeMessage()
+
+    def __init__(self, sent: list):
+        self.sent = sent
+
+    async def edit_message_text(self, text, **kwargs):
+        self.sent.append(text)
+
+
+class TestEditCoalescer:
+    """Tests for coalescing message edits."""
+
+    def test_first_edit_sent_immediately(self):
+        """An edit with no recent predecessor is sent straight away."""
+        sent = []
+
+        async def run():
+            await EditCoalescer(window=0.05).edit(FakeQuery(sent), "one")
+            assert sent == ["one"]
+
+        asyncio.run(run())
+
+    def test_rapid_edits_send_only_latest(self):
+        """Edits within the window collapse into one call with the newest text."""
+        sent = []
+
+        async def run():
+            coalescer = EditCoalescer(window=0.05)
+            await coalescer.edit(FakeQuery(sent), "one")
+            await coalescer.edit(FakeQuery(sent), "two")
+            await coalescer.edit(FakeQuery(sent), "three")
+            assert sent == ["one"]
+            await asyncio.sleep(0.1)
+
+        asyncio.run(run())
+        assert sent == ["one", "three"]
+
+    def test_repeated_edit_dropped(self):
+        """Repeating the edit just sent does not call the API again."""
+        sent = []
+
+        async def run():
+            coalescer = EditCoalescer(window=0.05)
+            await coalescer.edit(FakeQuery(sent), "one")
+            await coalescer.edit(FakeQuery(sent), "one")
+            await asyncio.sleep(0.1)
+
+        asyncio.run(run())
+        assert sent == ["one"]
+
+
+class TestTokenBucketRateLimiter:
+    """Tests for pacing outgoing API calls."""
+
+    @staticmethod
+    async def _send(limiter, callback):
+        return await limiter.process_request(callback, (), {}, "sendMessage", {}, None)
+
+    def test_burst_within_capacity_not_delayed(self):
+        """Calls up to the bucket capacity go out without waiting."""
+        async def ok():
+            return True
+
+        async def run():
+            limiter = TokenBucketRateLimiter(rate=10, capacity=3)
+            start = asyncio.get_running_loop().time()
+            for _ in range(3):
+                assert await self._send(limiter, ok) is True
+            return asyncio.get_running_loop().time() - start
+
+        assert asyncio.run(run()) < 0.05
+
+    def test_calls_beyond_capacity_spaced_out(self):
+        """Once the bucket is empty, calls wait for it to refill."""
+        async def ok():
+            return True
+
+        async def run():
+            limiter = TokenBucketRateLimiter(rate=20, capacity=1)
+            start = asyncio.get_running_loop().time()
+            for _ in range(3):
+                await self._send(limiter, ok)
+            return asyncio.get_running_loop().time() - start
+
+        assert asyncio.run(run()) >= 0.09
+
+    def test_retry_after_retried_once(self):
+        """A flood-control rejection is retried after the requested wait."""
+        calls = []
+
+        async def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RetryAfter(0)
+            return "sent"
+
+        result = asyncio.run(self._send(TokenBucketRateLimiter(), flaky))
+        assert result == "sent"
+        assert len(calls) == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])